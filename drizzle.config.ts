@@ -7,6 +7,8 @@ if (!process.env.DATABASE_URL) {
 export default defineConfig({
   out: "./migrations",
   schema: "./shared/schema.ts",
+  // Partitioned by the Python migrations (server/database/migrations.py), which own it
+  tablesFilter: ["!user_mood_history*"],
   dialect: "postgresql",
   dbCredentials: {
     url: process.env.DATABASE_URL,
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the LLM layer, agents, planning flow and proposal routes
+Runs each workload against the mock LLM server and reports latency percentiles and framework
+overhead: the time spent outside the latency the mock injects, per LLM call
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import uvicorn
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from load_test_db_routes import percentile  # noqa: E402
+from mock_llm_server import MockLLM, create_app  # noqa: E402
+
+WORKLOADS = ("ask", "stream", "tool", "agent", "flow", "route", "route_stream")
+
+PROMPT = "Find funding opportunities for a solar cooperative in Kenya and summarise them."
+
+PROPOSAL_REQUEST = {
+    "proposalContent": {
+        "executive_summary": "Solar micro-grids for 12 rural cooperatives. " * 20,
+        "budget_narrative": "Equipment, training and three years of maintenance. " * 10,
+    },
+    "opportunityDetails": {
+        "title": "Clean Energy Access Fund",
+        "funder": "Example Foundation",
+        "amount": "250000 USD",
+        "deadline": "2026-12-31",
+    },
+}
+
+
+def proposal_request(i):
+    """A distinct proposal per op, so concurrent agent runs are not coalesced into one"""
+    return {
+        **PROPOSAL_REQUEST,
+        "opportunityDetails": {**PROPOSAL_REQUEST["opportunityDetails"], "reference": f"BENCH-{i}"},
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class MockServer:
+    """The mock LLM on its own thread and event loop, so it does not share the loop under test"""
+
+    def __init__(self, mock, port):
+        self.mock = mock
+        self.port = port
+        self.server = uvicorn.Server(
+            uvicorn.Config(create_app(mock), host="127.0.0.1", port=port, log_level="warning")
+        )
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            if not self.thread.is_alive():
+                raise RuntimeError("Mock LLM server failed to start")
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+def write_config(base_url, max_concurrency):
+    """Config pointing the default LLM at the mock; loaded through OPENMANUS_CONFIG"""
+    path = Path(tempfile.mkdtemp(prefix="llm-bench-")) / "config.toml"
+    path.write_text(
+        "[llm]\n"
+        'model = "mock"\n'
+        f'base_url = "{base_url}"\n'
+        'api_key = "mock"\n'
+        "max_tokens = 1024\n"
+        "temperature = 0.0\n"
+        f"max_concurrency = {max_concurrency}\n"
+        "max_retries = 3\n"
+        "\n[llm_cache]\n"
+        "enabled = false\n"
+    )
+    return path
+
+
+def build_workloads(args):
+    """Workload name -> (mock overrides, coroutine factory taking the op index).
+
+    The app is imported here, after OPENMANUS_CONFIG points at the mock.
+    """
+    from server.app.agent.toolcall import ToolCallAgent
+    from server.app.flow.planning import PlanningFlow
+    from server.app.llm import LLM
+    from server.app.logger import define_log_level
+    from server.app.schema import Message
+    from server.app.tool import Terminate, ToolCollection
+    from server.app.tool.base import BaseTool
+
+    # The log file keeps its usual level: writing it is part of the overhead being measured
+    define_log_level(print_level=args.log_level, name="benchmark_llm")
+
+    observation = " ".join(f"token{i % 97}" for i in range(args.observation_words))
+
+    class Lookup(BaseTool):
+        """Stands in for a search or browser tool: returns a fixed-size observation"""
+
+        name: str = "lookup"
+        description: str = "Look up information about a topic."
+        parameters: dict = {
+            "type": "object",
+            "properties": {"query": {"type": "string", "description": "What to look up"}},
+            "required": ["query"],
+        }
+
+        async def execute(self, query: str) -> str:
+            return observation
+
+    def agent():
+        return ToolCallAgent(
+            available_tools=ToolCollection(Lookup(), Terminate()),
+            max_steps=args.tool_steps + 3,
+        )
+
+    llm = LLM()
+    tools = [Lookup().to_param(), Terminate().to_param()]
+
+    async def ask(i):
+        await llm.ask([Message.user_message(f"{PROMPT} ({i})")], stream=False)
+
+    async def stream(i):
+        first = None
+        start = time.perf_counter()
+        async for event in llm.ask_stream([Message.user_message(f"{PROMPT} ({i})")]):
+            if first is None and event.type == "text":
+                first = time.perf_counter() - start
+        return {"ttft": first}
+
+    async def tool(i):
+        await llm.ask_tool([Message.user_message(f"{PROMPT} ({i})")], tools=tools)
+
+    async def run_agent(i):
+        await agent().run(f"{PROMPT} ({i})")
+
+    async def flow(i):
+        await PlanningFlow(agents={"bench": agent()}).execute(f"{PROMPT} ({i})")
+
+    workloads = {
+        "ask": ({}, ask),
+        "stream": ({}, stream),
+        "tool": ({"tool_steps": 1}, tool),
+        "agent": ({}, run_agent),
+        "flow": ({}, flow),
+    }
+
+    if {"route", "route_stream"} & set(args.workloads):
+        from fastapi import FastAPI
+
+        from server.proposals import routes as proposals_routes
+
+        app = FastAPI()
+        app.include_router(proposals_routes.router, prefix="/api")
+        client = httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None
+        )
+
+        async def route(i):
+            response = await client.post("/api/proposal/analyze", json=proposal_request(i))
+            return {"status": response.status_code}
+
+        async def route_stream(i):
+            first = None
+            start = time.perf_counter()
+            async with client.stream(
+                "POST", "/api/proposal/enhance?stream=true",
+                json={
+                    "section": "executive_summary",
+                    "currentContent": PROPOSAL_REQUEST["proposalContent"]["executive_summary"],
+                    "context": {"reference": f"BENCH-{i}"},
+                },
+            ) as response:
+                async for line in response.aiter_lines():
+                    if first is None and line.startswith("event: token"):
+                        first = time.perf_counter() - start
+            return {"status": response.status_code, "ttft": first}
+
+        # Manus offers python_execute first; viewing a file is a cheaper tool step
+        workloads["route"] = ({"tool": "str_replace_editor"}, route)
+        workloads["route_stream"] = ({}, route_stream)
+
+    return workloads
+
+
+async def run_workload(mock, operation, total, concurrency):
+    latencies, ttfts, errors, statuses = [], [], [], {}
+    remaining = list(range(total))
+
+    async def worker():
+        while True:
+            try:
+                index = remaining.pop()
+            except IndexError:
+                return
+            start = time.perf_counter()
+            try:
+                outcome = await operation(index) or {}
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}"[:200])
+                outcome = {}
+            latencies.append(time.perf_counter() - start)
+            if outcome.get("ttft") is not None:
+                ttfts.append(outcome["ttft"])
+            if "status" in outcome:
+                statuses[outcome["status"]] = statuses.get(outcome["status"], 0) + 1
+                if outcome["status"] >= 400:
+                    errors.append(f"HTTP {outcome['status']}")
+
+    mock.reset_stats()
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    calls = mock.stats["requests"]
+    injected = mock.stats["injected_latency_s"]
+    result = {
+        "ops": len(latencies),
+        "errors": len(errors),
+        "llm_calls": calls,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_ops": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 1) if latencies else 0.0,
+        # Everything an op waited on besides the model: framework, tools, scheduler queueing
+        "overhead_ms_per_call": round((sum(latencies) - injected) / calls * 1000, 2) if calls else 0.0,
+        "peak_llm_in_flight": mock.stats["peak_in_flight"],
+    }
+    if ttfts:
+        result["ttft_p50_ms"] = round(percentile(ttfts, 50) * 1000, 1)
+    if statuses:
+        result["statuses"] = {str(k): v for k, v in sorted(statuses.items())}
+    if errors:
+        result["sample_errors"] = errors[:3]
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Workloads whose overhead per LLM call grew by more than ``tolerance`` (and at least 1ms)"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name, {}).get("overhead_ms_per_call")
+        after = result["overhead_ms_per_call"]
+        if before is not None and after > before * (1 + tolerance) and after - before >= 1.0:
+            regressions.append(f"{name}: overhead {before}ms -> {after}ms per LLM call")
+    return regressions
+
+
+async def run_all(args, mock):
+    workloads = build_workloads(args)
+    defaults = {"tool": mock.tool, "tool_steps": mock.tool_steps}
+    results = {}
+    print(
+        f"{'workload':>12} {'ops':>5} {'calls':>6} {'p50':>9} {'p95':>9} {'ops/s':>7} "
+        f"{'overhead/call':>14} {'errors':>6}"
+    )
+    for name in args.workloads:
+        overrides, operation = workloads[name]
+        for key, value in {**defaults, **overrides}.items():
+            setattr(mock, key, value)
+        if args.warmup:
+            await run_workload(mock, operation, args.warmup, 1)
+        result = await run_workload(mock, operation, args.requests, args.concurrency)
+        results[name] = result
+        print(
+            f"{name:>12} {result['ops']:>5} {result['llm_calls']:>6} {result['p50_ms']:>7.1f}ms "
+            f"{result['p95_ms']:>7.1f}ms {result['throughput_ops']:>7.2f} "
+            f"{result['overhead_ms_per_call']:>12.2f}ms {result['errors']:>6}"
+        )
+        for error in result.get("sample_errors", []):
+            print(f"{'':>12} ! {error}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("workloads", nargs="*", default=["ask", "stream", "tool", "agent", "flow"],
+                        help=f"Any of {', '.join(WORKLOADS)}")
+    parser.add_argument("-n", "--requests", type=int, default=50, help="Operations per workload")
+    parser.add_argument("-c", "--concurrency", type=int, default=1)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--latency", default="fixed:0.05", help="Mock latency, e.g. lognormal:0.8,0.6")
+    parser.add_argument("--chunk-delay", type=float, default=0.0)
+    parser.add_argument("--tool-steps", type=int, default=3, help="Tool calls per agent run")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of mock calls failing with 429")
+    parser.add_argument("--retry-after", type=float, help="Retry-After seconds on injected errors")
+    parser.add_argument("--observation-words", type=int, default=400)
+    parser.add_argument("--max-concurrency", type=int, default=8, help="LLM scheduler slots")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--log-level", default="WARNING", help="Console log level of the app")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--baseline", help="Fail if overhead regressed against these results")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    unknown = set(args.workloads) - set(WORKLOADS)
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+
+    mock = MockLLM(
+        latency=args.latency,
+        chunk_delay=args.chunk_delay,
+        tool_steps=args.tool_steps,
+        error_rate=args.error_rate,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    with MockServer(mock, free_port()) as server:
+        os.environ["OPENMANUS_CONFIG"] = str(
+            write_config(f"http://127.0.0.1:{server.port}/v1", args.max_concurrency)
+        )
+        results = asyncio.run(run_all(args, mock))
+
+    if args.json:
+        Path(args.json).write_text(json.dumps(results, indent=2))
+    if args.baseline:
+        regressions = compare(results, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
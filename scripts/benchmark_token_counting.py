@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Benchmark for LLM input token counting on long Manus-style agent histories
+Counts the full conversation once per step, as ToolCallAgent does, with and without the per-text memo
+"""
+
+import argparse
+import json
+import random
+import string
+import sys
+import time
+from pathlib import Path
+
+import tiktoken
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from server.app.llm import TokenCounter  # noqa: E402
+from server.app.prompt.manus import NEXT_STEP_PROMPT, SYSTEM_PROMPT  # noqa: E402
+
+TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": name,
+            "description": f"{name} tool. " + "Performs an action in the agent sandbox. " * 20,
+            "parameters": {"type": "object", "properties": {"input": {"type": "string"}}},
+        },
+    }
+    for name in ("python_execute", "browser_use", "str_replace_editor", "ask_human", "terminate")
+]
+
+
+def _page_text(rng, words):
+    return " ".join(
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(2, 10))) for _ in range(words)
+    )
+
+
+def build_history(steps, page_words, seed=0):
+    """System prompt, task, then one assistant tool call and one tool result per step"""
+    rng = random.Random(seed)
+    history = [
+        {"role": "system", "content": SYSTEM_PROMPT.format(directory="/workspace")},
+        {"role": "user", "content": "Find funding opportunities for a solar cooperative in Kenya."},
+    ]
+    per_step = []
+    for step in range(steps):
+        call_id = f"call_{step}"
+        per_step.append([
+            {"role": "user", "content": NEXT_STEP_PROMPT},
+            {
+                "role": "assistant",
+                "content": f"Step {step}: continuing the search.",
+                "tool_calls": [{
+                    "id": call_id,
+                    "type": "function",
+                    "function": {
+                        "name": "browser_use",
+                        "arguments": json.dumps({"action": "extract_content", "goal": f"page {step}"}),
+                    },
+                }],
+            },
+            {
+                "role": "tool",
+                "name": "browser_use",
+                "tool_call_id": call_id,
+                "content": _page_text(rng, page_words),
+            },
+        ])
+    return history, per_step
+
+
+def run(counter, history, per_step):
+    """Grow the conversation step by step, counting everything each time like ask_tool does"""
+    messages = list(history)
+    total = 0
+    start = time.process_time()
+    for new_messages in per_step:
+        messages.extend(new_messages)
+        total += counter.count_message_tokens(messages) + counter.count_tools(TOOLS)
+    return time.process_time() - start, total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--steps", type=int, nargs="+", default=[10, 30, 60])
+    parser.add_argument("--page-words", type=int, default=800)
+    parser.add_argument("--encoding", default="cl100k_base")
+    args = parser.parse_args()
+
+    tokenizer = tiktoken.get_encoding(args.encoding)
+    print(f"{'steps':>6} {'uncached':>12} {'memoized':>12} {'speedup':>8} {'hit rate':>9}")
+    for steps in args.steps:
+        history, per_step = build_history(steps, args.page_words)
+
+        baseline_s, baseline_total = run(TokenCounter(tokenizer, cache_size=0), history, per_step)
+        memo = TokenCounter(tokenizer)
+        memo_s, memo_total = run(memo, history, per_step)
+        if memo_total != baseline_total:
+            print(f"token totals differ: {baseline_total} != {memo_total}")
+            return 1
+
+        info = memo.cache_info()
+        hit_rate = info.hits / (info.hits + info.misses) if info.hits + info.misses else 0.0
+        print(
+            f"{steps:>6} {baseline_s * 1000:>10.1f}ms {memo_s * 1000:>10.1f}ms "
+            f"{baseline_s / memo_s if memo_s else float('inf'):>7.1f}x {hit_rate:>8.1%}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
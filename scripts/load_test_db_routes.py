@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Load test for Granada OS database-backed routes
+Fires concurrent requests at a running service and reports latency percentiles
+"""
+
+import argparse
+import asyncio
+import math
+import statistics
+import sys
+import time
+
+import httpx
+
+DEFAULT_ENDPOINTS = [
+    "http://localhost:8000/api/opportunities?limit=20",
+    "http://localhost:8000/api/opportunities?limit=20&verified_only=true",
+]
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+async def worker(client, endpoints, remaining, latencies, errors):
+    while True:
+        try:
+            index = remaining.pop()
+        except IndexError:
+            return
+        url = endpoints[index % len(endpoints)]
+        start = time.perf_counter()
+        try:
+            response = await client.get(url)
+            if response.status_code >= 400:
+                errors.append(f"HTTP {response.status_code} {url}")
+        except httpx.HTTPError as e:
+            errors.append(f"{type(e).__name__} {url}")
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def run_load_test(endpoints, total_requests, concurrency, timeout):
+    latencies = []
+    errors = []
+    remaining = list(range(total_requests))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*[
+            worker(client, endpoints, remaining, latencies, errors)
+            for _ in range(concurrency)
+        ])
+        elapsed = time.perf_counter() - start
+
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "max_ms": round(max(latencies), 2) if latencies else 0.0,
+        "mean_ms": round(statistics.fmean(latencies), 2) if latencies else 0.0,
+        "sample_errors": errors[:5],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("endpoints", nargs="*", default=DEFAULT_ENDPOINTS)
+    parser.add_argument("-n", "--requests", type=int, default=500)
+    parser.add_argument("-c", "--concurrency", type=int, nargs="+", default=[1, 10, 50])
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+
+    print(f"{'conc':>5} {'reqs':>6} {'err':>5} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9}")
+    for concurrency in args.concurrency:
+        result = asyncio.run(run_load_test(args.endpoints, args.requests, concurrency, args.timeout))
+        print(
+            f"{result['concurrency']:>5} {result['requests']:>6} {result['errors']:>5} "
+            f"{result['throughput_rps']:>8} {result['p50_ms']:>7}ms {result['p95_ms']:>7}ms "
+            f"{result['p99_ms']:>7}ms {result['max_ms']:>7}ms"
+        )
+        for error in result["sample_errors"]:
+            print(f"      {error}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Offline OpenAI-compatible chat completions server for benchmarks and regression runs
+Serves scripted or recorded responses (tool calls included), with configurable latency and streaming
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+class Latency:
+    """Delay distribution in seconds, parsed from specs like "fixed:0.5" or "lognormal:0.8,0.6"
+
+    fixed:S, uniform:LOW,HIGH, normal:MEAN,STDDEV and lognormal:MEDIAN,SIGMA are supported.
+    """
+
+    KINDS = ("fixed", "uniform", "normal", "lognormal")
+
+    def __init__(self, spec="fixed:0", seed=None):
+        kind, _, params = spec.partition(":")
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown latency distribution {kind!r}, expected one of {self.KINDS}")
+        self.spec = spec
+        self.kind = kind
+        self.params = [float(p) for p in params.split(",") if p] or [0.0]
+        self.rng = random.Random(seed)
+
+    def sample(self):
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0]
+        elif self.kind == "uniform":
+            value = self.rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = self.rng.gauss(p[0], p[1])
+        else:
+            value = self.rng.lognormvariate(math.log(p[0]), p[1]) if p[0] > 0 else 0.0
+        return max(0.0, value)
+
+
+def estimate_tokens(value):
+    """Roughly four characters per token; good enough for usage accounting in benchmarks"""
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return max(1, len(text) // 4)
+
+
+def example_arguments(schema):
+    """Arguments that satisfy a JSON schema: first enum value, placeholder strings, short arrays"""
+    if not isinstance(schema, dict):
+        return "mock"
+    if schema.get("enum"):
+        return schema["enum"][0]
+    kind = schema.get("type", "string")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "string")
+    if kind == "object":
+        return {
+            name: example_arguments(prop)
+            for name, prop in schema.get("properties", {}).items()
+        }
+    if kind == "array":
+        return [example_arguments(schema.get("items", {})) for _ in range(3)]
+    if kind == "integer":
+        return 0
+    if kind == "number":
+        return 0.0
+    if kind == "boolean":
+        return True
+    return "mock"
+
+
+class MockLLM:
+    """Chooses and times the response for each chat completion request.
+
+    The turn of a request is the number of assistant messages already in it,
+    so a whole agent run can be scripted without server-side sessions. With a
+    ``responses`` script, turn N gets entry N (the last entry repeats). Each
+    entry is {"content": ...} and/or {"tool_calls": [{"name", "arguments"}]},
+    or a recorded chat.completion object (anything with "choices"), replayed
+    as is. Without a script, requests offering tools call ``tool`` (the first
+    offered tool other than terminate by default) for ``tool_steps`` turns and
+    then ``terminate`` when it is offered; the terminating turn and requests
+    without tools answer with a JSON object holding ``content_words`` words.
+    """
+
+    def __init__(
+        self,
+        responses=None,
+        latency="fixed:0",
+        chunk_delay=0.0,
+        chunk_words=4,
+        tool_steps=2,
+        tool=None,
+        content_words=60,
+        error_rate=0.0,
+        error_status=429,
+        retry_after=None,
+        seed=None,
+    ):
+        self.responses = responses or []
+        self.latency = Latency(latency, seed=seed)
+        self.chunk_delay = chunk_delay
+        self.chunk_words = chunk_words
+        self.tool_steps = tool_steps
+        self.tool = tool
+        self.content_words = content_words
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.retry_after = retry_after
+        self.rng = random.Random(seed)
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.stats = {
+            "requests": 0,
+            "streamed": 0,
+            "tool_call_responses": 0,
+            "errors_injected": 0,
+            "injected_latency_s": 0.0,
+            "in_flight": 0,
+            "peak_in_flight": 0,
+        }
+
+    # Response selection
+
+    def _turn(self, body):
+        return sum(1 for m in body.get("messages", []) if m.get("role") == "assistant")
+
+    def _scripted(self, body):
+        """(content, [(name, arguments)]) for the request"""
+        turn = self._turn(body)
+        tools = [t.get("function", t) for t in body.get("tools") or []]
+        if not tools or body.get("tool_choice") == "none":
+            return self._text(turn), []
+
+        by_name = {t["name"]: t for t in tools}
+        work = by_name.get(self.tool) or next(
+            (t for t in tools if t["name"] != "terminate"), None
+        )
+        if work is not None and (turn < self.tool_steps or "terminate" not in by_name):
+            return f"Step {turn + 1}: calling {work['name']}.", [
+                (work["name"], example_arguments(work.get("parameters", {})))
+            ]
+        if "terminate" in by_name:
+            return self._text(turn), [("terminate", {"status": "success"})]
+        return self._text(turn), []
+
+    def _text(self, turn):
+        words = " ".join(f"word{i % 50}" for i in range(self.content_words))
+        return json.dumps({"turn": turn, "result": words})
+
+    def respond(self, body):
+        """Full chat.completion response body for a request"""
+        if self.responses:
+            entry = self.responses[min(self._turn(body), len(self.responses) - 1)]
+            if "choices" in entry:
+                return {**entry, "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}", "created": int(time.time())}
+            content = entry.get("content")
+            calls = [(c["name"], c.get("arguments", {})) for c in entry.get("tool_calls", [])]
+        else:
+            content, calls = self._scripted(body)
+
+        message = {"role": "assistant", "content": content}
+        if calls:
+            self.stats["tool_call_responses"] += 1
+            message["tool_calls"] = [
+                {
+                    "id": f"call_{uuid.uuid4().hex[:12]}",
+                    "type": "function",
+                    "function": {
+                        "name": name,
+                        "arguments": args if isinstance(args, str) else json.dumps(args),
+                    },
+                }
+                for name, args in calls
+            ]
+        completion_tokens = estimate_tokens(content or "") + sum(
+            estimate_tokens(c["function"]["arguments"]) for c in message.get("tool_calls", [])
+        )
+        return {
+            "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [
+                {
+                    "index": 0,
+                    "message": message,
+                    "finish_reason": "tool_calls" if calls else "stop",
+                }
+            ],
+            "usage": {
+                "prompt_tokens": estimate_tokens(body.get("messages", [])),
+                "completion_tokens": completion_tokens,
+                "total_tokens": estimate_tokens(body.get("messages", [])) + completion_tokens,
+            },
+        }
+
+    def stream_chunks(self, completion, include_usage):
+        """chat.completion.chunk bodies replaying a completion piece by piece"""
+        base = {
+            "id": completion["id"],
+            "object": "chat.completion.chunk",
+            "created": completion["created"],
+            "model": completion.get("model", "mock"),
+        }
+        choice = completion["choices"][0]
+        message = choice["message"]
+
+        def chunk(delta, finish_reason=None):
+            return {**base, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+
+        yield chunk({"role": "assistant", "content": ""})
+        words = (message.get("content") or "").split(" ")
+        for start in range(0, len(words), self.chunk_words):
+            piece = " ".join(words[start:start + self.chunk_words])
+            if piece:
+                yield chunk({"content": piece if start == 0 else " " + piece})
+        for index, call in enumerate(message.get("tool_calls") or []):
+            yield chunk({"tool_calls": [{
+                "index": index,
+                "id": call["id"],
+                "type": "function",
+                "function": {"name": call["function"]["name"], "arguments": ""},
+            }]})
+            yield chunk({"tool_calls": [{
+                "index": index,
+                "function": {"arguments": call["function"]["arguments"]},
+            }]})
+        yield chunk({}, choice.get("finish_reason", "stop"))
+        if include_usage and completion.get("usage"):
+            yield {**base, "choices": [], "usage": completion["usage"]}
+
+    # Timing and failure injection
+
+    async def delay(self):
+        seconds = self.latency.sample()
+        self.stats["injected_latency_s"] += seconds
+        if seconds:
+            await asyncio.sleep(seconds)
+
+    def injected_error(self):
+        if not self.error_rate or self.rng.random() >= self.error_rate:
+            return None
+        self.stats["errors_injected"] += 1
+        headers = {} if self.retry_after is None else {"retry-after": str(self.retry_after)}
+        return JSONResponse(
+            {"error": {"message": "Injected by the mock server", "type": "mock_error"}},
+            status_code=self.error_status,
+            headers=headers,
+        )
+
+
+def create_app(mock):
+    app = FastAPI(title="Mock LLM")
+    app.state.mock = mock
+
+    async def chat_completions(request: Request):
+        body = await request.json()
+        mock.stats["requests"] += 1
+        mock.stats["in_flight"] += 1
+        mock.stats["peak_in_flight"] = max(mock.stats["peak_in_flight"], mock.stats["in_flight"])
+        streaming = False
+        try:
+            await mock.delay()
+            error = mock.injected_error()
+            if error is not None:
+                return error
+            completion = mock.respond(body)
+            if not body.get("stream"):
+                return completion
+            streaming = True
+        finally:
+            # A stream leaves the in-flight count when its last chunk is sent
+            if not streaming:
+                mock.stats["in_flight"] -= 1
+
+        mock.stats["streamed"] += 1
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        async def events():
+            try:
+                for chunk in mock.stream_chunks(completion, include_usage):
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    if mock.chunk_delay:
+                        mock.stats["injected_latency_s"] += mock.chunk_delay
+                        await asyncio.sleep(mock.chunk_delay)
+                yield "data: [DONE]\n\n"
+            finally:
+                mock.stats["in_flight"] -= 1
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    # Accept base_url with or without the /v1 suffix
+    for path in ("/v1/chat/completions", "/chat/completions"):
+        app.add_api_route(path, chat_completions, methods=["POST"])
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]}
+
+    @app.get("/mock/stats")
+    async def stats():
+        return mock.stats
+
+    @app.post("/mock/reset")
+    async def reset():
+        mock.reset_stats()
+        return mock.stats
+
+    return app
+
+
+def load_responses(path):
+    """A JSON list of responses, or JSONL with one response (or recorded completion) per line"""
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    if text.lstrip().startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--responses", help="JSON/JSONL file of scripted or recorded responses")
+    parser.add_argument("--latency", default="fixed:0.2", help="e.g. fixed:0.2, uniform:0.1,0.5, lognormal:0.8,0.6")
+    parser.add_argument("--chunk-delay", type=float, default=0.01, help="Seconds between stream chunks")
+    parser.add_argument("--tool-steps", type=int, default=2)
+    parser.add_argument("--tool", help="Tool the default script calls (first non-terminate tool otherwise)")
+    parser.add_argument("--content-words", type=int, default=60)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=429)
+    parser.add_argument("--retry-after", type=float)
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    mock = MockLLM(
+        responses=load_responses(args.responses) if args.responses else None,
+        latency=args.latency,
+        chunk_delay=args.chunk_delay,
+        tool_steps=args.tool_steps,
+        tool=args.tool,
+        content_words=args.content_words,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        retry_after=args.retry_after,
+        seed=args.seed,
+    )
+    print(f"Mock LLM on http://{args.host}:{args.port}/v1 (latency {args.latency})")
+    uvicorn.run(create_app(mock), host=args.host, port=args.port, log_level="warning")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,13 +1,14 @@
+import json
 from abc import ABC, abstractmethod
 from contextlib import asynccontextmanager
-from typing import List, Optional
+from typing import Any, List, Optional
 
 from pydantic import BaseModel, Field, model_validator
 
-from app.llm import LLM
-from app.logger import logger
-from app.sandbox.client import SANDBOX_CLIENT
-from app.schema import ROLE_TYPE, AgentState, Memory, Message
+from server.app.llm import LLM
+from server.app.logger import logger
+from server.app.sandbox.client import SANDBOX_CLIENT
+from server.app.schema import ROLE_TYPE, AgentState, Memory, Message
 
 
 class BaseAgent(BaseModel, ABC):
@@ -53,6 +54,8 @@ class BaseAgent(BaseModel, ABC):
             self.llm = LLM(config_name=self.name.lower())
         if not isinstance(self.memory, Memory):
             self.memory = Memory()
+        # Compaction budgets are measured with the agent's own tokenizer
+        self.memory.set_token_counter(self.llm.count_message_tokens)
         return self
 
     @asynccontextmanager
@@ -113,6 +116,15 @@ class BaseAgent(BaseModel, ABC):
         kwargs = {"base64_image": base64_image, **(kwargs if role == "tool" else {})}
         self.memory.add_message(message_map[role](content, **kwargs))
 
+    def reset(self) -> None:
+        """Forget the previous run so the agent can take a new request.
+
+        Clears memory, state and the step counter; tools and connections are kept.
+        """
+        self.memory.clear()
+        self.state = AgentState.IDLE
+        self.current_step = 0
+
     async def run(self, request: Optional[str] = None) -> str:
         """Execute the agent's main loop asynchronously.
 
@@ -164,7 +176,9 @@ class BaseAgent(BaseModel, ABC):
         """Handle stuck state by adding a prompt to change strategy"""
         stuck_prompt = "\
         Observed duplicate responses. Consider new strategies and avoid repeating ineffective paths already attempted."
-        self.next_step_prompt = f"{stuck_prompt}\n{self.next_step_prompt}"
+        # Appended to the history rather than prepended to next_step_prompt, so the
+        # prompt prefix stays stable and the notice does not pile up on every detection
+        self.memory.add_message(Message.user_message(stuck_prompt.strip()))
         logger.warning(f"Agent detected stuck state. Added prompt: {stuck_prompt}")
 
     def is_stuck(self) -> bool:
@@ -185,6 +199,27 @@ class BaseAgent(BaseModel, ABC):
 
         return duplicate_count >= self.duplicate_threshold
 
+    def json_answer(self) -> Optional[Any]:
+        """The newest JSON object or array the agent wrote as an assistant message.
+
+        run() returns a summary of the steps taken; callers that asked for a
+        JSON answer read it from memory with this instead. Code fences are
+        stripped. None when no assistant message parses as JSON.
+        """
+        for message in reversed(self.memory.messages):
+            if message.role != "assistant" or not message.content:
+                continue
+            text = message.content.strip()
+            if text.startswith("```"):
+                text = text.split("\n", 1)[-1].rsplit("```", 1)[0]
+            try:
+                answer = json.loads(text)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(answer, (dict, list)):
+                return answer
+        return None
+
     @property
     def messages(self) -> List[Message]:
         """Retrieve a list of messages from the agent's memory."""
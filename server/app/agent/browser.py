@@ -4,6 +4,7 @@ from typing import TYPE_CHECKING, Optional
 from pydantic import Field, model_validator
 
 from server.app.agent.toolcall import ToolCallAgent
+from server.app.config import config
 from server.app.logger import logger
 from server.app.prompt.browser import NEXT_STEP_PROMPT, SYSTEM_PROMPT
 from server.app.schema import Message, ToolChoice
@@ -19,6 +20,9 @@ class BrowserContextHelper:
     def __init__(self, agent: "BaseAgent"):
         self.agent = agent
         self._current_base64_image: Optional[str] = None
+        # Only the newest screenshots stay in the outgoing history
+        if config.browser_config and getattr(agent, "memory", None) is not None:
+            agent.memory.max_images = config.browser_config.screenshot_history
 
     async def get_browser_state(self) -> Optional[dict]:
         browser_tool = self.agent.available_tools.get_tool(BrowserUseTool().name)
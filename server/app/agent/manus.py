@@ -1,3 +1,4 @@
+import asyncio
 from typing import Dict, List, Optional
 
 from pydantic import Field, model_validator
@@ -7,7 +8,7 @@ from server.app.agent.toolcall import ToolCallAgent
 from server.app.config import config
 from server.app.logger import logger
 from server.app.prompt.manus import NEXT_STEP_PROMPT, SYSTEM_PROMPT
-from server.app.tool import Terminate, ToolCollection
+from server.app.tool import BaseTool, Terminate, ToolCollection
 from server.app.tool.ask_human import AskHuman
 from server.app.tool.browser_use_tool import BrowserUseTool
 from server.app.tool.mcp import MCPClients, MCPClientTool
@@ -15,6 +16,17 @@ from server.app.tool.python_execute import PythonExecute
 from server.app.tool.str_replace_editor import StrReplaceEditor
 
 
+def _local_tools() -> List[BaseTool]:
+    """Fresh instances of the general-purpose tools every Manus agent starts with"""
+    return [
+        PythonExecute(),
+        BrowserUseTool(),
+        StrReplaceEditor(),
+        AskHuman(),
+        Terminate(),
+    ]
+
+
 class Manus(ToolCallAgent):
     """A versatile general-purpose agent with support for both local and MCP tools."""
 
@@ -32,13 +44,7 @@ class Manus(ToolCallAgent):
 
     # Add general-purpose tools to the tool collection
     available_tools: ToolCollection = Field(
-        default_factory=lambda: ToolCollection(
-            PythonExecute(),
-            BrowserUseTool(),
-            StrReplaceEditor(),
-            AskHuman(),
-            Terminate(),
-        )
+        default_factory=lambda: ToolCollection(*_local_tools())
     )
 
     special_tool_names: list[str] = Field(default_factory=lambda: [Terminate().name])
@@ -50,6 +56,9 @@ class Manus(ToolCallAgent):
     )  # server_id -> url/command
     _initialized: bool = False
 
+    # Pooled agents keep their MCP sessions between runs; AgentPool closes them
+    pooled: bool = False
+
     @model_validator(mode="after")
     def initialize_helper(self) -> "Manus":
         """Initialize basic components synchronously."""
@@ -133,10 +142,39 @@ class Manus(ToolCallAgent):
         if self.browser_context_helper:
             await self.browser_context_helper.cleanup_browser()
         # Disconnect from all MCP servers only if we were initialized
-        if self._initialized:
+        if self._initialized and not self.pooled:
             await self.disconnect_mcp_server()
             self._initialized = False
 
+    async def close(self) -> None:
+        """Release all resources, MCP sessions included, even for a pooled agent."""
+        self.pooled = False
+        await self.cleanup()
+
+    def reset(self) -> None:
+        """Forget the previous run; only the MCP sessions and their tools carry over.
+
+        The local tools hold per-request state (the editor's undo history, the
+        browser and its last screenshot), so they are replaced with fresh ones.
+        """
+        super().reset()
+        self.available_tools = ToolCollection(*_local_tools())
+        self.available_tools.add_tools(*self.mcp_clients.tools)
+        # think() swaps in the browser prompt and may have been interrupted
+        self.next_step_prompt = NEXT_STEP_PROMPT
+        if self.browser_context_helper:
+            self.browser_context_helper._current_base64_image = None
+
+    async def check_health(self, timeout: float = 5.0) -> bool:
+        """Whether every connected MCP server still answers a ping."""
+        for server_id, session in list(self.mcp_clients.sessions.items()):
+            try:
+                await asyncio.wait_for(session.send_ping(), timeout)
+            except Exception as e:
+                logger.warning(f"MCP server {server_id} failed its health check: {e}")
+                return False
+        return True
+
     async def think(self) -> bool:
         """Process current state and decide next actions with appropriate context."""
         if not self._initialized:
@@ -0,0 +1,296 @@
+import asyncio
+import contextvars
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Set
+
+from server.app.agent.manus import Manus
+from server.app.config import AgentPoolSettings, config
+from server.app.exceptions import AgentPoolExhausted
+from server.app.logger import logger
+
+# Seconds an agent's health check may take before it counts as failed
+HEALTH_CHECK_TIMEOUT = 10.0
+# Seconds close() waits for agents to shut down
+CLOSE_TIMEOUT = 10.0
+
+
+class PooledAgent:
+    """One pooled agent and the task that owns its lifetime"""
+
+    def __init__(self):
+        self.agent: Optional[Manus] = None
+        self.uses = 0
+        self.checked_at = time.monotonic()
+        self.used_at = self.checked_at
+        self.ready: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.retire = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+
+class AgentPool:
+    """Bounded pool of initialized agents reused across requests.
+
+    Building an agent (its tools and MCP server connections) happens once per
+    pooled agent instead of once per request. Between uses an agent is reset:
+    memory, state and step counter are cleared and its local tools are
+    rebuilt, so no request sees another's editor history or browser; only
+    the MCP sessions and their tools stay open. At most ``max_size`` agents are alive; a request that
+    finds them all busy waits up to ``acquire_timeout`` seconds and then gets
+    AgentPoolExhausted. A background task keeps ``min_size`` agents warm,
+    health-checks idle ones every ``health_check_interval`` seconds and closes
+    agents above ``min_size`` that were idle for ``idle_timeout``. Agents are
+    replaced after ``max_uses`` runs, when a run is cancelled midway and when
+    a reset or health check fails.
+
+    Each agent is created and closed by a task of its own: the MCP transports
+    must be exited by the task that entered them, which a request task that
+    borrows the agent is not.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], Awaitable[Manus]],
+        settings: Optional[AgentPoolSettings] = None,
+    ):
+        settings = settings or AgentPoolSettings()
+        self.name = name
+        self.factory = factory
+        self.min_size = min(settings.min_size, settings.max_size)
+        self.max_size = max(1, settings.max_size)
+        self.max_uses = settings.max_uses
+        self.acquire_timeout = settings.acquire_timeout
+        self.idle_timeout = settings.idle_timeout
+        self.health_check_interval = settings.health_check_interval
+        # A slot is held while an agent is borrowed, created or health-checked,
+        # so idle plus busy agents never exceed max_size
+        self._slots = asyncio.Semaphore(self.max_size)
+        self._idle: Deque[PooledAgent] = deque()
+        self._owners: Set[asyncio.Task] = set()
+        self._in_use = 0
+        self._wake = asyncio.Event()
+        self._maintainer: Optional[asyncio.Task] = None
+        self._closed = False
+        self._stats = {
+            "created": 0,
+            "create_failures": 0,
+            "reused": 0,
+            "retired": 0,
+            "health_failures": 0,
+            "timeouts": 0,
+        }
+
+    @asynccontextmanager
+    async def agent(self) -> AsyncIterator[Manus]:
+        """Borrow an idle agent (or create one) for the duration of the block"""
+        entry = await self._acquire()
+        try:
+            yield entry.agent
+        except asyncio.CancelledError:
+            # A run stopped midway may leave a tool or MCP call outstanding
+            self._retire(entry)
+            entry = None
+            raise
+        finally:
+            if entry is not None:
+                self._release(entry)
+            self._in_use -= 1
+            self._slots.release()
+
+    def start(self) -> None:
+        """Start warming ``min_size`` agents and health-checking them in the background"""
+        if self._closed:
+            return
+        if self._maintainer is None or self._maintainer.done():
+            self._maintainer = asyncio.create_task(
+                self._maintain(), context=contextvars.Context()
+            )
+
+    async def close(self) -> None:
+        """Close idle agents now and borrowed ones as they are returned"""
+        self._closed = True
+        if self._maintainer is not None:
+            self._maintainer.cancel()
+            await asyncio.gather(self._maintainer, return_exceptions=True)
+        while self._idle:
+            self._retire(self._idle.pop())
+        if self._owners:
+            await asyncio.wait(set(self._owners), timeout=CLOSE_TIMEOUT)
+
+    async def _acquire(self) -> PooledAgent:
+        if self._closed:
+            raise RuntimeError(f"Agent pool {self.name} is closed")
+        self.start()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self._stats["timeouts"] += 1
+            raise AgentPoolExhausted(self.name, self.acquire_timeout)
+        try:
+            if self._idle:
+                # Most recently used first: its browser and caches are warmest
+                entry = self._idle.pop()
+                self._stats["reused"] += 1
+            else:
+                entry = await self._create()
+        except BaseException:
+            self._slots.release()
+            raise
+        self._in_use += 1
+        return entry
+
+    def _release(self, entry: PooledAgent) -> None:
+        entry.uses += 1
+        entry.used_at = time.monotonic()
+        if self._closed or entry.uses >= self.max_uses:
+            self._retire(entry)
+            return
+        try:
+            entry.agent.reset()
+        except Exception as e:
+            logger.warning(f"Agent pool {self.name}: reset failed, replacing the agent: {e}")
+            self._retire(entry)
+            return
+        self._idle.append(entry)
+
+    async def _create(self) -> PooledAgent:
+        """Start an owner task for a new agent and wait until the agent is ready"""
+        entry = PooledAgent()
+        # No request context (token run, priority) leaks into the agent's own task
+        entry.task = asyncio.create_task(self._own(entry), context=contextvars.Context())
+        self._owners.add(entry.task)
+        entry.task.add_done_callback(self._owners.discard)
+        try:
+            await asyncio.shield(entry.ready)
+        except asyncio.CancelledError:
+            # The owner still finishes creating the agent, then closes it
+            self._retire(entry)
+            raise
+        return entry
+
+    async def _own(self, entry: PooledAgent) -> None:
+        """Create, hold and finally close one agent, all within this task"""
+        try:
+            agent = await self.factory()
+        except Exception as e:
+            self._stats["create_failures"] += 1
+            logger.error(f"Agent pool {self.name}: could not create an agent: {e}")
+            if not entry.ready.done():
+                entry.ready.set_exception(e)
+                # Retrieved by the waiting request, if it is still waiting
+                entry.ready.exception()
+            return
+        entry.agent = agent
+        self._stats["created"] += 1
+        entry.ready.set_result(agent)
+        await entry.retire.wait()
+        try:
+            await agent.close()
+        except Exception as e:
+            logger.warning(f"Agent pool {self.name}: error while closing an agent: {e}")
+
+    def _retire(self, entry: PooledAgent) -> None:
+        """Have the owner task close the agent, and wake the maintainer to replace it"""
+        if entry.retire.is_set():
+            return
+        self._stats["retired"] += 1
+        entry.retire.set()
+        self._wake.set()
+
+    async def _maintain(self) -> None:
+        interval = self.health_check_interval or 30.0
+        while not self._closed:
+            try:
+                await self._top_up()
+                await self._check_idle()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Agent pool {self.name} maintenance failed: {e}")
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def _alive(self) -> int:
+        return len(self._idle) + self._in_use
+
+    async def _top_up(self) -> None:
+        """Create agents until ``min_size`` are idle or in use"""
+        while not self._closed and self._alive() < self.min_size:
+            async with self._slots:
+                if self._alive() >= self.min_size:
+                    return
+                self._idle.appendleft(await self._create())
+
+    async def _check_idle(self) -> None:
+        """Close surplus idle agents and replace those failing their health check"""
+        now = time.monotonic()
+        for entry in list(self._idle):
+            if entry not in self._idle:
+                continue
+            if (
+                self.idle_timeout
+                and now - entry.used_at > self.idle_timeout
+                and self._alive() > self.min_size
+            ):
+                self._idle.remove(entry)
+                self._retire(entry)
+                continue
+            if not self.health_check_interval or now - entry.checked_at < self.health_check_interval:
+                continue
+            async with self._slots:
+                if entry not in self._idle:
+                    continue
+                self._idle.remove(entry)
+                healthy = await self._healthy(entry)
+                if healthy:
+                    entry.checked_at = time.monotonic()
+                    self._idle.appendleft(entry)
+                else:
+                    self._stats["health_failures"] += 1
+                    self._retire(entry)
+
+    async def _healthy(self, entry: PooledAgent) -> bool:
+        try:
+            return await asyncio.wait_for(entry.agent.check_health(), HEALTH_CHECK_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Agent pool {self.name}: health check failed: {e}")
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "idle": len(self._idle),
+            "in_use": self._in_use,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            **self._stats,
+        }
+
+
+_pools: Dict[str, AgentPool] = {}
+
+
+async def _create_manus() -> Manus:
+    return await Manus.create(pooled=True)
+
+
+def get_manus_pool() -> AgentPool:
+    """Process-wide pool of Manus agents shared by the API routes"""
+    if "manus" not in _pools:
+        _pools["manus"] = AgentPool("manus", _create_manus, config.agent_pool_config)
+    return _pools["manus"]
+
+
+def agent_pool_stats() -> List[Dict[str, Any]]:
+    return [pool.stats() for pool in _pools.values()]
+
+
+async def close_agent_pools() -> None:
+    for pool in list(_pools.values()):
+        await pool.close()
+    _pools.clear()
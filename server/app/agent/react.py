@@ -4,8 +4,8 @@ from typing import Optional
 from pydantic import Field
 
 from server.app.agent.base import BaseAgent
-from app.llm import LLM
-from app.schema import AgentState, Memory
+from server.app.llm import LLM
+from server.app.schema import AgentState, Memory
 
 
 class ReActAgent(BaseAgent, ABC):
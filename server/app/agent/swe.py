@@ -2,7 +2,7 @@ from typing import List
 
 from pydantic import Field
 
-from app.agent.toolcall import ToolCallAgent
+from server.app.agent.toolcall import ToolCallAgent
 from server.app.prompt.swe import SYSTEM_PROMPT
 from server.app.tool import Bash, StrReplaceEditor, Terminate, ToolCollection
 
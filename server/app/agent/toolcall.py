@@ -1,6 +1,6 @@
 import asyncio
 import json
-from typing import Any, List, Optional, Union
+from typing import Any, List, Optional, Tuple, Union
 
 from pydantic import Field
 
@@ -32,25 +32,33 @@ class ToolCallAgent(ReActAgent):
 
     tool_calls: List[ToolCall] = Field(default_factory=list)
     _current_base64_image: Optional[str] = None
+    _system_cache: Optional[Tuple[str, List[Message]]] = None
 
     max_steps: int = 30
     max_observe: Optional[Union[int, bool]] = None
 
+    def _system_messages(self) -> Optional[List[Message]]:
+        """System message for the request prefix, rebuilt only when the prompt changes"""
+        if not self.system_prompt:
+            return None
+        cached = self._system_cache
+        if cached is None or cached[0] != self.system_prompt:
+            cached = (self.system_prompt, [Message.system_message(self.system_prompt)])
+            self._system_cache = cached
+        return cached[1]
+
     async def think(self) -> bool:
         """Process current state and decide next actions using tools"""
         if self.next_step_prompt:
             user_msg = Message.user_message(self.next_step_prompt)
-            self.messages += [user_msg]
+            self.memory.add_message(user_msg)
 
         try:
             # Get response with tool options
+            # System prompt and tools first, unchanged between steps; history after
             response = await self.llm.ask_tool(
                 messages=self.messages,
-                system_msgs=(
-                    [Message.system_message(self.system_prompt)]
-                    if self.system_prompt
-                    else None
-                ),
+                system_msgs=self._system_messages(),
                 tools=self.available_tools.to_params(),
                 tool_choice=self.tool_choices,
             )
@@ -226,6 +234,12 @@ class ToolCallAgent(ReActAgent):
         """Check if tool name is in special tools list"""
         return name.lower() in [n.lower() for n in self.special_tool_names]
 
+    def reset(self) -> None:
+        """Forget the previous run, including pending tool calls and images."""
+        super().reset()
+        self.tool_calls = []
+        self._current_base64_image = None
+
     async def cleanup(self):
         """Clean up resources used by the agent's tools."""
         logger.info(f"🧹 Cleaning up resources for agent '{self.name}'...")
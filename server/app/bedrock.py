@@ -1,16 +1,20 @@
+import asyncio
 import json
 import sys
+import threading
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Literal, Optional
+from typing import AsyncIterator, Dict, List, Literal, Optional, Union
 
 import boto3
+from botocore.config import Config
 
 
-# Global variables to track the current tool use ID across function calls
-# Tmp solution
-CURRENT_TOOLUSE_ID = None
+# Concurrent Bedrock calls per process; each in-flight call holds one worker thread
+# and one pooled HTTP connection for its whole duration (streams included)
+BEDROCK_MAX_CONCURRENCY = 16
 
 
 # Class to handle OpenAI-style response formatting
@@ -36,11 +40,19 @@ class OpenAIResponse:
 
 # Main client class for interacting with Amazon Bedrock
 class BedrockClient:
-    def __init__(self):
+    def __init__(self, max_concurrency: int = BEDROCK_MAX_CONCURRENCY):
         # Initialize Bedrock client, you need to configure AWS env first
         try:
-            self.client = boto3.client("bedrock-runtime")
-            self.chat = Chat(self.client)
+            self.client = boto3.client(
+                "bedrock-runtime",
+                config=Config(max_pool_connections=max_concurrency),
+            )
+            # boto3 is blocking: calls run on a dedicated pool so they never
+            # stall the event loop or starve the default executor
+            self.executor = ThreadPoolExecutor(
+                max_workers=max_concurrency, thread_name_prefix="bedrock"
+            )
+            self.chat = Chat(self.client, self.executor)
         except Exception as e:
             print(f"Error initializing Bedrock client: {e}")
             sys.exit(1)
@@ -48,14 +60,141 @@ class BedrockClient:
 
 # Chat interface class
 class Chat:
-    def __init__(self, client):
-        self.completions = ChatCompletions(client)
+    def __init__(self, client, executor: ThreadPoolExecutor):
+        self.completions = ChatCompletions(client, executor)
+
+
+# Async iterator of OpenAI-style chunks over a Bedrock converse_stream event stream
+class BedrockStream:
+    _DONE = object()
+
+    def __init__(self, event_stream, executor: ThreadPoolExecutor):
+        self._event_stream = event_stream
+        self._executor = executor
+        self._queue: Optional[asyncio.Queue] = None
+        self._closed = threading.Event()
+        # Per-stream state: Bedrock content block index -> OpenAI tool call index
+        self._tool_indexes: Dict[int, int] = {}
+        self.id = f"chatcmpl-{uuid.uuid4()}"
+        self.created = int(time.time())
+
+    def _pump(self, loop: asyncio.AbstractEventLoop) -> None:
+        # Runs on the executor: read events off the HTTP stream and hand them to the loop
+        try:
+            for event in self._event_stream:
+                if self._closed.is_set():
+                    break
+                loop.call_soon_threadsafe(self._queue.put_nowait, event)
+            loop.call_soon_threadsafe(self._queue.put_nowait, self._DONE)
+        except Exception as e:
+            loop.call_soon_threadsafe(self._queue.put_nowait, e)
+        finally:
+            self._event_stream.close()
+
+    def _chunk(
+        self,
+        content: Optional[str] = None,
+        tool_call: Optional[dict] = None,
+        finish_reason: Optional[str] = None,
+        usage: Optional[dict] = None,
+    ) -> OpenAIResponse:
+        choices = []
+        if content is not None or tool_call is not None or finish_reason is not None:
+            choices.append(
+                {
+                    "index": 0,
+                    "delta": {
+                        "role": "assistant",
+                        "content": content,
+                        "tool_calls": [tool_call] if tool_call else None,
+                    },
+                    "finish_reason": finish_reason,
+                }
+            )
+        return OpenAIResponse(
+            {
+                "id": self.id,
+                "created": self.created,
+                "object": "chat.completion.chunk",
+                "choices": choices,
+                "usage": usage,
+            }
+        )
+
+    def _convert_event(self, event: dict) -> Optional[OpenAIResponse]:
+        # Map one Bedrock stream event to an OpenAI chunk (None for events with no delta)
+        if "contentBlockStart" in event:
+            start = event["contentBlockStart"]
+            tool_use = start.get("start", {}).get("toolUse")
+            if tool_use:
+                index = len(self._tool_indexes)
+                self._tool_indexes[start["contentBlockIndex"]] = index
+                return self._chunk(
+                    tool_call={
+                        "index": index,
+                        "id": tool_use["toolUseId"],
+                        "type": "function",
+                        "function": {"name": tool_use["name"], "arguments": ""},
+                    }
+                )
+        elif "contentBlockDelta" in event:
+            block = event["contentBlockDelta"]
+            delta = block.get("delta", {})
+            if delta.get("text"):
+                return self._chunk(content=delta["text"])
+            if "toolUse" in delta:
+                return self._chunk(
+                    tool_call={
+                        "index": self._tool_indexes.get(block["contentBlockIndex"], 0),
+                        "id": None,
+                        "type": "function",
+                        "function": {"name": None, "arguments": delta["toolUse"].get("input", "")},
+                    }
+                )
+        elif "messageStop" in event:
+            return self._chunk(finish_reason=event["messageStop"].get("stopReason", "end_turn"))
+        elif "metadata" in event:
+            usage = event["metadata"].get("usage", {})
+            return self._chunk(
+                usage={
+                    "prompt_tokens": usage.get("inputTokens", 0),
+                    "completion_tokens": usage.get("outputTokens", 0),
+                    "total_tokens": usage.get("totalTokens", 0),
+                    "prompt_tokens_details": {
+                        "cached_tokens": usage.get("cacheReadInputTokens", 0)
+                    },
+                }
+            )
+        return None
+
+    async def __aiter__(self) -> AsyncIterator[OpenAIResponse]:
+        loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        pump = loop.run_in_executor(self._executor, self._pump, loop)
+        try:
+            while True:
+                item = await self._queue.get()
+                if item is self._DONE:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                chunk = self._convert_event(item)
+                if chunk is not None:
+                    yield chunk
+            await pump
+        finally:
+            # Consumer stopped early (error, cancellation): closing the HTTP stream
+            # unblocks the reader thread so it releases its worker and connection
+            self._closed.set()
+            if not pump.done():
+                self._event_stream.close()
 
 
 # Core class handling chat completions functionality
 class ChatCompletions:
-    def __init__(self, client):
+    def __init__(self, client, executor: ThreadPoolExecutor):
         self.client = client
+        self.executor = executor
 
     def _convert_openai_tools_to_bedrock_format(self, tools):
         # Convert OpenAI function calling format to Bedrock tool format
@@ -87,46 +226,52 @@ class ChatCompletions:
         # Convert OpenAI message format to Bedrock message format
         bedrock_messages = []
         system_prompt = []
+        # Tool results without a tool_call_id answer the latest call of this conversation
+        last_tool_use_id = None
         for message in messages:
+            content = message.get("content")
             if message.get("role") == "system":
-                system_prompt = [{"text": message.get("content")}]
+                system_prompt = [{"text": content}]
             elif message.get("role") == "user":
                 bedrock_message = {
                     "role": message.get("role", "user"),
-                    "content": [{"text": message.get("content")}],
+                    "content": [{"text": content}],
                 }
                 bedrock_messages.append(bedrock_message)
             elif message.get("role") == "assistant":
                 bedrock_message = {
                     "role": "assistant",
-                    "content": [{"text": message.get("content")}],
+                    "content": [{"text": content}] if content else [],
                 }
-                openai_tool_calls = message.get("tool_calls", [])
-                if openai_tool_calls:
-                    bedrock_tool_use = {
-                        "toolUseId": openai_tool_calls[0]["id"],
-                        "name": openai_tool_calls[0]["function"]["name"],
-                        "input": json.loads(
-                            openai_tool_calls[0]["function"]["arguments"]
-                        ),
-                    }
-                    bedrock_message["content"].append({"toolUse": bedrock_tool_use})
-                    global CURRENT_TOOLUSE_ID
-                    CURRENT_TOOLUSE_ID = openai_tool_calls[0]["id"]
-                bedrock_messages.append(bedrock_message)
-            elif message.get("role") == "tool":
-                bedrock_message = {
-                    "role": "user",
-                    "content": [
+                for tool_call in message.get("tool_calls") or []:
+                    bedrock_message["content"].append(
                         {
-                            "toolResult": {
-                                "toolUseId": CURRENT_TOOLUSE_ID,
-                                "content": [{"text": message.get("content")}],
+                            "toolUse": {
+                                "toolUseId": tool_call["id"],
+                                "name": tool_call["function"]["name"],
+                                "input": json.loads(
+                                    tool_call["function"]["arguments"] or "{}"
+                                ),
                             }
                         }
-                    ],
-                }
+                    )
+                    last_tool_use_id = tool_call["id"]
                 bedrock_messages.append(bedrock_message)
+            elif message.get("role") == "tool":
+                tool_result = {
+                    "toolResult": {
+                        "toolUseId": message.get("tool_call_id") or last_tool_use_id,
+                        "content": [{"text": content}],
+                    }
+                }
+                # Bedrock wants every result for one assistant turn in a single user message
+                previous = bedrock_messages[-1] if bedrock_messages else None
+                if previous and previous["role"] == "user" and all(
+                    "toolResult" in block for block in previous["content"]
+                ):
+                    previous["content"].append(tool_result)
+                else:
+                    bedrock_messages.append({"role": "user", "content": [tool_result]})
             else:
                 raise ValueError(f"Invalid role: {message.get('role')}")
         return system_prompt, bedrock_messages
@@ -146,10 +291,8 @@ class ChatCompletions:
             for content_item in bedrock_response["output"]["message"]["content"]:
                 if content_item.get("toolUse"):
                     bedrock_tool_use = content_item["toolUse"]
-                    global CURRENT_TOOLUSE_ID
-                    CURRENT_TOOLUSE_ID = bedrock_tool_use["toolUseId"]
                     openai_tool_call = {
-                        "id": CURRENT_TOOLUSE_ID,
+                        "id": bedrock_tool_use["toolUseId"],
                         "type": "function",
                         "function": {
                             "name": bedrock_tool_use["name"],
@@ -188,10 +331,43 @@ class ChatCompletions:
                     "inputTokens", 0
                 ),
                 "total_tokens": bedrock_response.get("usage", {}).get("totalTokens", 0),
+                "prompt_tokens_details": {
+                    "cached_tokens": bedrock_response.get("usage", {}).get(
+                        "cacheReadInputTokens", 0
+                    )
+                },
             },
         }
         return OpenAIResponse(openai_format)
 
+    def _converse_params(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float,
+        tools: Optional[List[dict]],
+        tool_choice: Literal["none", "auto", "required"],
+    ) -> dict:
+        # Build converse/converse_stream arguments; optional structures are omitted, not None
+        (
+            system_prompt,
+            bedrock_messages,
+        ) = self._convert_openai_messages_to_bedrock_format(messages)
+        params = {
+            "modelId": model,
+            "messages": bedrock_messages,
+            "inferenceConfig": {"temperature": temperature, "maxTokens": max_tokens},
+        }
+        if system_prompt:
+            params["system"] = system_prompt
+        if tools and tool_choice != "none":
+            params["toolConfig"] = {
+                "tools": tools,
+                "toolChoice": {"any": {}} if tool_choice == "required" else {"auto": {}},
+            }
+        return params
+
     async def _invoke_bedrock(
         self,
         model: str,
@@ -202,20 +378,15 @@ class ChatCompletions:
         tool_choice: Literal["none", "auto", "required"] = "auto",
         **kwargs,
     ) -> OpenAIResponse:
-        # Non-streaming invocation of Bedrock model
-        (
-            system_prompt,
-            bedrock_messages,
-        ) = self._convert_openai_messages_to_bedrock_format(messages)
-        response = self.client.converse(
-            modelId=model,
-            system=system_prompt,
-            messages=bedrock_messages,
-            inferenceConfig={"temperature": temperature, "maxTokens": max_tokens},
-            toolConfig={"tools": tools} if tools else None,
+        # Non-streaming invocation of Bedrock model, off the event loop
+        params = self._converse_params(
+            model, messages, max_tokens, temperature, tools, tool_choice
+        )
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            self.executor, lambda: self.client.converse(**params)
         )
-        openai_response = self._convert_bedrock_response_to_openai_format(response)
-        return openai_response
+        return self._convert_bedrock_response_to_openai_format(response)
 
     async def _invoke_bedrock_stream(
         self,
@@ -226,78 +397,18 @@ class ChatCompletions:
         tools: Optional[List[dict]] = None,
         tool_choice: Literal["none", "auto", "required"] = "auto",
         **kwargs,
-    ) -> OpenAIResponse:
-        # Streaming invocation of Bedrock model
-        (
-            system_prompt,
-            bedrock_messages,
-        ) = self._convert_openai_messages_to_bedrock_format(messages)
-        response = self.client.converse_stream(
-            modelId=model,
-            system=system_prompt,
-            messages=bedrock_messages,
-            inferenceConfig={"temperature": temperature, "maxTokens": max_tokens},
-            toolConfig={"tools": tools} if tools else None,
+    ) -> BedrockStream:
+        # Streaming invocation of Bedrock model: deltas are yielded as they arrive
+        params = self._converse_params(
+            model, messages, max_tokens, temperature, tools, tool_choice
         )
-
-        # Initialize response structure
-        bedrock_response = {
-            "output": {"message": {"role": "", "content": []}},
-            "stopReason": "",
-            "usage": {},
-            "metrics": {},
-        }
-        bedrock_response_text = ""
-        bedrock_response_tool_input = ""
-
-        # Process streaming response
-        stream = response.get("stream")
-        if stream:
-            for event in stream:
-                if event.get("messageStart", {}).get("role"):
-                    bedrock_response["output"]["message"]["role"] = event[
-                        "messageStart"
-                    ]["role"]
-                if event.get("contentBlockDelta", {}).get("delta", {}).get("text"):
-                    bedrock_response_text += event["contentBlockDelta"]["delta"]["text"]
-                    print(
-                        event["contentBlockDelta"]["delta"]["text"], end="", flush=True
-                    )
-                if event.get("contentBlockStop", {}).get("contentBlockIndex") == 0:
-                    bedrock_response["output"]["message"]["content"].append(
-                        {"text": bedrock_response_text}
-                    )
-                if event.get("contentBlockStart", {}).get("start", {}).get("toolUse"):
-                    bedrock_tool_use = event["contentBlockStart"]["start"]["toolUse"]
-                    tool_use = {
-                        "toolUseId": bedrock_tool_use["toolUseId"],
-                        "name": bedrock_tool_use["name"],
-                    }
-                    bedrock_response["output"]["message"]["content"].append(
-                        {"toolUse": tool_use}
-                    )
-                    global CURRENT_TOOLUSE_ID
-                    CURRENT_TOOLUSE_ID = bedrock_tool_use["toolUseId"]
-                if event.get("contentBlockDelta", {}).get("delta", {}).get("toolUse"):
-                    bedrock_response_tool_input += event["contentBlockDelta"]["delta"][
-                        "toolUse"
-                    ]["input"]
-                    print(
-                        event["contentBlockDelta"]["delta"]["toolUse"]["input"],
-                        end="",
-                        flush=True,
-                    )
-                if event.get("contentBlockStop", {}).get("contentBlockIndex") == 1:
-                    bedrock_response["output"]["message"]["content"][1]["toolUse"][
-                        "input"
-                    ] = json.loads(bedrock_response_tool_input)
-        print()
-        openai_response = self._convert_bedrock_response_to_openai_format(
-            bedrock_response
+        loop = asyncio.get_running_loop()
+        response = await loop.run_in_executor(
+            self.executor, lambda: self.client.converse_stream(**params)
         )
-        return openai_response
+        return BedrockStream(response["stream"], self.executor)
 
-    def create(
+    async def create(
         self,
         model: str,
         messages: List[Dict[str, str]],
@@ -307,23 +418,14 @@ class ChatCompletions:
         tools: Optional[List[dict]] = None,
         tool_choice: Literal["none", "auto", "required"] = "auto",
         **kwargs,
-    ) -> OpenAIResponse:
-        # Main entry point for chat completion
+    ) -> Union[OpenAIResponse, BedrockStream]:
+        # Main entry point for chat completion, mirroring AsyncOpenAI: a response,
+        # or an async iterator of chunks when stream=True
         bedrock_tools = []
         if tools is not None:
             bedrock_tools = self._convert_openai_tools_to_bedrock_format(tools)
         if stream:
-            return self._invoke_bedrock_stream(
-                model,
-                messages,
-                max_tokens,
-                temperature,
-                bedrock_tools,
-                tool_choice,
-                **kwargs,
-            )
-        else:
-            return self._invoke_bedrock(
+            return await self._invoke_bedrock_stream(
                 model,
                 messages,
                 max_tokens,
@@ -332,3 +434,12 @@ class ChatCompletions:
                 tool_choice,
                 **kwargs,
             )
+        return await self._invoke_bedrock(
+            model,
+            messages,
+            max_tokens,
+            temperature,
+            bedrock_tools,
+            tool_choice,
+            **kwargs,
+        )
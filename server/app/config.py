@@ -1,4 +1,5 @@
 import json
+import os
 import threading
 import tomllib
 from pathlib import Path
@@ -28,6 +29,83 @@ class LLMSettings(BaseModel):
     temperature: float = Field(1.0, description="Sampling temperature")
     api_type: str = Field(..., description="Azure, Openai, or Ollama")
     api_version: str = Field(..., description="Azure Openai version if AzureOpenai")
+    max_concurrency: int = Field(
+        8, description="Maximum concurrent requests to this model from this process"
+    )
+    rpm_limit: Optional[int] = Field(
+        None, description="Requests per minute budget (None for unlimited)"
+    )
+    tpm_limit: Optional[int] = Field(
+        None, description="Tokens per minute budget, input plus max output (None for unlimited)"
+    )
+    max_retries: int = Field(
+        5, description="Retries of transient failures (rate limits, timeouts, 5xx) per call"
+    )
+    retry_max_wait: float = Field(
+        60.0, description="Longest backoff between retries in seconds, Retry-After included"
+    )
+    breaker_failure_threshold: int = Field(
+        5, description="Consecutive transient failures that open the endpoint's circuit (0 disables)"
+    )
+    breaker_reset_timeout: float = Field(
+        30.0, description="Seconds an open circuit fails fast before letting a probe through"
+    )
+    hedge_percentile: Optional[float] = Field(
+        None,
+        description="Send a duplicate non-streaming request once a call exceeds this provider "
+        "latency percentile, e.g. 95 (None disables hedging); time queued in the scheduler "
+        "is not counted, and no duplicate is sent while calls are queueing",
+    )
+    hedge_min_samples: int = Field(
+        20, description="Latencies observed before hedging starts"
+    )
+    backends: List[str] = Field(
+        default_factory=list,
+        description="Other [llm.<name>] configs that can serve this one; requests go to "
+        "the fastest healthy of them and fail over on provider errors",
+    )
+
+
+class LLMCacheSettings(BaseModel):
+    enabled: bool = Field(
+        False, description="Serve repeated LLM requests from the completion cache"
+    )
+    ttl: int = Field(3600, description="Seconds a cached completion stays valid")
+    memory_max_entries: int = Field(
+        256, description="Completions kept in the in-memory LRU tier"
+    )
+    disk_path: Optional[str] = Field(
+        str(PROJECT_ROOT / "cache" / "llm_completions.sqlite3"),
+        description="SQLite file for the persistent tier (None for memory only)",
+    )
+    disk_max_entries: int = Field(
+        10000, description="Completions kept in the SQLite tier"
+    )
+    max_entry_bytes: int = Field(
+        256 * 1024, description="Completions larger than this are not cached"
+    )
+    coalesce_in_flight: bool = Field(
+        False,
+        description="Share one provider call between identical concurrent requests; "
+        "call sites with deterministic prompts enable it with coalesce_requests()",
+    )
+
+
+class AgentPoolSettings(BaseModel):
+    min_size: int = Field(1, description="Initialized Manus agents kept ready for requests")
+    max_size: int = Field(
+        4, description="Most Manus agents alive at once; further requests wait for one"
+    )
+    max_uses: int = Field(50, description="Runs an agent serves before it is replaced")
+    acquire_timeout: float = Field(
+        30.0, description="Seconds a request waits for a free agent before failing"
+    )
+    idle_timeout: float = Field(
+        300.0, description="Seconds an agent above min_size may stay unused before it is closed"
+    )
+    health_check_interval: float = Field(
+        60.0, description="Seconds between health checks of idle agents (0 disables)"
+    )
 
 
 class ProxySettings(BaseModel):
@@ -89,6 +167,21 @@ class BrowserSettings(BaseModel):
     max_content_length: int = Field(
         2000, description="Maximum length for content retrieval operations"
     )
+    screenshot_full_page: bool = Field(
+        False, description="Capture the whole page instead of the visible viewport"
+    )
+    screenshot_quality: int = Field(70, description="JPEG quality of screenshots sent to the LLM")
+    screenshot_max_tiles: int = Field(
+        4, description="Downscale screenshots to at most this many 512px image tiles"
+    )
+    screenshot_dedupe_threshold: float = Field(
+        1.0,
+        description="Skip a screenshot whose perceptual fingerprint differs from the last one "
+        "sent by less than this mean gray level (negative disables)",
+    )
+    screenshot_history: int = Field(
+        1, description="Screenshots kept in the agent history; older ones are stripped"
+    )
 
 
 class SandboxSettings(BaseModel):
@@ -167,6 +260,12 @@ class AppConfig(BaseModel):
     run_flow_config: Optional[RunflowSettings] = Field(
         None, description="Run flow configuration"
     )
+    llm_cache_config: Optional[LLMCacheSettings] = Field(
+        None, description="LLM completion cache configuration"
+    )
+    agent_pool_config: Optional[AgentPoolSettings] = Field(
+        None, description="Pooled Manus agent configuration"
+    )
 
     class Config:
         arbitrary_types_allowed = True
@@ -194,6 +293,9 @@ class Config:
 
     @staticmethod
     def _get_config_path() -> Path:
+        override = os.environ.get("OPENMANUS_CONFIG")
+        if override:
+            return Path(override)
         root = PROJECT_ROOT
         config_path = root / "config" / "config.toml"
         if config_path.exists():
@@ -224,6 +326,16 @@ class Config:
             "temperature": base_llm.get("temperature", 1.0),
             "api_type": base_llm.get("api_type", ""),
             "api_version": base_llm.get("api_version", ""),
+            "max_concurrency": base_llm.get("max_concurrency", 8),
+            "rpm_limit": base_llm.get("rpm_limit"),
+            "tpm_limit": base_llm.get("tpm_limit"),
+            "max_retries": base_llm.get("max_retries", 5),
+            "retry_max_wait": base_llm.get("retry_max_wait", 60.0),
+            "breaker_failure_threshold": base_llm.get("breaker_failure_threshold", 5),
+            "breaker_reset_timeout": base_llm.get("breaker_reset_timeout", 30.0),
+            "hedge_percentile": base_llm.get("hedge_percentile"),
+            "hedge_min_samples": base_llm.get("hedge_min_samples", 20),
+            "backends": base_llm.get("backends", []),
         }
 
         # handle browser config.
@@ -283,11 +395,16 @@ class Config:
             run_flow_settings = RunflowSettings(**run_flow_config)
         else:
             run_flow_settings = RunflowSettings()
+
+        llm_cache_config = raw_config.get("llm_cache", {})
+        llm_cache_settings = LLMCacheSettings(**llm_cache_config)
+        agent_pool_settings = AgentPoolSettings(**raw_config.get("agent_pool", {}))
         config_dict = {
             "llm": {
                 "default": default_settings,
                 **{
-                    name: {**default_settings, **override_config}
+                    # Backend lists are not inherited, or every override would route to the default
+                    name: {**default_settings, "backends": [], **override_config}
                     for name, override_config in llm_overrides.items()
                 },
             },
@@ -296,6 +413,8 @@ class Config:
             "search_config": search_settings,
             "mcp_config": mcp_settings,
             "run_flow_config": run_flow_settings,
+            "llm_cache_config": llm_cache_settings,
+            "agent_pool_config": agent_pool_settings,
         }
 
         self._config = AppConfig(**config_dict)
@@ -326,6 +445,16 @@ class Config:
         """Get the Run Flow configuration"""
         return self._config.run_flow_config
 
+    @property
+    def llm_cache_config(self) -> LLMCacheSettings:
+        """Get the LLM completion cache configuration"""
+        return self._config.llm_cache_config
+
+    @property
+    def agent_pool_config(self) -> AgentPoolSettings:
+        """Get the pooled Manus agent configuration"""
+        return self._config.agent_pool_config
+
     @property
     def workspace_root(self) -> Path:
         """Get the workspace root directory"""
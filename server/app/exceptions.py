@@ -11,3 +11,23 @@ class OpenManusError(Exception):
 
 class TokenLimitExceeded(OpenManusError):
     """Exception raised when the token limit is exceeded"""
+
+
+class ProviderUnavailable(OpenManusError):
+    """Raised without calling the provider while its circuit breaker is open"""
+
+    def __init__(self, endpoint: str, retry_after: float):
+        super().__init__(
+            f"LLM endpoint {endpoint} is unavailable; retry in {retry_after:.0f}s"
+        )
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+class AgentPoolExhausted(OpenManusError):
+    """Raised when no pooled agent became free within the acquire timeout"""
+
+    def __init__(self, pool: str, timeout: float):
+        super().__init__(f"All {pool} agents are busy; none was free within {timeout:g}s")
+        self.pool = pool
+        self.timeout = timeout
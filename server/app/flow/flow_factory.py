@@ -3,7 +3,7 @@ from typing import Dict, List, Union
 
 from server.app.agent.base import BaseAgent
 from server.app.flow.base import BaseFlow
-from app.flow.planning import PlanningFlow
+from server.app.flow.planning import PlanningFlow
 
 
 class FlowType(str, Enum):
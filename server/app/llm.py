@@ -1,26 +1,29 @@
+import asyncio
+import copy
+import functools
 import math
-from typing import Dict, List, Optional, Union
+from contextlib import AsyncExitStack
+from typing import Any, AsyncIterator, Dict, List, Literal, Optional, Union
 
 import tiktoken
 from openai import (
     APIError,
-    AsyncAzureOpenAI,
-    AsyncOpenAI,
     AuthenticationError,
     OpenAIError,
     RateLimitError,
 )
 from openai.types.chat import ChatCompletion, ChatCompletionMessage
-from tenacity import (
-    retry,
-    retry_if_exception_type,
-    stop_after_attempt,
-    wait_random_exponential,
-)
+from pydantic import BaseModel
 
-from server.app.bedrock import BedrockClient
 from server.app.config import LLMSettings, config
-from server.app.exceptions import TokenLimitExceeded
+from server.app.exceptions import ProviderUnavailable, TokenLimitExceeded
+from server.app.llm_cache import (
+    coalescing_override,
+    completion_cache,
+    in_flight_requests,
+)
+from server.app.llm_resilience import llm_retry
+from server.app.llm_router import Backend, get_router
 from server.app.logger import logger  # Assuming a logger is set up in your app
 from server.app.schema import (
     ROLE_VALUES,
@@ -29,6 +32,7 @@ from server.app.schema import (
     Message,
     ToolChoice,
 )
+from server.app.token_ledger import current_run, token_ledger
 
 
 REASONING_MODELS = ["o1", "o3-mini"]
@@ -42,6 +46,25 @@ MULTIMODAL_MODELS = [
 ]
 
 
+class StreamEvent(BaseModel):
+    """One increment of a streamed completion.
+
+    ``text`` events carry a content delta; ``tool_call`` events carry the
+    delta of one tool call (``name`` on its first event, then ``arguments``
+    fragments); the final ``done`` event carries the assembled content and
+    tool calls.
+    """
+
+    type: Literal["text", "tool_call", "done"]
+    text: str = ""
+    index: Optional[int] = None
+    id: Optional[str] = None
+    name: Optional[str] = None
+    arguments: str = ""
+    content: Optional[str] = None
+    tool_calls: Optional[List[dict]] = None
+
+
 class TokenCounter:
     # Token constants
     BASE_MESSAGE_TOKENS = 4
@@ -54,12 +77,32 @@ class TokenCounter:
     HIGH_DETAIL_TARGET_SHORT_SIDE = 768
     TILE_SIZE = 512
 
-    def __init__(self, tokenizer):
+    # Distinct texts whose token counts are memoized
+    TEXT_CACHE_SIZE = 4096
+
+    def __init__(self, tokenizer, cache_size: int = TEXT_CACHE_SIZE):
         self.tokenizer = tokenizer
+        # Conversation history is resent every step; memoizing by text means each
+        # step only tokenizes what is new. str caches its own hash, so repeat
+        # lookups of the same message content are O(1).
+        self._count_encoded = functools.lru_cache(maxsize=cache_size)(
+            self._encoded_length
+        )
+
+    def _encoded_length(self, text: str) -> int:
+        return len(self.tokenizer.encode(text))
 
     def count_text(self, text: str) -> int:
         """Calculate tokens for a text string"""
-        return 0 if not text else len(self.tokenizer.encode(text))
+        return 0 if not text else self._count_encoded(text)
+
+    def count_tools(self, tools: Optional[List[dict]]) -> int:
+        """Calculate tokens for tool schemas"""
+        return sum(self.count_text(str(tool)) for tool in tools or ())
+
+    def cache_info(self):
+        """Hit/miss counters of the token count memo"""
+        return self._count_encoded.cache_info()
 
     def count_image(self, image_item: dict) -> int:
         """
@@ -187,8 +230,8 @@ class LLM:
         self, config_name: str = "default", llm_config: Optional[LLMSettings] = None
     ):
         if not hasattr(self, "client"):  # Only initialize if not already initialized
-            llm_config = llm_config or config.llm
-            llm_config = llm_config.get(config_name, llm_config["default"])
+            llm_configs = llm_config or config.llm
+            llm_config = llm_configs.get(config_name, llm_configs["default"])
             self.model = llm_config.model
             self.max_tokens = llm_config.max_tokens
             self.temperature = llm_config.temperature
@@ -197,9 +240,7 @@ class LLM:
             self.api_version = llm_config.api_version
             self.base_url = llm_config.base_url
 
-            # Add token counting related attributes
-            self.total_input_tokens = 0
-            self.total_completion_tokens = 0
+            # Usage is tracked per run by the token ledger, not on this shared instance
             self.max_input_tokens = (
                 llm_config.max_input_tokens
                 if hasattr(llm_config, "max_input_tokens")
@@ -213,56 +254,116 @@ class LLM:
                 # If the model is not in tiktoken's presets, use cl100k_base as default
                 self.tokenizer = tiktoken.get_encoding("cl100k_base")
 
-            if self.api_type == "azure":
-                self.client = AsyncAzureOpenAI(
-                    base_url=self.base_url,
-                    api_key=self.api_key,
-                    api_version=self.api_version,
-                )
-            elif self.api_type == "aws":
-                self.client = BedrockClient()
-            else:
-                self.client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url)
-
+            # Requests go through the router: this config first, then its `backends`
+            self.router = get_router(config_name, llm_configs)
+            self.client = self.router.primary.client
             self.token_counter = TokenCounter(self.tokenizer)
+            self.cache = completion_cache
+            self.in_flight = in_flight_requests
+            self.scheduler = self.router.primary.scheduler
+            self.guard = self.router.primary.guard
+            # Part of every cache and coalescing key: the endpoints and models
+            # that may serve this config, not just the model name
+            self.backend_identity = [
+                [b.settings.api_type, b.settings.base_url, b.model]
+                for b in self.router.backends
+            ]
+            self.max_retries = llm_config.max_retries
+            self.retry_max_wait = llm_config.retry_max_wait
 
     def count_tokens(self, text: str) -> int:
         """Calculate the number of tokens in a text"""
-        if not text:
-            return 0
-        return len(self.tokenizer.encode(text))
+        return self.token_counter.count_text(text)
 
     def count_message_tokens(self, messages: List[dict]) -> int:
         return self.token_counter.count_message_tokens(messages)
 
-    def update_token_count(self, input_tokens: int, completion_tokens: int = 0) -> None:
-        """Update token counts"""
-        # Only track tokens if max_input_tokens is set
-        self.total_input_tokens += input_tokens
-        self.total_completion_tokens += completion_tokens
+    @property
+    def total_input_tokens(self) -> int:
+        """Input tokens used so far by the current run"""
+        run = current_run()
+        return run.input_tokens if run else 0
+
+    @property
+    def total_completion_tokens(self) -> int:
+        """Completion tokens used so far by the current run"""
+        run = current_run()
+        return run.completion_tokens if run else 0
+
+    @staticmethod
+    def cached_prompt_tokens(usage: Any) -> int:
+        """Input tokens a provider reports as served from its prompt cache"""
+        details = getattr(usage, "prompt_tokens_details", None)
+        cached = getattr(details, "cached_tokens", None) if details is not None else None
+        if cached is None:
+            # Anthropic-style usage from OpenAI-compatible gateways
+            cached = getattr(usage, "cache_read_input_tokens", None)
+        return cached or 0
+
+    def update_token_count(
+        self, input_tokens: int, completion_tokens: int = 0, cached_tokens: int = 0
+    ) -> None:
+        """Charge token usage to the current run and the process-wide ledger"""
+        run = token_ledger.record(self.model, input_tokens, completion_tokens, cached_tokens)
+        if run is None:
+            logger.info(
+                f"Token usage: Input={input_tokens} (cached={cached_tokens}), "
+                f"Completion={completion_tokens}, "
+                f"Total={input_tokens + completion_tokens} (no active run)"
+            )
+            return
         logger.info(
-            f"Token usage: Input={input_tokens}, Completion={completion_tokens}, "
-            f"Cumulative Input={self.total_input_tokens}, Cumulative Completion={self.total_completion_tokens}, "
-            f"Total={input_tokens + completion_tokens}, Cumulative Total={self.total_input_tokens + self.total_completion_tokens}"
+            f"Token usage: Input={input_tokens} (cached={cached_tokens}), Completion={completion_tokens}, "
+            f"Run Input={run.input_tokens}, Run Completion={run.completion_tokens}, "
+            f"Total={input_tokens + completion_tokens}, Run Total={run.input_tokens + run.completion_tokens}"
         )
 
+    def _input_budget(self) -> Optional[int]:
+        run = current_run()
+        if run is not None and run.max_input_tokens is not None:
+            return run.max_input_tokens
+        return self.max_input_tokens
+
     def check_token_limit(self, input_tokens: int) -> bool:
-        """Check if token limits are exceeded"""
-        if self.max_input_tokens is not None:
-            return (self.total_input_tokens + input_tokens) <= self.max_input_tokens
-        # If max_input_tokens is not set, always return True
+        """Check if the request fits in the current run's input token budget"""
+        budget = self._input_budget()
+        if budget is not None:
+            return (self.total_input_tokens + input_tokens) <= budget
+        # If no budget is set, always return True
         return True
 
     def get_limit_error_message(self, input_tokens: int) -> str:
         """Generate error message for token limit exceeded"""
-        if (
-            self.max_input_tokens is not None
-            and (self.total_input_tokens + input_tokens) > self.max_input_tokens
-        ):
-            return f"Request may exceed input token limit (Current: {self.total_input_tokens}, Needed: {input_tokens}, Max: {self.max_input_tokens})"
+        budget = self._input_budget()
+        if budget is not None and (self.total_input_tokens + input_tokens) > budget:
+            return f"Request may exceed input token limit (Run: {self.total_input_tokens}, Needed: {input_tokens}, Max: {budget})"
 
         return "Token limit exceeded"
 
+    def _use_cache(self, cache: Optional[bool]) -> bool:
+        """Per-call override of the configured cache setting; False bypasses both read and write"""
+        use = self.cache.settings.enabled if cache is None else cache
+        if not use:
+            self.cache.record_bypass()
+        return use
+
+    def _use_coalescing(self, coalesce: Optional[bool]) -> bool:
+        """Per-call override, then a coalesce_requests() block, then the llm_cache config"""
+        if coalesce is not None:
+            return coalesce
+        override = coalescing_override()
+        if override is not None:
+            return override
+        return self.cache.settings.coalesce_in_flight
+
+    def _request_key(self, endpoint: str, params: dict) -> str:
+        """Cache and coalescing key of a prepared request"""
+        return self.cache.make_key(
+            endpoint=endpoint,
+            backends=self.backend_identity,
+            **{k: v for k, v in params.items() if k != "timeout"},
+        )
+
     @staticmethod
     def format_messages(
         messages: List[Union[dict, Message]], supports_images: bool = False
@@ -351,19 +452,226 @@ class LLM:
 
         return formatted_messages
 
-    @retry(
-        wait=wait_random_exponential(min=1, max=60),
-        stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
-    )
+    async def _create(self, params: dict, input_tokens: int):
+        """One non-streaming provider call, routed to a backend behind its scheduler, circuit breaker and hedging"""
+
+        tokens = input_tokens + self.max_tokens
+
+        async def attempt(backend: Backend):
+            async def create(ticket):
+                response = await backend.client.chat.completions.create(
+                    **{**params, "model": backend.model}
+                )
+                if response.usage:
+                    ticket.settle(response.usage.total_tokens)
+                return response
+
+            def hedge():
+                # A hedge never queues: when the budget is taken, it is not sent
+                ticket = backend.scheduler.try_acquire(tokens)
+                if ticket is None:
+                    return None
+                duplicate = asyncio.ensure_future(create(ticket))
+                duplicate.add_done_callback(lambda _: ticket.release())
+                return duplicate
+
+            # The hedge timer starts once the call is admitted, not while it queues
+            async with backend.scheduler.slot(tokens) as ticket:
+                return await backend.guard.hedger.run(lambda: create(ticket), hedge)
+
+        return await self.router.call(attempt)
+
+    async def _open_stream(self, params: dict, input_tokens: int, stack: AsyncExitStack):
+        """Start a streamed completion on a routed backend; its scheduler slot is held on ``stack``"""
+
+        async def attempt(backend: Backend):
+            async with AsyncExitStack() as attempt_stack:
+                ticket = await attempt_stack.enter_async_context(
+                    backend.scheduler.slot(input_tokens + self.max_tokens)
+                )
+                response = await backend.client.chat.completions.create(
+                    **{**params, "model": backend.model, "stream": True}
+                )
+                # Keep the slot until the caller has consumed the stream
+                stack.push_async_exit(attempt_stack.pop_all())
+                return ticket, response
+
+        # Failover is only possible before the first chunk, so streams are never hedged
+        return await self.router.call(attempt)
+
+    async def _stream_completion(
+        self, params: dict, input_tokens: int
+    ) -> AsyncIterator[StreamEvent]:
+        """Send a prepared request with stream=True and yield deltas as they arrive"""
+        # Input tokens are known up front; completion tokens come from the provider's
+        # final usage chunk when it sends one (Bedrock does) and are estimated otherwise
+        self.update_token_count(input_tokens)
+
+        content_parts: List[str] = []
+        tool_calls: Dict[int, dict] = {}
+        usage = None
+        async with AsyncExitStack() as stack:
+            ticket, response = await self._open_stream(params, input_tokens, stack)
+            async for chunk in response:
+                usage = getattr(chunk, "usage", None) or usage
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta
+                if delta.content:
+                    content_parts.append(delta.content)
+                    yield StreamEvent(type="text", text=delta.content)
+                for call in getattr(delta, "tool_calls", None) or []:
+                    entry = tool_calls.setdefault(
+                        call.index,
+                        {"id": None, "type": "function", "function": {"name": "", "arguments": ""}},
+                    )
+                    name = call.function.name if call.function else None
+                    arguments = (call.function.arguments if call.function else None) or ""
+                    if call.id:
+                        entry["id"] = call.id
+                    if name:
+                        entry["function"]["name"] += name
+                    entry["function"]["arguments"] += arguments
+                    yield StreamEvent(
+                        type="tool_call",
+                        index=call.index,
+                        id=call.id,
+                        name=name,
+                        arguments=arguments,
+                    )
+
+            content = "".join(content_parts)
+            if usage is not None:
+                completion_tokens = usage.completion_tokens
+            else:
+                completion_tokens = self.count_tokens(content) + sum(
+                    self.count_tokens(entry["function"]["arguments"])
+                    for entry in tool_calls.values()
+                )
+                logger.info(
+                    f"Estimated completion tokens for streaming response: {completion_tokens}"
+                )
+            ticket.settle(input_tokens + completion_tokens)
+
+        self.update_token_count(
+            0, completion_tokens, self.cached_prompt_tokens(usage) if usage else 0
+        )
+        yield StreamEvent(
+            type="done",
+            content=content,
+            tool_calls=[tool_calls[index] for index in sorted(tool_calls)] or None,
+        )
+
+    async def ask_stream(
+        self,
+        messages: List[Union[dict, Message]],
+        system_msgs: Optional[List[Union[dict, Message]]] = None,
+        temperature: Optional[float] = None,
+        tools: Optional[List[dict]] = None,
+        tool_choice: TOOL_CHOICE_TYPE = ToolChoice.AUTO,  # type: ignore
+        **kwargs: Any,
+    ) -> AsyncIterator[StreamEvent]:
+        """
+        Stream a completion as it is generated.
+
+        Args:
+            messages: List of conversation messages
+            system_msgs: Optional system messages to prepend
+            temperature: Sampling temperature for the response
+            tools: Optional tools the model may call; their deltas arrive as tool_call events
+            tool_choice: Tool choice strategy when tools are given
+            **kwargs: Additional completion arguments
+
+        Yields:
+            StreamEvent: text and tool_call deltas, then a final done event
+
+        Raises:
+            TokenLimitExceeded: If token limits are exceeded
+
+        Unlike ask(), nothing is retried: a failure surfaces to the consumer,
+        which may already have forwarded part of the output.
+        """
+        supports_images = self.model in MULTIMODAL_MODELS
+        if system_msgs:
+            messages = self.format_messages(
+                system_msgs, supports_images
+            ) + self.format_messages(messages, supports_images)
+        else:
+            messages = self.format_messages(messages, supports_images)
+
+        input_tokens = self.count_message_tokens(messages) + self.token_counter.count_tools(tools)
+        if not self.check_token_limit(input_tokens):
+            raise TokenLimitExceeded(self.get_limit_error_message(input_tokens))
+
+        params = {"model": self.model, "messages": messages, **kwargs}
+        if tools:
+            if tool_choice not in TOOL_CHOICE_VALUES:
+                raise ValueError(f"Invalid tool_choice: {tool_choice}")
+            params["tools"] = tools
+            params["tool_choice"] = tool_choice
+        if self.model in REASONING_MODELS:
+            params["max_completion_tokens"] = self.max_tokens
+        else:
+            params["max_tokens"] = self.max_tokens
+            params["temperature"] = (
+                temperature if temperature is not None else self.temperature
+            )
+
+        async for event in self._stream_completion(params, input_tokens):
+            yield event
+
+    async def _complete_text(
+        self, params: dict, stream: bool, input_tokens: int, cache_key: Optional[str]
+    ) -> str:
+        """Send a prepared ask() request and return the completion text"""
+        if not stream:
+            # Non-streaming request
+            response = await self._create({**params, "stream": False}, input_tokens)
+
+            if not response.choices or not response.choices[0].message.content:
+                raise ValueError("Empty or invalid response from LLM")
+
+            # Update token counts
+            self.update_token_count(
+                response.usage.prompt_tokens,
+                response.usage.completion_tokens,
+                self.cached_prompt_tokens(response.usage),
+            )
+
+            content = response.choices[0].message.content
+            if cache_key:
+                await self.cache.put(
+                    cache_key,
+                    content,
+                    response.usage.prompt_tokens,
+                    response.usage.completion_tokens,
+                )
+            return content
+
+        # Streaming request: drain the event stream and return the whole text
+        full_response = ""
+        async for event in self._stream_completion(params, input_tokens):
+            if event.type == "done":
+                full_response = (event.content or "").strip()
+        if not full_response:
+            raise ValueError("Empty response from streaming LLM")
+        completion_tokens = self.count_tokens(full_response)
+
+        if cache_key:
+            await self.cache.put(
+                cache_key, full_response, input_tokens, completion_tokens
+            )
+        return full_response
+
+    @llm_retry
     async def ask(
         self,
         messages: List[Union[dict, Message]],
         system_msgs: Optional[List[Union[dict, Message]]] = None,
         stream: bool = True,
         temperature: Optional[float] = None,
+        cache: Optional[bool] = None,
+        coalesce: Optional[bool] = None,
     ) -> str:
         """
         Send a prompt to the LLM and get the response.
@@ -373,6 +681,9 @@ class LLM:
             system_msgs: Optional system messages to prepend
             stream (bool): Whether to stream the response
             temperature (float): Sampling temperature for the response
+            cache (bool): Use the completion cache; None follows the llm_cache config
+            coalesce (bool): Share the result of an identical request already in flight;
+                None follows coalesce_requests() or the llm_cache config
 
         Returns:
             str: The generated response
@@ -380,6 +691,7 @@ class LLM:
         Raises:
             TokenLimitExceeded: If token limits are exceeded
             ValueError: If messages are invalid or response is empty
+            ProviderUnavailable: If the endpoint's circuit breaker is open
             OpenAIError: If API call fails after retries
             Exception: For unexpected errors
         """
@@ -416,52 +728,29 @@ class LLM:
                     temperature if temperature is not None else self.temperature
                 )
 
-            if not stream:
-                # Non-streaming request
-                response = await self.client.chat.completions.create(
-                    **params, stream=False
-                )
-
-                if not response.choices or not response.choices[0].message.content:
-                    raise ValueError("Empty or invalid response from LLM")
-
-                # Update token counts
-                self.update_token_count(
-                    response.usage.prompt_tokens, response.usage.completion_tokens
-                )
-
-                return response.choices[0].message.content
-
-            # Streaming request, For streaming, update estimated token count before making the request
-            self.update_token_count(input_tokens)
-
-            response = await self.client.chat.completions.create(**params, stream=True)
-
-            collected_messages = []
-            completion_text = ""
-            async for chunk in response:
-                chunk_message = chunk.choices[0].delta.content or ""
-                collected_messages.append(chunk_message)
-                completion_text += chunk_message
-                print(chunk_message, end="", flush=True)
+            cache_key = None
+            if self._use_cache(cache):
+                cache_key = self._request_key("ask", params)
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    return cached.value
 
-            print()  # Newline after streaming
-            full_response = "".join(collected_messages).strip()
-            if not full_response:
-                raise ValueError("Empty response from streaming LLM")
-
-            # estimate completion tokens for streaming response
-            completion_tokens = self.count_tokens(completion_text)
-            logger.info(
-                f"Estimated completion tokens for streaming response: {completion_tokens}"
+            complete = functools.partial(
+                self._complete_text, params, stream, input_tokens, cache_key
             )
-            self.total_completion_tokens += completion_tokens
-
-            return full_response
+            if self._use_coalescing(coalesce):
+                return await self.in_flight.do(
+                    cache_key or self._request_key("ask", params),
+                    complete,
+                )
+            return await complete()
 
         except TokenLimitExceeded:
             # Re-raise token limit errors without logging
             raise
+        except ProviderUnavailable as pu:
+            logger.warning(str(pu))
+            raise
         except ValueError:
             logger.exception(f"Validation error")
             raise
@@ -478,13 +767,7 @@ class LLM:
             logger.exception(f"Unexpected error in ask")
             raise
 
-    @retry(
-        wait=wait_random_exponential(min=1, max=60),
-        stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
-    )
+    @llm_retry
     async def ask_with_images(
         self,
         messages: List[Union[dict, Message]],
@@ -509,6 +792,7 @@ class LLM:
         Raises:
             TokenLimitExceeded: If token limits are exceeded
             ValueError: If messages are invalid or response is empty
+            ProviderUnavailable: If the endpoint's circuit breaker is open
             OpenAIError: If API call fails after retries
             Exception: For unexpected errors
         """
@@ -590,26 +874,22 @@ class LLM:
 
             # Handle non-streaming request
             if not stream:
-                response = await self.client.chat.completions.create(**params)
+                response = await self._create(params, input_tokens)
 
                 if not response.choices or not response.choices[0].message.content:
                     raise ValueError("Empty or invalid response from LLM")
 
-                self.update_token_count(response.usage.prompt_tokens)
+                self.update_token_count(
+                    response.usage.prompt_tokens,
+                    cached_tokens=self.cached_prompt_tokens(response.usage),
+                )
                 return response.choices[0].message.content
 
             # Handle streaming request
-            self.update_token_count(input_tokens)
-            response = await self.client.chat.completions.create(**params)
-
-            collected_messages = []
-            async for chunk in response:
-                chunk_message = chunk.choices[0].delta.content or ""
-                collected_messages.append(chunk_message)
-                print(chunk_message, end="", flush=True)
-
-            print()  # Newline after streaming
-            full_response = "".join(collected_messages).strip()
+            full_response = ""
+            async for event in self._stream_completion(params, input_tokens):
+                if event.type == "done":
+                    full_response = (event.content or "").strip()
 
             if not full_response:
                 raise ValueError("Empty response from streaming LLM")
@@ -618,6 +898,9 @@ class LLM:
 
         except TokenLimitExceeded:
             raise
+        except ProviderUnavailable as pu:
+            logger.warning(str(pu))
+            raise
         except ValueError as ve:
             logger.error(f"Validation error in ask_with_images: {ve}")
             raise
@@ -634,13 +917,36 @@ class LLM:
             logger.error(f"Unexpected error in ask_with_images: {e}")
             raise
 
-    @retry(
-        wait=wait_random_exponential(min=1, max=60),
-        stop=stop_after_attempt(6),
-        retry=retry_if_exception_type(
-            (OpenAIError, Exception, ValueError)
-        ),  # Don't retry TokenLimitExceeded
-    )
+    async def _complete_tool(
+        self, params: dict, input_tokens: int, cache_key: Optional[str]
+    ) -> ChatCompletionMessage | None:
+        """Send a prepared ask_tool() request and return the response message"""
+        params["stream"] = False  # Always use non-streaming for tool requests
+        response: ChatCompletion = await self._create(params, input_tokens)
+
+        # Check if response is valid
+        if not response.choices or not response.choices[0].message:
+            print(response)
+            # raise ValueError("Invalid or empty response from LLM")
+            return None
+
+        # Update token counts
+        self.update_token_count(
+            response.usage.prompt_tokens,
+            response.usage.completion_tokens,
+            self.cached_prompt_tokens(response.usage),
+        )
+
+        if cache_key and isinstance(response.choices[0].message, ChatCompletionMessage):
+            await self.cache.put(
+                cache_key,
+                response.choices[0].message.model_dump(exclude_none=True),
+                response.usage.prompt_tokens,
+                response.usage.completion_tokens,
+            )
+        return response.choices[0].message
+
+    @llm_retry
     async def ask_tool(
         self,
         messages: List[Union[dict, Message]],
@@ -649,6 +955,8 @@ class LLM:
         tools: Optional[List[dict]] = None,
         tool_choice: TOOL_CHOICE_TYPE = ToolChoice.AUTO,  # type: ignore
         temperature: Optional[float] = None,
+        cache: Optional[bool] = None,
+        coalesce: Optional[bool] = None,
         **kwargs,
     ) -> ChatCompletionMessage | None:
         """
@@ -661,6 +969,9 @@ class LLM:
             tools: List of tools to use
             tool_choice: Tool choice strategy
             temperature: Sampling temperature for the response
+            cache: Use the completion cache; None follows the llm_cache config
+            coalesce: Share the result of an identical request already in flight;
+                None follows coalesce_requests() or the llm_cache config
             **kwargs: Additional completion arguments
 
         Returns:
@@ -669,6 +980,7 @@ class LLM:
         Raises:
             TokenLimitExceeded: If token limits are exceeded
             ValueError: If tools, tool_choice, or messages are invalid
+            ProviderUnavailable: If the endpoint's circuit breaker is open
             OpenAIError: If API call fails after retries
             Exception: For unexpected errors
         """
@@ -691,12 +1003,7 @@ class LLM:
             input_tokens = self.count_message_tokens(messages)
 
             # If there are tools, calculate token count for tool descriptions
-            tools_tokens = 0
-            if tools:
-                for tool in tools:
-                    tools_tokens += self.count_tokens(str(tool))
-
-            input_tokens += tools_tokens
+            input_tokens += self.token_counter.count_tools(tools)
 
             # Check if token limits are exceeded
             if not self.check_token_limit(input_tokens):
@@ -728,27 +1035,30 @@ class LLM:
                     temperature if temperature is not None else self.temperature
                 )
 
-            params["stream"] = False  # Always use non-streaming for tool requests
-            response: ChatCompletion = await self.client.chat.completions.create(
-                **params
-            )
-
-            # Check if response is valid
-            if not response.choices or not response.choices[0].message:
-                print(response)
-                # raise ValueError("Invalid or empty response from LLM")
-                return None
+            cache_key = None
+            if self._use_cache(cache):
+                cache_key = self._request_key("ask_tool", params)
+                cached = await self.cache.get(cache_key)
+                if cached is not None:
+                    return ChatCompletionMessage.model_validate(cached.value)
 
-            # Update token counts
-            self.update_token_count(
-                response.usage.prompt_tokens, response.usage.completion_tokens
+            complete = functools.partial(
+                self._complete_tool, params, input_tokens, cache_key
             )
-
-            return response.choices[0].message
+            if self._use_coalescing(coalesce):
+                message = await self.in_flight.do(
+                    cache_key or self._request_key("ask_tool", params), complete
+                )
+                # Coalesced callers each get their own copy to mutate
+                return copy.deepcopy(message)
+            return await complete()
 
         except TokenLimitExceeded:
             # Re-raise token limit errors without logging
             raise
+        except ProviderUnavailable as pu:
+            logger.warning(str(pu))
+            raise
         except ValueError as ve:
             logger.error(f"Validation error in ask_tool: {ve}")
             raise
@@ -0,0 +1,294 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, Optional, TypeVar
+
+from pydantic import BaseModel
+
+from server.app.config import LLMCacheSettings, config
+from server.app.logger import logger
+
+T = TypeVar("T")
+
+# Per-task override of LLMCacheSettings.coalesce_in_flight; None follows the config
+_coalescing: ContextVar[Optional[bool]] = ContextVar("llm_coalescing", default=None)
+
+
+class CachedCompletion(BaseModel):
+    """A stored completion plus the usage it cost when it was first generated"""
+
+    value: Any
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    expires_at: float
+
+
+class CompletionCache:
+    """Two-tier cache of LLM completions keyed by a canonical request hash.
+
+    Lookups go to an in-process LRU first and then to a SQLite file shared by
+    every worker on the host; disk hits are promoted to memory. Both tiers
+    honour the TTL and are bounded by entry count. SQLite work runs in a
+    thread so it never blocks the event loop.
+    """
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, settings: LLMCacheSettings):
+        self.settings = settings
+        self._memory: "OrderedDict[str, CachedCompletion]" = OrderedDict()
+        self._memory_lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._puts_since_prune = 0
+        self._stats = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "bypassed": 0,
+            "saved_prompt_tokens": 0,
+            "saved_completion_tokens": 0,
+        }
+
+    @staticmethod
+    def make_key(**request: Any) -> str:
+        """Hash the request fields that determine a completion (model, messages, tools, temperature, ...)"""
+        canonical = json.dumps(
+            request, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def _get_db(self) -> Optional[sqlite3.Connection]:
+        if self._db is None and self.settings.disk_path:
+            path = Path(self.settings.disk_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            db = sqlite3.connect(str(path), check_same_thread=False, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            db.execute(
+                """
+                CREATE TABLE IF NOT EXISTS completions (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    prompt_tokens INTEGER NOT NULL,
+                    completion_tokens INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+                """
+            )
+            db.execute(
+                "CREATE INDEX IF NOT EXISTS idx_completions_last_access ON completions (last_access)"
+            )
+            db.commit()
+            self._db = db
+        return self._db
+
+    def _memory_get(self, key: str) -> Optional[CachedCompletion]:
+        with self._memory_lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            if entry.expires_at <= time.time():
+                del self._memory[key]
+                return None
+            self._memory.move_to_end(key)
+            return entry
+
+    def _memory_put(self, key: str, entry: CachedCompletion) -> None:
+        with self._memory_lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.settings.memory_max_entries:
+                self._memory.popitem(last=False)
+
+    def _disk_get(self, key: str) -> Optional[CachedCompletion]:
+        with self._db_lock:
+            db = self._get_db()
+            if db is None:
+                return None
+            now = time.time()
+            row = db.execute(
+                "SELECT value, prompt_tokens, completion_tokens, expires_at FROM completions "
+                "WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE completions SET last_access = ? WHERE key = ?", (now, key))
+            db.commit()
+        return CachedCompletion(
+            value=json.loads(row[0]),
+            prompt_tokens=row[1],
+            completion_tokens=row[2],
+            expires_at=row[3],
+        )
+
+    def _disk_put(self, key: str, payload: str, entry: CachedCompletion) -> None:
+        with self._db_lock:
+            db = self._get_db()
+            if db is None:
+                return
+            now = time.time()
+            db.execute(
+                "INSERT OR REPLACE INTO completions "
+                "(key, value, prompt_tokens, completion_tokens, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, payload, entry.prompt_tokens, entry.completion_tokens, entry.expires_at, now),
+            )
+            self._puts_since_prune += 1
+            if self._puts_since_prune >= self.PRUNE_EVERY:
+                self._puts_since_prune = 0
+                db.execute("DELETE FROM completions WHERE expires_at <= ?", (now,))
+                db.execute(
+                    "DELETE FROM completions WHERE key IN ("
+                    "SELECT key FROM completions ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                    (self.settings.disk_max_entries,),
+                )
+            db.commit()
+
+    async def get(self, key: str) -> Optional[CachedCompletion]:
+        """Look a request up in memory, then on disk; counts the tokens a hit saved"""
+        entry = self._memory_get(key)
+        if entry is not None:
+            self._stats["memory_hits"] += 1
+        else:
+            try:
+                entry = await asyncio.to_thread(self._disk_get, key)
+            except sqlite3.Error as e:
+                logger.warning(f"LLM cache disk lookup failed: {e}")
+                entry = None
+            if entry is None:
+                self._stats["misses"] += 1
+                return None
+            self._stats["disk_hits"] += 1
+            self._memory_put(key, entry)
+
+        self._stats["saved_prompt_tokens"] += entry.prompt_tokens
+        self._stats["saved_completion_tokens"] += entry.completion_tokens
+        return entry
+
+    async def put(
+        self, key: str, value: Any, prompt_tokens: int = 0, completion_tokens: int = 0
+    ) -> None:
+        """Store a completion in both tiers unless it exceeds max_entry_bytes"""
+        payload = json.dumps(value, ensure_ascii=False, default=str)
+        if len(payload.encode("utf-8")) > self.settings.max_entry_bytes:
+            return
+        entry = CachedCompletion(
+            value=value,
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            expires_at=time.time() + self.settings.ttl,
+        )
+        self._memory_put(key, entry)
+        self._stats["stores"] += 1
+        try:
+            await asyncio.to_thread(self._disk_put, key, payload, entry)
+        except sqlite3.Error as e:
+            logger.warning(f"LLM cache disk write failed: {e}")
+
+    def record_bypass(self) -> None:
+        self._stats["bypassed"] += 1
+
+    def clear(self) -> None:
+        """Drop every cached completion from both tiers"""
+        with self._memory_lock:
+            self._memory.clear()
+        with self._db_lock:
+            db = self._get_db()
+            if db is not None:
+                db.execute("DELETE FROM completions")
+                db.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        return {
+            "enabled": self.settings.enabled,
+            "memory_entries": len(self._memory),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            **stats,
+        }
+
+
+class SingleFlight:
+    """Coalesce identical concurrent requests into one provider call.
+
+    The first caller for a key starts the call as its own task; callers that
+    arrive while it is running await the same task. Each caller waits through
+    ``asyncio.shield``, so cancelling one caller (e.g. a client disconnect)
+    never cancels the call for the others. The call itself is cancelled only
+    when every caller waiting on it has gone away.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, "asyncio.Task"] = {}
+        self._waiters: Dict[str, int] = {}
+        self._stats = {"leaders": 0, "coalesced": 0, "abandoned": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Return the result of ``fn()``, sharing it with concurrent callers using the same key"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.create_task(fn())
+            self._calls[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self._stats["leaders"] += 1
+        else:
+            self._stats["coalesced"] += 1
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters.get(key) == 1:
+                self._stats["abandoned"] += 1
+                task.cancel()
+            raise
+        finally:
+            if self._calls.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _forget(self, key: str, task: "asyncio.Task") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            del self._waiters[key]
+        if not task.cancelled():
+            # Mark the exception retrieved when every caller was cancelled
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._calls), **self._stats}
+
+
+@contextmanager
+def coalesce_requests(enabled: bool = True) -> Iterator[None]:
+    """Share one provider call between identical concurrent LLM requests made inside the block.
+
+    Meant for deterministic prompts, where every caller would accept the same
+    completion; usage is charged to the run of the caller that made the call.
+    """
+    token = _coalescing.set(enabled)
+    try:
+        yield
+    finally:
+        _coalescing.reset(token)
+
+
+def coalescing_override() -> Optional[bool]:
+    return _coalescing.get()
+
+
+completion_cache = CompletionCache(config.llm_cache_config)
+in_flight_requests = SingleFlight()
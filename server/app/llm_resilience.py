@@ -0,0 +1,371 @@
+import asyncio
+import email.utils
+import math
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    InternalServerError,
+    RateLimitError,
+)
+from tenacity import RetryCallState, retry, retry_if_exception, wait_random_exponential
+
+from server.app.config import LLMSettings
+from server.app.exceptions import ProviderUnavailable
+from server.app.logger import logger
+
+T = TypeVar("T")
+
+# HTTP statuses worth another attempt; every other 4xx is the caller's fault
+RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+# Bedrock (botocore ClientError) codes that mean "try again later"
+RETRYABLE_AWS_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceUnavailableException",
+    "InternalServerException",
+    "ModelTimeoutException",
+    "ModelNotReadyException",
+}
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        response = getattr(exc, "response", None)
+        status = getattr(response, "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """Whether a failed provider call may succeed if repeated unchanged.
+
+    Rate limits, timeouts, dropped connections and 5xx are transient. Bad
+    requests, auth failures, token limits, validation errors and an open
+    circuit are terminal: repeating them only burns time and quota.
+    """
+    if isinstance(exc, (RateLimitError, APITimeoutError, APIConnectionError, InternalServerError)):
+        return True
+    if isinstance(exc, APIStatusError):
+        return exc.status_code in RETRYABLE_STATUSES
+    if isinstance(exc, (asyncio.TimeoutError, TimeoutError, ConnectionError)):
+        return True
+    aws_error = getattr(exc, "response", None)
+    if isinstance(aws_error, dict):
+        return aws_error.get("Error", {}).get("Code") in RETRYABLE_AWS_CODES
+    status = _status_code(exc)
+    return status in RETRYABLE_STATUSES if status is not None else False
+
+
+def retry_after_seconds(exc: BaseException) -> Optional[float]:
+    """Delay requested by the provider via retry-after-ms / Retry-After, if any"""
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after-ms")
+    if value is not None:
+        try:
+            return max(0.0, float(value) / 1000)
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        # HTTP-date form
+        parsed = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, parsed.timestamp() - time.time())
+
+
+DEFAULT_MAX_RETRIES = 5
+DEFAULT_RETRY_MAX_WAIT = 60.0
+
+
+def _policy(retry_state: RetryCallState) -> Tuple[int, float]:
+    """(max_retries, max_wait) of the LLM instance whose method is being retried"""
+    llm = retry_state.args[0] if retry_state.args else None
+    return (
+        getattr(llm, "max_retries", DEFAULT_MAX_RETRIES),
+        getattr(llm, "retry_max_wait", DEFAULT_RETRY_MAX_WAIT),
+    )
+
+
+def _stop(retry_state: RetryCallState) -> bool:
+    max_retries, _ = _policy(retry_state)
+    return retry_state.attempt_number > max_retries
+
+
+def _wait(retry_state: RetryCallState) -> float:
+    """Honour the provider's Retry-After; otherwise jittered exponential backoff"""
+    _, max_wait = _policy(retry_state)
+    exc = retry_state.outcome.exception() if retry_state.outcome else None
+    hinted = retry_after_seconds(exc) if exc is not None else None
+    if hinted is not None:
+        return min(hinted, max_wait)
+    return wait_random_exponential(multiplier=1, min=1, max=max_wait)(retry_state)
+
+
+def _log_retry(retry_state: RetryCallState) -> None:
+    exc = retry_state.outcome.exception()
+    logger.warning(
+        f"LLM call {retry_state.fn.__name__} failed on attempt {retry_state.attempt_number} "
+        f"({type(exc).__name__}: {exc}); retrying in {retry_state.next_action.sleep:.1f}s"
+    )
+
+
+# Replaces the blanket @retry on LLM.ask/ask_with_images/ask_tool
+llm_retry = retry(
+    retry=retry_if_exception(is_retryable),
+    stop=_stop,
+    wait=_wait,
+    before_sleep=_log_retry,
+    reraise=True,
+)
+
+
+class CircuitBreaker:
+    """Fail fast while an endpoint keeps failing.
+
+    ``failure_threshold`` consecutive transient failures open the circuit;
+    calls are then rejected with ProviderUnavailable for ``reset_timeout``
+    seconds. After that one probe call is let through (half-open): success
+    closes the circuit, failure opens it again. Terminal errors such as a 400
+    prove the endpoint is answering and count as successes.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._stats = {"rejected": 0, "opened": 0, "failures": 0, "successes": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.reset_timeout > 0 and self.failure_threshold > 0
+
+    @property
+    def cooling_down(self) -> bool:
+        """True while the circuit is open and calls are rejected"""
+        return (
+            self.state == self.OPEN
+            and time.monotonic() - self._opened_at < self.reset_timeout
+        )
+
+    def before_call(self) -> None:
+        """Raise ProviderUnavailable unless a call may be attempted now"""
+        if not self.enabled:
+            return
+        if self.state == self.OPEN:
+            remaining = self._opened_at + self.reset_timeout - time.monotonic()
+            if remaining > 0:
+                self._stats["rejected"] += 1
+                raise ProviderUnavailable(self.name, remaining)
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                self._stats["rejected"] += 1
+                raise ProviderUnavailable(self.name, self.reset_timeout)
+            self._probe_in_flight = True
+
+    def record_success(self) -> None:
+        self._stats["successes"] += 1
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit for LLM endpoint {self.name} closed")
+            self.state = self.CLOSED
+
+    def record_failure(self, exc: BaseException) -> None:
+        if not is_retryable(exc):
+            self.record_success()
+            return
+        if not self.enabled:
+            return
+        self._stats["failures"] += 1
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+        if self.state == self.HALF_OPEN or (
+            self.state == self.CLOSED and self.consecutive_failures >= self.failure_threshold
+        ):
+            self.state = self.OPEN
+            self._opened_at = time.monotonic()
+            self._stats["opened"] += 1
+            logger.error(
+                f"Circuit for LLM endpoint {self.name} opened after "
+                f"{self.consecutive_failures} consecutive failures ({type(exc).__name__})"
+            )
+
+    def release_probe(self) -> None:
+        """Give the half-open probe back when its call was cancelled"""
+        self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            **self._stats,
+        }
+
+
+class Hedger:
+    """Send a duplicate request when the first is slower than usual.
+
+    Once ``min_samples`` latencies are known, a call still running after the
+    ``percentile`` latency gets a second identical request; whichever finishes
+    first wins and the other is cancelled. Disabled when percentile is None.
+
+    Only provider time counts: ``run()`` is entered once the call holds its
+    scheduler slot, so time spent queueing behind our own rate budget neither
+    starts the hedge timer nor enters the latency samples.
+    """
+
+    def __init__(self, percentile: Optional[float] = None, min_samples: int = 20, window: int = 200):
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._stats = {"calls": 0, "hedged": 0, "hedge_wins": 0, "hedges_skipped": 0}
+
+    def record(self, latency: float) -> None:
+        self._latencies.append(latency)
+
+    def threshold(self) -> Optional[float]:
+        """Seconds after which a call is hedged, or None when hedging is off"""
+        if self.percentile is None or len(self._latencies) < self.min_samples:
+            return None
+        ordered = sorted(self._latencies)
+        rank = max(0, math.ceil(self.percentile / 100 * len(ordered)) - 1)
+        return ordered[min(rank, len(ordered) - 1)]
+
+    async def run(
+        self,
+        attempt: Callable[[], Awaitable[T]],
+        hedge: Optional[Callable[[], Optional[Awaitable[T]]]] = None,
+    ) -> T:
+        """Await the admitted call ``attempt()``, hedging it with ``hedge()`` when slow.
+
+        ``hedge()`` starts the duplicate call, or returns None when it cannot be
+        admitted without waiting; no hedge is sent then.
+        """
+        self._stats["calls"] += 1
+        start = time.monotonic()
+        delay = self.threshold() if hedge is not None else None
+        if delay is None:
+            result = await attempt()
+            self.record(time.monotonic() - start)
+            return result
+
+        primary = asyncio.ensure_future(attempt())
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                duplicate = hedge()
+                if duplicate is None:
+                    self._stats["hedges_skipped"] += 1
+                else:
+                    self._stats["hedged"] += 1
+                    tasks.append(asyncio.ensure_future(duplicate))
+
+            pending = set(tasks)
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled():
+                        continue
+                    if task.exception() is None:
+                        if task is not primary:
+                            self._stats["hedge_wins"] += 1
+                        self.record(time.monotonic() - start)
+                        return task.result()
+                    error = error or task.exception()
+            raise error or asyncio.CancelledError()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+                elif not task.cancelled():
+                    task.exception()  # The loser's error was handled here
+
+    def stats(self) -> Dict[str, Any]:
+        threshold = self.threshold()
+        return {
+            "percentile": self.percentile,
+            "threshold_ms": None if threshold is None else round(threshold * 1000, 1),
+            "samples": len(self._latencies),
+            **self._stats,
+        }
+
+
+class EndpointGuard:
+    """Circuit breaker around every call to one provider endpoint, plus its hedger.
+
+    Hedging is applied by the caller, inside its scheduler slot, through
+    ``guard.hedger.run()``.
+    """
+
+    def __init__(self, name: str, breaker: CircuitBreaker, hedger: Hedger):
+        self.name = name
+        self.breaker = breaker
+        self.hedger = hedger
+
+    async def call(self, attempt: Callable[[], Awaitable[T]]) -> T:
+        """Run ``attempt`` (a zero-argument coroutine factory) under the breaker"""
+        self.breaker.before_call()
+        try:
+            result = await attempt()
+        except asyncio.CancelledError:
+            self.breaker.release_probe()
+            raise
+        except Exception as e:
+            self.breaker.record_failure(e)
+            raise
+        self.breaker.record_success()
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {"endpoint": self.name, "breaker": self.breaker.stats(), "hedging": self.hedger.stats()}
+
+
+_guards: Dict[Tuple[str, str, str], EndpointGuard] = {}
+
+
+def get_endpoint_guard(settings: LLMSettings) -> EndpointGuard:
+    """One guard per provider endpoint and model, shared by every LLM config that uses it"""
+    key = (settings.api_type, settings.base_url, settings.model)
+    if key not in _guards:
+        name = f"{settings.base_url or settings.api_type}#{settings.model}"
+        _guards[key] = EndpointGuard(
+            name,
+            CircuitBreaker(
+                name,
+                failure_threshold=settings.breaker_failure_threshold,
+                reset_timeout=settings.breaker_reset_timeout,
+            ),
+            Hedger(settings.hedge_percentile, min_samples=settings.hedge_min_samples),
+        )
+    return _guards[key]
+
+
+def endpoint_stats() -> List[Dict[str, Any]]:
+    return [guard.stats() for guard in _guards.values()]
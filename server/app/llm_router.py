@@ -0,0 +1,205 @@
+import random
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, TypeVar
+
+from openai import AsyncAzureOpenAI, AsyncOpenAI
+
+from server.app.bedrock import BedrockClient
+from server.app.config import LLMSettings
+from server.app.exceptions import ProviderUnavailable
+from server.app.llm_resilience import get_endpoint_guard, is_retryable
+from server.app.llm_scheduler import get_scheduler
+from server.app.logger import logger
+
+T = TypeVar("T")
+
+# Weight of the newest sample in the latency moving average
+LATENCY_EWMA_ALPHA = 0.2
+# Outcomes kept per backend for its error rate
+ERROR_WINDOW = 50
+# Share of requests sent to a random healthy backend to keep its latency estimate fresh
+EXPLORE_RATIO = 0.05
+# Routing decisions kept for /api/llm/stats
+DECISION_LOG_SIZE = 50
+
+
+def create_client(settings: LLMSettings):
+    """Provider client for one backend config.
+
+    The SDK's own retries are off: llm_retry, the circuit breaker and failover
+    decide when a call is repeated, so one failure is not retried twice over.
+    """
+    if settings.api_type == "azure":
+        return AsyncAzureOpenAI(
+            base_url=settings.base_url,
+            api_key=settings.api_key,
+            api_version=settings.api_version,
+            max_retries=0,
+        )
+    if settings.api_type == "aws":
+        return BedrockClient()
+    return AsyncOpenAI(api_key=settings.api_key, base_url=settings.base_url, max_retries=0)
+
+
+class Backend:
+    """One provider/model a logical LLM config can be served by"""
+
+    def __init__(self, name: str, settings: LLMSettings):
+        self.name = name
+        self.settings = settings
+        self.model = settings.model
+        self.client = create_client(settings)
+        self.scheduler = get_scheduler(settings)
+        self.guard = get_endpoint_guard(settings)
+        self.latency: Optional[float] = None
+        self._outcomes: Deque[bool] = deque(maxlen=ERROR_WINDOW)
+        self._stats = {"selected": 0, "succeeded": 0, "failed": 0, "failovers_from": 0}
+        self.last_error: Optional[str] = None
+
+    @property
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return self._outcomes.count(False) / len(self._outcomes)
+
+    @property
+    def available(self) -> bool:
+        """False while the endpoint's circuit is open and still cooling down"""
+        return not self.guard.breaker.cooling_down
+
+    def score(self) -> float:
+        """Expected seconds per successful call; unmeasured backends score 0 so they get tried"""
+        if self.latency is None:
+            return 0.0
+        return self.latency / max(0.05, 1.0 - self.error_rate)
+
+    def record_success(self, latency: float) -> None:
+        self._outcomes.append(True)
+        self._stats["succeeded"] += 1
+        self.latency = (
+            latency
+            if self.latency is None
+            else LATENCY_EWMA_ALPHA * latency + (1 - LATENCY_EWMA_ALPHA) * self.latency
+        )
+
+    def record_failure(self, exc: BaseException) -> None:
+        self._outcomes.append(False)
+        self._stats["failed"] += 1
+        self.last_error = f"{type(exc).__name__}: {exc}"[:300]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "model": self.model,
+            "api_type": self.settings.api_type,
+            "available": self.available,
+            "latency_ms": None if self.latency is None else round(self.latency * 1000, 1),
+            "error_rate": round(self.error_rate, 4),
+            "circuit": self.guard.breaker.state,
+            "last_error": self.last_error,
+            **self._stats,
+        }
+
+
+class LLMRouter:
+    """Send each request to the fastest healthy backend and fail over on provider errors.
+
+    Backends are ranked by their latency moving average inflated by their
+    recent error rate; backends whose circuit is open are skipped until it
+    cools down. A transient failure or an open circuit moves the request to
+    the next backend; terminal errors (bad request, auth) are raised as is.
+    """
+
+    def __init__(self, name: str, backends: List[Backend]):
+        self.name = name
+        self.backends = backends
+        self.primary = backends[0]
+        self._decisions: Deque[Dict[str, Any]] = deque(maxlen=DECISION_LOG_SIZE)
+        self._stats = {"requests": 0, "failovers": 0, "explored": 0, "exhausted": 0}
+
+    def ranked(self, explore: bool = True) -> List[Backend]:
+        """Backends in the order a request will try them"""
+        if len(self.backends) == 1:
+            return list(self.backends)
+        available = sorted(
+            (b for b in self.backends if b.available), key=lambda b: b.score()
+        )
+        cooling = [b for b in self.backends if not b.available]
+        if explore and len(available) > 1 and random.random() < EXPLORE_RATIO:
+            self._stats["explored"] += 1
+            pick = random.choice(available[1:])
+            available.remove(pick)
+            available.insert(0, pick)
+        # Cooling backends go last: their breaker fails fast if still open
+        return available + cooling
+
+    async def call(self, attempt: Callable[[Backend], Awaitable[T]]) -> T:
+        """Run ``attempt(backend)`` on the best backend, failing over in rank order"""
+        self._stats["requests"] += 1
+        tried: List[str] = []
+        error: Optional[BaseException] = None
+        for backend in self.ranked():
+            tried.append(backend.name)
+            backend._stats["selected"] += 1
+            start = time.monotonic()
+            try:
+                result = await backend.guard.call(lambda: attempt(backend))
+            except ProviderUnavailable as e:
+                error = e
+                continue
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                backend.record_failure(e)
+                backend._stats["failovers_from"] += 1
+                error = e
+                if len(tried) < len(self.backends):
+                    logger.warning(
+                        f"LLM backend {backend.name} failed ({type(e).__name__}); failing over"
+                    )
+                continue
+
+            backend.record_success(time.monotonic() - start)
+            if len(tried) > 1:
+                self._stats["failovers"] += 1
+            if len(self.backends) > 1:
+                self._decisions.append(
+                    {"at": time.time(), "backend": backend.name, "tried": tried}
+                )
+            return result
+
+        self._stats["exhausted"] += 1
+        if len(self.backends) > 1:
+            self._decisions.append({"at": time.time(), "backend": None, "tried": tried})
+        raise error
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            **self._stats,
+            "ranking": [b.name for b in self.ranked(explore=False)],
+            "backends": [b.stats() for b in self.backends],
+            "recent_decisions": list(self._decisions),
+        }
+
+
+_routers: Dict[str, LLMRouter] = {}
+
+
+def get_router(config_name: str, llm_configs: Dict[str, LLMSettings]) -> LLMRouter:
+    """Router for a logical config: its own backend followed by the configs named in ``backends``"""
+    if config_name not in _routers:
+        settings = llm_configs.get(config_name, llm_configs["default"])
+        backends = [Backend(config_name, settings)]
+        for name in settings.backends:
+            if name == config_name or name not in llm_configs:
+                logger.warning(f"LLM config {config_name}: unknown backend {name!r} ignored")
+                continue
+            backends.append(Backend(name, llm_configs[name]))
+        _routers[config_name] = LLMRouter(config_name, backends)
+    return _routers[config_name]
+
+
+def router_stats() -> List[Dict[str, Any]]:
+    return [router.stats() for router in _routers.values()]
@@ -0,0 +1,247 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, Dict, List, Optional, Tuple
+
+from server.app.config import LLMSettings
+from server.app.logger import logger
+
+
+class Priority(IntEnum):
+    """Scheduling classes for LLM calls; lower values are served first"""
+
+    INTERACTIVE = 0
+    DEFAULT = 1
+    BACKGROUND = 2
+
+
+_current_priority: ContextVar[Priority] = ContextVar(
+    "llm_priority", default=Priority.DEFAULT
+)
+
+
+@contextmanager
+def llm_priority(priority: Priority):
+    """Run every LLM call made inside the block (e.g. a whole agent run) at ``priority``"""
+    token = _current_priority.set(priority)
+    try:
+        yield
+    finally:
+        _current_priority.reset(token)
+
+
+def current_priority() -> Priority:
+    return _current_priority.get()
+
+
+class TokenBucket:
+    """Budget that refills continuously up to ``per_minute`` units"""
+
+    def __init__(self, per_minute: Optional[int]):
+        self.capacity = float(per_minute) if per_minute else None
+        self.tokens = self.capacity or 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self._updated) * self.capacity / 60
+        )
+        self._updated = now
+
+    def delay_for(self, amount: float) -> float:
+        """Seconds until ``amount`` units are available (0 when they are now)"""
+        if self.capacity is None:
+            return 0.0
+        self._refill()
+        # A request larger than the whole budget waits for a full bucket
+        missing = min(amount, self.capacity) - self.tokens
+        return 0.0 if missing <= 0 else missing * 60 / self.capacity
+
+    def consume(self, amount: float) -> None:
+        if self.capacity is not None:
+            self._refill()
+            self.tokens -= amount
+
+    def refund(self, amount: float) -> None:
+        if self.capacity is not None:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class Ticket:
+    """A granted slot; ``settle()`` corrects the token estimate once usage is known"""
+
+    def __init__(self, scheduler: "LLMScheduler", tokens: int):
+        self.scheduler = scheduler
+        self.tokens = tokens
+        self.released = False
+
+    def release(self) -> None:
+        """Give the concurrency slot back; only needed for tickets from try_acquire()"""
+        if not self.released:
+            self.released = True
+            self.scheduler._release()
+
+    def settle(self, actual_tokens: int) -> None:
+        delta = self.tokens - actual_tokens
+        if delta > 0:
+            self.scheduler.tpm.refund(delta)
+        elif delta < 0:
+            self.scheduler.tpm.consume(-delta)
+        self.tokens = actual_tokens
+
+
+class LLMScheduler:
+    """Admission control for one provider model.
+
+    Calls wait in a priority queue until a concurrency slot is free and the
+    requests-per-minute and tokens-per-minute buckets cover them, so bursts are
+    smoothed below the provider's limits instead of being rejected with 429s.
+    The highest-priority waiter is always admitted first, even when that means
+    lower classes wait for the budget to refill.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_concurrency: int = 8,
+        rpm_limit: Optional[int] = None,
+        tpm_limit: Optional[int] = None,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.rpm = TokenBucket(rpm_limit)
+        self.tpm = TokenBucket(tpm_limit)
+        self._waiters: List[Tuple[int, int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._active = 0
+        self._wakeup: Optional[asyncio.TimerHandle] = None
+        self._stats = {
+            "granted": 0,
+            "throttled": 0,
+            "max_queue_depth": 0,
+            "wait_time": {p.name.lower(): 0.0 for p in Priority},
+            "granted_by_priority": {p.name.lower(): 0 for p in Priority},
+        }
+
+    def _dispatch(self) -> None:
+        self._wakeup = None
+        while self._waiters and self._active < self.max_concurrency:
+            _, _, tokens, future = self._waiters[0]
+            if future.done():  # Cancelled while queued
+                heapq.heappop(self._waiters)
+                continue
+            delay = max(self.rpm.delay_for(1), self.tpm.delay_for(tokens))
+            if delay > 0:
+                self._stats["throttled"] += 1
+                self._wakeup = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            heapq.heappop(self._waiters)
+            self.rpm.consume(1)
+            self.tpm.consume(tokens)
+            self._active += 1
+            future.set_result(None)
+
+    async def acquire(self, tokens: int, priority: Optional[Priority] = None) -> Ticket:
+        """Wait for a slot for a request expected to use ``tokens`` tokens"""
+        priority = current_priority() if priority is None else priority
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (int(priority), next(self._sequence), tokens, future))
+        self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], len(self._waiters))
+
+        start = time.monotonic()
+        if self._wakeup is None:
+            self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Granted in the same tick we were cancelled: hand the slot back
+                self._release()
+            raise
+
+        waited = time.monotonic() - start
+        name = Priority(priority).name.lower()
+        self._stats["granted"] += 1
+        self._stats["granted_by_priority"][name] += 1
+        self._stats["wait_time"][name] += waited
+        if waited > 1:
+            logger.info(f"LLM scheduler {self.name}: {name} call waited {waited:.1f}s for capacity")
+        return Ticket(self, tokens)
+
+    def try_acquire(self, tokens: int) -> Optional[Ticket]:
+        """A slot granted right away, or None when the call would have to wait.
+
+        Nothing is queued: the caller skips the call instead. The ticket must be
+        released with ``Ticket.release()``.
+        """
+        if self._waiters or self._active >= self.max_concurrency:
+            return None
+        if max(self.rpm.delay_for(1), self.tpm.delay_for(tokens)) > 0:
+            return None
+        self.rpm.consume(1)
+        self.tpm.consume(tokens)
+        self._active += 1
+        return Ticket(self, tokens)
+
+    def _release(self) -> None:
+        self._active -= 1
+        if self._wakeup is None:
+            self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, tokens: int, priority: Optional[Priority] = None):
+        """Hold a concurrency slot and rate budget for the duration of one provider call"""
+        ticket = await self.acquire(tokens, priority)
+        try:
+            yield ticket
+        finally:
+            self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        depth = {p.name.lower(): 0 for p in Priority}
+        for priority, _, _, future in self._waiters:
+            if not future.done():
+                depth[Priority(priority).name.lower()] += 1
+        granted = self._stats["granted_by_priority"]
+        return {
+            "name": self.name,
+            "active": self._active,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": sum(depth.values()),
+            "queue_depth_by_priority": depth,
+            "max_queue_depth": self._stats["max_queue_depth"],
+            "granted": self._stats["granted"],
+            "throttled": self._stats["throttled"],
+            "avg_wait_ms_by_priority": {
+                name: round(total / granted[name] * 1000, 1) if granted[name] else 0.0
+                for name, total in self._stats["wait_time"].items()
+            },
+            "rpm_available": None if self.rpm.capacity is None else round(self.rpm.tokens, 1),
+            "tpm_available": None if self.tpm.capacity is None else round(self.tpm.tokens),
+        }
+
+
+_schedulers: Dict[Tuple[str, str, str], LLMScheduler] = {}
+
+
+def get_scheduler(settings: LLMSettings) -> LLMScheduler:
+    """One scheduler per provider endpoint and model, shared by every LLM config that uses it"""
+    key = (settings.api_type, settings.base_url, settings.model)
+    if key not in _schedulers:
+        _schedulers[key] = LLMScheduler(
+            settings.model,
+            max_concurrency=settings.max_concurrency,
+            rpm_limit=settings.rpm_limit,
+            tpm_limit=settings.tpm_limit,
+        )
+    return _schedulers[key]
+
+
+def scheduler_stats() -> List[Dict[str, Any]]:
+    return [scheduler.stats() for scheduler in _schedulers.values()]
@@ -1,7 +1,7 @@
 from enum import Enum
-from typing import Any, List, Literal, Optional, Union
+from typing import Any, Callable, List, Literal, Optional, Union
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
 
 
 class Role(str, Enum):
@@ -156,27 +156,197 @@ class Message(BaseModel):
         )
 
 
+# Default prompt budget for an agent's history, in tokens
+DEFAULT_MEMORY_TOKEN_BUDGET = 32000
+# Rough cost of one screenshot when no tokenizer is attached
+IMAGE_TOKEN_ESTIMATE = 1000
+COLLAPSED_OBSERVATION_MARKER = "[observation truncated:"
+
+
 class Memory(BaseModel):
     messages: List[Message] = Field(default_factory=list)
     max_messages: int = Field(default=100)
+    token_budget: Optional[int] = Field(
+        default=DEFAULT_MEMORY_TOKEN_BUDGET,
+        description="Tokens the history may use before it is compacted (None for no limit)",
+    )
+    keep_recent: int = Field(
+        default=8, description="Newest messages that are never collapsed or dropped"
+    )
+    max_images: int = Field(
+        default=1, description="Screenshots kept; older ones are stripped from history"
+    )
+    observation_max_chars: int = Field(
+        default=800, description="Length old tool observations are collapsed to"
+    )
+    compaction_target: float = Field(
+        default=0.75,
+        description="Fraction of token_budget and max_messages a compaction shrinks the history to; the "
+        "headroom lets several steps pass with an unchanged prefix (prompt cache hits)",
+    )
+
+    _token_counter: Optional[Callable[[List[dict]], int]] = PrivateAttr(default=None)
+    # Running token count: one size per message, kept in step by every method
+    # that changes the history so adding a message never recounts the rest
+    _sizes: List[int] = PrivateAttr(default_factory=list)
+    _total: int = PrivateAttr(default=0)
+    _counted: Optional[List[Message]] = PrivateAttr(default=None)
+
+    def set_token_counter(self, counter: Callable[[List[dict]], int]) -> None:
+        """Count with the agent's tokenizer (e.g. LLM.count_message_tokens) instead of estimating"""
+        self._token_counter = counter
+        self._counted = None
 
     def add_message(self, message: Message) -> None:
         """Add a message to memory"""
-        self.messages.append(message)
-        # Optional: Implement message limit
-        if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages :]
+        self.add_messages([message])
 
     def add_messages(self, messages: List[Message]) -> None:
         """Add multiple messages to memory"""
+        start = len(self.messages)
         self.messages.extend(messages)
-        # Optional: Implement message limit
-        if len(self.messages) > self.max_messages:
-            self.messages = self.messages[-self.max_messages :]
+        if self._in_sync(start):
+            sizes = [self._message_tokens(message) for message in messages]
+            self._sizes.extend(sizes)
+            self._total += sum(sizes)
+        self.compact()
+
+    def _message_tokens(self, message: Message) -> int:
+        data = message.to_dict()
+        data.pop("base64_image", None)
+        if self._token_counter is not None:
+            tokens = self._token_counter([data])
+        else:
+            tokens = 4 + (len(message.content or "") + len(str(data.get("tool_calls", "")))) // 4
+        return tokens + (IMAGE_TOKEN_ESTIMATE if message.base64_image else 0)
+
+    def _recount(self) -> None:
+        self._sizes = [self._message_tokens(message) for message in self.messages]
+        self._total = sum(self._sizes)
+        self._counted = self.messages
+
+    def _in_sync(self, counted: Optional[int] = None) -> bool:
+        """Whether the running count covers the first ``counted`` messages (default: all).
+
+        The history list is public: a list replaced, or grown or shrunk
+        outside these methods, is recounted in full here.
+        """
+        counted = len(self.messages) if counted is None else counted
+        if self._counted is self.messages and len(self._sizes) == counted:
+            return True
+        self._recount()
+        return False
+
+    def _replace(self, index: int, message: Message) -> None:
+        self.messages[index] = message
+        size = self._message_tokens(message)
+        self._total += size - self._sizes[index]
+        self._sizes[index] = size
+
+    def count_tokens(self) -> int:
+        """Approximate prompt tokens of the whole history"""
+        self._in_sync()
+        return self._total
+
+    def _pinned(self) -> set:
+        """Indexes never dropped: system messages and the first user message (the goal)"""
+        pinned = {i for i, m in enumerate(self.messages) if m.role == Role.SYSTEM}
+        first_user = next(
+            (i for i, m in enumerate(self.messages) if m.role == Role.USER), None
+        )
+        if first_user is not None:
+            pinned.add(first_user)
+        return pinned
+
+    def _recent_start(self) -> int:
+        """Start of the protected tail, widened so it never opens on an orphaned tool result"""
+        start = max(0, len(self.messages) - self.keep_recent)
+        while start > 0 and self.messages[start].role == Role.TOOL:
+            start -= 1
+        return start
+
+    def _strip_stale_images(self) -> None:
+        seen = 0
+        for i in range(len(self.messages) - 1, -1, -1):
+            if self.messages[i].base64_image:
+                seen += 1
+                if seen > self.max_images:
+                    self._replace(
+                        i, self.messages[i].model_copy(update={"base64_image": None})
+                    )
+
+    def _collapse_observations(self, end: int) -> None:
+        for i in range(end):
+            message = self.messages[i]
+            content = message.content or ""
+            if (
+                message.role == Role.TOOL
+                and len(content) > self.observation_max_chars
+                and COLLAPSED_OBSERVATION_MARKER not in content
+            ):
+                head = content[: self.observation_max_chars]
+                self._replace(
+                    i,
+                    message.model_copy(
+                        update={
+                            "content": f"{head}\n...{COLLAPSED_OBSERVATION_MARKER} "
+                            f"{len(content) - len(head)} more characters]"
+                        }
+                    ),
+                )
+
+    def _droppable_group(self, end: int) -> Optional[range]:
+        """Oldest unpinned turn before ``end``: an assistant message with its tool results, or one message"""
+        pinned = self._pinned()
+        for i in range(end):
+            if i in pinned:
+                continue
+            j = i + 1
+            if self.messages[i].tool_calls:
+                while j < end and self.messages[j].role == Role.TOOL:
+                    j += 1
+            return range(i, j)
+        return None
+
+    def compact(self) -> None:
+        """Keep the history within max_messages and the token budget.
+
+        Older screenshots are always stripped. When over budget, tool
+        observations outside the recent tail are collapsed first, then the
+        oldest turns are dropped whole (an assistant tool call goes together
+        with its results) until the history is down to compaction_target of
+        both limits. System messages, the first user message and the recent
+        tail are kept.
+        """
+        self._in_sync()
+        self._strip_stale_images()
+        if len(self.messages) <= self.max_messages and (
+            self.token_budget is None or self._total <= self.token_budget
+        ):
+            return
+
+        recent_start = self._recent_start()
+        self._collapse_observations(recent_start)
+
+        max_messages = int(self.max_messages * self.compaction_target)
+        target = (
+            None if self.token_budget is None else int(self.token_budget * self.compaction_target)
+        )
+        while len(self.messages) > max_messages or (target is not None and self._total > target):
+            group = self._droppable_group(recent_start)
+            if group is None:
+                break
+            self._total -= sum(self._sizes[group.start : group.stop])
+            del self._sizes[group.start : group.stop]
+            del self.messages[group.start : group.stop]
+            recent_start -= len(group)
 
     def clear(self) -> None:
         """Clear all messages"""
         self.messages.clear()
+        self._sizes.clear()
+        self._total = 0
+        self._counted = self.messages
 
     def get_recent_messages(self, n: int) -> List[Message]:
         """Get n most recent messages"""
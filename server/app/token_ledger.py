@@ -0,0 +1,140 @@
+import threading
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from server.app.logger import logger
+
+
+class RunUsage(BaseModel):
+    """Token usage of one run (an HTTP request, an agent run, a script)"""
+
+    run_id: str = Field(default_factory=lambda: uuid.uuid4().hex)
+    route: Optional[str] = None
+    user: Optional[str] = None
+    max_input_tokens: Optional[int] = Field(
+        None, description="Input token budget for the run (None falls back to the model's)"
+    )
+    input_tokens: int = 0
+    completion_tokens: int = 0
+    cached_input_tokens: int = Field(
+        0, description="Input tokens the provider served from its prompt cache"
+    )
+    requests: int = 0
+
+
+_current_run: ContextVar[Optional[RunUsage]] = ContextVar("llm_run", default=None)
+
+
+def current_run() -> Optional[RunUsage]:
+    return _current_run.get()
+
+
+@contextmanager
+def token_run(
+    route: Optional[str] = None,
+    user: Optional[str] = None,
+    max_input_tokens: Optional[int] = None,
+):
+    """Scope LLM usage and budgets to everything awaited inside the block.
+
+    Tasks created inside the block inherit the run through their context copy,
+    so a whole agent run (tools included) is charged to it.
+    """
+    run = RunUsage(route=route, user=user, max_input_tokens=max_input_tokens)
+    token = _current_run.set(run)
+    try:
+        yield run
+    finally:
+        _current_run.reset(token)
+        if run.requests:
+            logger.info(
+                f"Run {run.run_id} ({route or 'unscoped'}): {run.requests} LLM requests, "
+                f"input={run.input_tokens}, completion={run.completion_tokens}"
+            )
+
+
+class TokenLedger:
+    """Process-wide usage totals by (route, user, model), updated as each request completes"""
+
+    # Beyond this many label sets new ones are folded into a single "other" row
+    MAX_SERIES = 5000
+
+    def __init__(self):
+        self._totals: Dict[Tuple[str, str, str], Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(
+        self,
+        model: str,
+        input_tokens: int,
+        completion_tokens: int = 0,
+        cached_input_tokens: int = 0,
+    ) -> Optional[RunUsage]:
+        """Charge usage to the current run (if any) and to the aggregate; returns the run"""
+        run = current_run()
+        if run is not None:
+            run.input_tokens += input_tokens
+            run.completion_tokens += completion_tokens
+            run.cached_input_tokens += cached_input_tokens
+            if input_tokens:
+                run.requests += 1
+
+        key = (
+            (run.route if run and run.route else "unscoped"),
+            (run.user if run and run.user else "anonymous"),
+            model,
+        )
+        with self._lock:
+            if key not in self._totals and len(self._totals) >= self.MAX_SERIES:
+                key = ("other", "other", model)
+            totals = self._totals.setdefault(
+                key,
+                {"input_tokens": 0, "completion_tokens": 0, "cached_input_tokens": 0, "requests": 0},
+            )
+            totals["input_tokens"] += input_tokens
+            totals["completion_tokens"] += completion_tokens
+            totals["cached_input_tokens"] += cached_input_tokens
+            if input_tokens:
+                totals["requests"] += 1
+        return run
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [
+                {"route": route, "user": user, "model": model, **totals}
+                for (route, user, model), totals in sorted(self._totals.items())
+            ]
+
+    def prometheus(self) -> str:
+        """Totals in the Prometheus text exposition format"""
+        lines = []
+        rows = self.snapshot()
+        for metric, field, help_text in (
+            ("llm_input_tokens_total", "input_tokens", "LLM input tokens"),
+            ("llm_completion_tokens_total", "completion_tokens", "LLM completion tokens"),
+            (
+                "llm_cached_input_tokens_total",
+                "cached_input_tokens",
+                "LLM input tokens served from the provider prompt cache",
+            ),
+            ("llm_requests_total", "requests", "LLM requests"),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for row in rows:
+                labels = ",".join(
+                    f'{name}="{_escape_label(row[name])}"' for name in ("route", "user", "model")
+                )
+                lines.append(f"{metric}{{{labels}}} {row[field]}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape_label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+token_ledger = TokenLedger()
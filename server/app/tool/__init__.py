@@ -0,0 +1,22 @@
+from server.app.tool.base import BaseTool
+from server.app.tool.bash import Bash
+from server.app.tool.browser_use_tool import BrowserUseTool
+from server.app.tool.create_chat_completion import CreateChatCompletion
+from server.app.tool.planning import PlanningTool
+from server.app.tool.str_replace_editor import StrReplaceEditor
+from server.app.tool.terminate import Terminate
+from server.app.tool.tool_collection import ToolCollection
+from server.app.tool.web_search import WebSearch
+
+
+__all__ = [
+    "BaseTool",
+    "Bash",
+    "BrowserUseTool",
+    "Terminate",
+    "StrReplaceEditor",
+    "WebSearch",
+    "ToolCollection",
+    "CreateChatCompletion",
+    "PlanningTool",
+]
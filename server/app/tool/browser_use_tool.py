@@ -1,5 +1,4 @@
 import asyncio
-import base64
 import json
 from typing import Generic, Optional, TypeVar
 
@@ -13,6 +12,7 @@ from pydantic_core.core_schema import ValidationInfo
 from server.app.config import config
 from server.app.llm import LLM
 from server.app.tool.base import BaseTool, ToolResult
+from server.app.tool.screenshot import ScreenshotPipeline
 from server.app.tool.web_search import WebSearch
 
 
@@ -36,6 +36,21 @@ Note: When using element indices, refer to the numbered elements shown in the cu
 Context = TypeVar("Context")
 
 
+def _screenshot_pipeline() -> ScreenshotPipeline:
+    settings = config.browser_config
+    if settings is None:
+        return ScreenshotPipeline()
+    return ScreenshotPipeline(
+        max_tiles=settings.screenshot_max_tiles,
+        quality=settings.screenshot_quality,
+        dedupe_threshold=(
+            settings.screenshot_dedupe_threshold
+            if settings.screenshot_dedupe_threshold >= 0
+            else None
+        ),
+    )
+
+
 class BrowserUseTool(BaseTool, Generic[Context]):
     name: str = "browser_use"
     description: str = _BROWSER_DESCRIPTION
@@ -126,6 +141,9 @@ class BrowserUseTool(BaseTool, Generic[Context]):
     context: Optional[BrowserContext] = Field(default=None, exclude=True)
     dom_service: Optional[DomService] = Field(default=None, exclude=True)
     web_search_tool: WebSearch = Field(default_factory=WebSearch, exclude=True)
+    screenshots: ScreenshotPipeline = Field(
+        default_factory=lambda: _screenshot_pipeline(), exclude=True
+    )
 
     # Context for generic functionality
     tool_context: Optional[Context] = Field(default=None, exclude=True)
@@ -504,11 +522,16 @@ Page content:
             await page.bring_to_front()
             await page.wait_for_load_state()
 
+            browser_settings = config.browser_config
             screenshot = await page.screenshot(
-                full_page=True, animations="disabled", type="jpeg", quality=100
+                full_page=bool(browser_settings and browser_settings.screenshot_full_page),
+                animations="disabled",
+                type="jpeg",
+                quality=90,
+                scale="css",
             )
-
-            screenshot = base64.b64encode(screenshot).decode("utf-8")
+            # Decode/resize/compare off the event loop; None means unchanged since the last frame
+            screenshot = await asyncio.to_thread(self.screenshots.process, screenshot)
 
             # Build the state info with all required fields
             state_info = {
@@ -530,6 +553,8 @@ Page content:
                 },
                 "viewport_height": viewport_height,
             }
+            if screenshot is None:
+                state_info["screenshot"] = "unchanged since the previous step"
 
             return ToolResult(
                 output=json.dumps(state_info, indent=4, ensure_ascii=False),
@@ -548,6 +573,8 @@ Page content:
             if self.browser is not None:
                 await self.browser.close()
                 self.browser = None
+            # The next run's history has not seen the last frame
+            self.screenshots.reset()
 
     def __del__(self):
         """Ensure cleanup when object is destroyed."""
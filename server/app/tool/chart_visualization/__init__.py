@@ -1,6 +1,6 @@
-from app.tool.chart_visualization.chart_prepare import VisualizationPrepare
-from app.tool.chart_visualization.data_visualization import DataVisualization
-from app.tool.chart_visualization.python_execute import NormalPythonExecute
+from server.app.tool.chart_visualization.chart_prepare import VisualizationPrepare
+from server.app.tool.chart_visualization.data_visualization import DataVisualization
+from server.app.tool.chart_visualization.python_execute import NormalPythonExecute
 
 
 __all__ = ["DataVisualization", "VisualizationPrepare", "NormalPythonExecute"]
@@ -0,0 +1,96 @@
+"""Screenshot pipeline for browser state: downscale to a tile budget, re-encode, skip near-duplicates"""
+import base64
+import io
+import math
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image, ImageChops, ImageStat
+
+# Vision models bill images in 512px tiles after scaling the short side to 768px
+TILE_SIZE = 512
+SHORT_SIDE = 768
+# Grayscale thumbnail compared between frames
+FINGERPRINT_SIZE = (64, 40)
+
+
+def fit_to_tiles(width: int, height: int, max_tiles: int) -> Tuple[int, int]:
+    """Largest size with the same aspect ratio that costs at most ``max_tiles`` tiles"""
+    scale = min(1.0, SHORT_SIDE / min(width, height))
+    while scale > 0.05:
+        w, h = max(1, int(width * scale)), max(1, int(height * scale))
+        if math.ceil(w / TILE_SIZE) * math.ceil(h / TILE_SIZE) <= max_tiles:
+            return w, h
+        scale *= 0.9
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+def fingerprint(image: Image.Image) -> Image.Image:
+    """Small grayscale thumbnail: ignores compression noise, keeps layout and scroll position"""
+    return image.convert("L").resize(FINGERPRINT_SIZE, Image.BILINEAR)
+
+
+def frame_distance(a: Image.Image, b: Image.Image) -> float:
+    """Mean absolute gray-level difference (0-255) between two fingerprints"""
+    return ImageStat.Stat(ImageChops.difference(a, b)).mean[0]
+
+
+class ScreenshotPipeline:
+    """Per-browser screenshot processing.
+
+    Each capture is downscaled so it costs at most ``max_tiles`` image tiles,
+    re-encoded as JPEG at ``quality``, and compared with the previous frame
+    sent by perceptual fingerprint. A frame whose fingerprint differs by less
+    than ``dedupe_threshold`` is reported as a duplicate (a blinking cursor
+    scores ~0, a one-pixel scroll ~1, a new page or real scroll 30+), so the
+    caller can skip attaching it.
+    """
+
+    def __init__(
+        self, max_tiles: int = 4, quality: int = 70, dedupe_threshold: Optional[float] = 1.0
+    ):
+        self.max_tiles = max_tiles
+        self.quality = quality
+        self.dedupe_threshold = dedupe_threshold
+        self._last_fingerprint: Optional[Image.Image] = None
+        self._stats = {
+            "captured": 0,
+            "duplicates_skipped": 0,
+            "raw_bytes": 0,
+            "sent_bytes": 0,
+        }
+
+    def process(self, raw: bytes) -> Optional[str]:
+        """Return the base64 JPEG to attach, or None when the frame is a near-duplicate"""
+        self._stats["captured"] += 1
+        self._stats["raw_bytes"] += len(raw)
+        image = Image.open(io.BytesIO(raw))
+        image.load()
+
+        current = fingerprint(image)
+        if (
+            self.dedupe_threshold is not None
+            and self._last_fingerprint is not None
+            and frame_distance(current, self._last_fingerprint) < self.dedupe_threshold
+        ):
+            self._stats["duplicates_skipped"] += 1
+            return None
+        self._last_fingerprint = current
+
+        size = fit_to_tiles(image.width, image.height, self.max_tiles)
+        if size != image.size:
+            image = image.resize(size, Image.LANCZOS)
+        out = io.BytesIO()
+        image.convert("RGB").save(out, format="JPEG", quality=self.quality, optimize=True)
+        encoded = out.getvalue()
+        self._stats["sent_bytes"] += len(encoded)
+        return base64.b64encode(encoded).decode("utf-8")
+
+    def reset(self) -> None:
+        """Forget the last frame, e.g. when the history it was sent in is gone"""
+        self._last_fingerprint = None
+
+    def stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        sent = stats["captured"] - stats["duplicates_skipped"]
+        stats["avg_sent_kb"] = round(stats["sent_bytes"] / sent / 1024, 1) if sent else 0.0
+        return stats
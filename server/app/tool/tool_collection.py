@@ -20,7 +20,18 @@ class ToolCollection:
         return iter(self.tools)
 
     def to_params(self) -> List[Dict[str, Any]]:
-        return [tool.to_param() for tool in self.tools]
+        """Tool schemas sorted by name, rebuilt only when the set of tools changes.
+
+        A fixed order keeps the tools part of every request byte-identical, so
+        provider prompt caches keep hitting however the tools were registered.
+        """
+        key = tuple(id(tool) for tool in self.tools)
+        if getattr(self, "_params_key", None) != key:
+            self._params = [
+                tool.to_param() for tool in sorted(self.tools, key=lambda t: t.name)
+            ]
+            self._params_key = key
+        return self._params
 
     async def execute(
         self, *, name: str, tool_input: Dict[str, Any] = None
@@ -16,7 +16,7 @@ from server.app.tool.search import (
     GoogleSearchEngine,
     WebSearchEngine,
 )
-from app.tool.search.base import SearchItem
+from server.app.tool.search.base import SearchItem
 
 
 class SearchResult(BaseModel):
@@ -13,7 +13,6 @@ import re
 import time
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
-import psycopg2
 from psycopg2.extras import RealDictCursor
 import requests
 from selenium import webdriver
@@ -26,14 +25,23 @@ from selenium.common.exceptions import TimeoutException, WebDriverException
 import base64
 from urllib.parse import urljoin, urlparse
 
+from server.bots.opportunity_writer import OpportunityBatchWriter
+from server.database import db_manager
+
+OPPORTUNITY_COLUMNS = [
+    'title', 'description', 'deadline', 'amount_min', 'amount_max', 'currency',
+    'source_url', 'source_name', 'country', 'sector', 'eligibility_criteria',
+    'application_process', 'contact_email', 'contact_phone', 'keywords',
+    'focus_areas', 'content_hash', 'is_verified', 'verification_score'
+]
+
 class BotManager:
     def __init__(self):
         self.db_url = os.getenv('DATABASE_URL')
         if not self.db_url:
             raise ValueError("DATABASE_URL environment variable is required")
         
-        # Parse DATABASE_URL for psycopg2
-        self.db_config = self._parse_db_url(self.db_url)
+        self.batch_size = int(os.getenv('BOT_OPPORTUNITY_BATCH_SIZE', '200'))
         self.deepseek_api_key = os.getenv('DEEPSEEK_API_KEY') or "sk-7153751787d945d98a69a27db92d65ba"
         
         # Chrome options for headless browsing
@@ -47,36 +55,9 @@ class BotManager:
         # Set ChromeDriver path
         self.chrome_options.add_argument('--remote-debugging-port=9222')
         
-    def _parse_db_url(self, url: str) -> Dict[str, str]:
-        """Parse DATABASE_URL into connection parameters"""
-        from urllib.parse import urlparse, parse_qs
-        
-        parsed = urlparse(url)
-        
-        # Extract SSL mode from query parameters
-        query_params = parse_qs(parsed.query)
-        sslmode = query_params.get('sslmode', ['require'])[0]
-        
-        return {
-            'host': parsed.hostname,
-            'port': str(parsed.port or 5432),
-            'database': parsed.path.lstrip('/'),
-            'user': parsed.username,
-            'password': parsed.password,
-            'sslmode': sslmode
-        }
-    
     def get_db_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(
-            host=self.db_config['host'],
-            port=self.db_config['port'],
-            database=self.db_config['database'],
-            user=self.db_config['user'],
-            password=self.db_config['password'],
-            sslmode=self.db_config.get('sslmode', 'require'),
-            cursor_factory=RealDictCursor
-        )
+        """Borrow a connection from the shared pool"""
+        return db_manager.get_connection(cursor_factory=RealDictCursor)
     
     def get_active_bots(self) -> List[Dict]:
         """Get all active search bots from database"""
@@ -280,68 +261,46 @@ class BotManager:
         """Generate unique hash for content deduplication"""
         return hashlib.md5(content.encode('utf-8')).hexdigest()
     
-    def save_opportunity(self, opportunity: Dict[str, Any], source_url: str, source_name: str, country: str) -> bool:
-        """Save opportunity to database"""
+    def build_opportunity_row(self, opportunity: Dict[str, Any], source_url: str, source_name: str, country: str) -> Dict[str, Any]:
+        """Map an extracted opportunity onto donor_opportunities columns"""
+        content_hash = self.generate_content_hash(
+            f"{opportunity.get('title', '')}{opportunity.get('description', '')}{source_url}"
+        )
+        return {
+            'title': opportunity.get('title'),
+            'description': opportunity.get('description'),
+            'deadline': opportunity.get('deadline'),
+            'amount_min': opportunity.get('amount_min'),
+            'amount_max': opportunity.get('amount_max'),
+            'currency': opportunity.get('currency', 'USD'),
+            'source_url': source_url,
+            'source_name': source_name,
+            'country': country,
+            'sector': opportunity.get('sector'),
+            'eligibility_criteria': opportunity.get('eligibility_criteria'),
+            'application_process': opportunity.get('application_process'),
+            'contact_email': opportunity.get('contact_email'),
+            'contact_phone': opportunity.get('contact_phone'),
+            'keywords': json.dumps(opportunity.get('keywords', [])),
+            'focus_areas': json.dumps(opportunity.get('focus_areas', [])),
+            'content_hash': content_hash,
+            'is_verified': True,  # Mark as verified since it's from active scraping
+            'verification_score': 0.8  # High verification score for scraped content
+        }
+    
+    def create_opportunity_writer(self) -> OpportunityBatchWriter:
+        """Create a batched writer for this bot's opportunity columns"""
+        return OpportunityBatchWriter(OPPORTUNITY_COLUMNS, batch_size=self.batch_size)
+    
+    def save_opportunity(self, opportunity: Dict[str, Any], source_url: str, source_name: str, country: str) -> Dict[str, int]:
+        """Save a single opportunity now; returns the inserted, duplicate and dropped counts (prefer a batched writer for bot runs)"""
+        writer = self.create_opportunity_writer()
         try:
-            content_hash = self.generate_content_hash(
-                f"{opportunity.get('title', '')}{opportunity.get('description', '')}{source_url}"
-            )
-            
-            with self.get_db_connection() as conn:
-                with conn.cursor() as cur:
-                    # Check if opportunity already exists
-                    cur.execute(
-                        "SELECT id FROM donor_opportunities WHERE content_hash = %s",
-                        (content_hash,)
-                    )
-                    
-                    if cur.fetchone():
-                        print(f"Opportunity already exists: {opportunity.get('title', 'Unknown')}")
-                        return False
-                    
-                    # Insert new opportunity
-                    cur.execute("""
-                        INSERT INTO donor_opportunities (
-                            title, description, deadline, amount_min, amount_max, currency,
-                            source_url, source_name, country, sector, eligibility_criteria,
-                            application_process, contact_email, contact_phone, keywords,
-                            focus_areas, content_hash, is_verified, verification_score
-                        ) VALUES (
-                            %(title)s, %(description)s, %(deadline)s, %(amount_min)s, %(amount_max)s, %(currency)s,
-                            %(source_url)s, %(source_name)s, %(country)s, %(sector)s, %(eligibility_criteria)s,
-                            %(application_process)s, %(contact_email)s, %(contact_phone)s, %(keywords)s,
-                            %(focus_areas)s, %(content_hash)s, %(is_verified)s, %(verification_score)s
-                        ) RETURNING id
-                    """, {
-                        'title': opportunity.get('title'),
-                        'description': opportunity.get('description'),
-                        'deadline': opportunity.get('deadline'),
-                        'amount_min': opportunity.get('amount_min'),
-                        'amount_max': opportunity.get('amount_max'),
-                        'currency': opportunity.get('currency', 'USD'),
-                        'source_url': source_url,
-                        'source_name': source_name,
-                        'country': country,
-                        'sector': opportunity.get('sector'),
-                        'eligibility_criteria': opportunity.get('eligibility_criteria'),
-                        'application_process': opportunity.get('application_process'),
-                        'contact_email': opportunity.get('contact_email'),
-                        'contact_phone': opportunity.get('contact_phone'),
-                        'keywords': json.dumps(opportunity.get('keywords', [])),
-                        'focus_areas': json.dumps(opportunity.get('focus_areas', [])),
-                        'content_hash': content_hash,
-                        'is_verified': True,  # Mark as verified since it's from active scraping
-                        'verification_score': 0.8  # High verification score for scraped content
-                    })
-                    
-                    opportunity_id = cur.fetchone()['id']
-                    conn.commit()
-                    print(f"Saved opportunity: {opportunity.get('title', 'Unknown')} (ID: {opportunity_id})")
-                    return True
-                    
+            writer.add(self.build_opportunity_row(opportunity, source_url, source_name, country))
+            writer.flush()
         except Exception as e:
             print(f"Error saving opportunity: {e}")
-            return False
+        return writer.counts()
     
     def update_bot_stats(self, bot_id: str, opportunities_found: int, success: bool):
         """Update bot statistics"""
@@ -387,6 +346,7 @@ class BotManager:
         
         opportunities_found = 0
         driver = None
+        writer = self.create_opportunity_writer()
         
         try:
             driver = self.create_webdriver()
@@ -406,10 +366,10 @@ class BotManager:
                     if not opportunities:
                         continue
                     
-                    # Save opportunities to database
+                    # Queue opportunities; full batches are upserted as they fill
                     for opp in opportunities:
-                        if self.save_opportunity(opp, target['url'], target['name'], country):
-                            opportunities_found += 1
+                        if writer.add(self.build_opportunity_row(opp, target['url'], target['name'], country)):
+                            opportunities_found += writer.flush()['inserted']
                     
                     # Rate limiting
                     time.sleep(target.get('rate_limit', 30))
@@ -418,6 +378,10 @@ class BotManager:
                     print(f"Error processing target {target['name']}: {e}")
                     continue
             
+            opportunities_found += writer.flush()['inserted']
+            counts = writer.counts()
+            print(f"Bot {bot_id} stored {counts['inserted']} new opportunities, skipped {counts['duplicates']} duplicates, dropped {counts['dropped']}")
+            
             # Update bot statistics
             self.update_bot_stats(bot_id, opportunities_found, True)
             return opportunities_found
@@ -11,7 +11,6 @@ import os
 import time
 from datetime import datetime
 from typing import Dict, List, Optional, Any
-import psycopg2
 from psycopg2.extras import RealDictCursor
 import requests
 from selenium import webdriver
@@ -23,29 +22,27 @@ from selenium.common.exceptions import TimeoutException, WebDriverException
 import base64
 from urllib.parse import urljoin, urlparse
 
+from server.bots.opportunity_writer import OpportunityBatchWriter
+from server.database import db_manager
+
 app = FastAPI(title="Granada OS Bot Service", version="1.0.0")
 
+OPPORTUNITY_COLUMNS = [
+    'title', 'description', 'amount_min', 'amount_max', 'currency',
+    'deadline', 'source_url', 'source_name', 'country', 'sector',
+    'eligibility_criteria', 'application_process', 'keywords',
+    'focus_areas', 'content_hash', 'is_verified', 'is_active'
+]
+
 class BotManager:
     def __init__(self):
         self.deepseek_api_key = os.getenv('DEEPSEEK_API_KEY', 'sk-your-key')
         self.deepseek_base_url = "https://api.deepseek.com/v1"
-        self.db_config = self._parse_db_url(os.getenv('DATABASE_URL'))
-    
-    def _parse_db_url(self, url: str) -> Dict[str, str]:
-        if not url:
-            raise ValueError("DATABASE_URL environment variable not set")
-        
-        parsed = urlparse(url)
-        return {
-            'host': parsed.hostname,
-            'port': parsed.port or 5432,
-            'database': parsed.path[1:],
-            'user': parsed.username,
-            'password': parsed.password
-        }
+        self.batch_size = int(os.getenv('BOT_OPPORTUNITY_BATCH_SIZE', '200'))
     
     def get_db_connection(self):
-        return psycopg2.connect(**self.db_config)
+        """Borrow a connection from the shared pool"""
+        return db_manager.get_connection()
     
     def create_webdriver(self) -> webdriver.Chrome:
         options = Options()
@@ -135,55 +132,52 @@ class BotManager:
             "countries": [country]
         }]
     
-    def save_opportunity(self, opportunity: Dict[str, Any], source_url: str, source_name: str, country: str) -> bool:
+    def build_opportunity_row(self, opportunity: Dict[str, Any], source_url: str, source_name: str, country: str) -> Dict[str, Any]:
+        content_hash = hashlib.md5(
+            f"{opportunity['title']}{opportunity['description']}".encode()
+        ).hexdigest()
+        
+        return {
+            'title': opportunity['title'],
+            'description': opportunity['description'],
+            'amount_min': opportunity.get('amount_min'),
+            'amount_max': opportunity.get('amount_max'),
+            'currency': opportunity.get('currency', 'USD'),
+            'deadline': opportunity.get('deadline'),
+            'source_url': source_url,
+            'source_name': source_name,
+            'country': country,
+            'sector': 'Development',  # Default sector
+            'eligibility_criteria': opportunity.get('eligibility_criteria'),
+            'application_process': opportunity.get('application_process'),
+            'keywords': opportunity.get('focus_areas', []),
+            'focus_areas': opportunity.get('focus_areas', []),
+            'content_hash': content_hash,
+            'is_verified': False,
+            'is_active': True,
+        }
+    
+    def create_opportunity_writer(self) -> OpportunityBatchWriter:
+        return OpportunityBatchWriter(
+            OPPORTUNITY_COLUMNS,
+            now_columns=['scraped_at', 'created_at', 'updated_at'],
+            batch_size=self.batch_size
+        )
+    
+    def save_opportunity(self, opportunity: Dict[str, Any], source_url: str, source_name: str, country: str) -> Dict[str, int]:
+        """Save a single opportunity now; returns the inserted, duplicate and dropped counts"""
+        writer = self.create_opportunity_writer()
         try:
-            with self.get_db_connection() as conn:
-                with conn.cursor() as cursor:
-                    content_hash = hashlib.md5(
-                        f"{opportunity['title']}{opportunity['description']}".encode()
-                    ).hexdigest()
-                    
-                    cursor.execute("""
-                        INSERT INTO donor_opportunities (
-                            title, description, amount_min, amount_max, currency,
-                            deadline, source_url, source_name, country, sector,
-                            eligibility_criteria, application_process, keywords,
-                            focus_areas, content_hash, is_verified, is_active,
-                            scraped_at, created_at, updated_at
-                        ) VALUES (
-                            %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                            NOW(), NOW(), NOW()
-                        ) ON CONFLICT (content_hash) DO NOTHING
-                    """, (
-                        opportunity['title'],
-                        opportunity['description'],
-                        opportunity.get('amount_min'),
-                        opportunity.get('amount_max'),
-                        opportunity.get('currency', 'USD'),
-                        opportunity.get('deadline'),
-                        source_url,
-                        source_name,
-                        country,
-                        'Development',  # Default sector
-                        opportunity.get('eligibility_criteria'),
-                        opportunity.get('application_process'),
-                        opportunity.get('focus_areas', []),
-                        opportunity.get('focus_areas', []),
-                        content_hash,
-                        False,  # is_verified
-                        True,   # is_active
-                    ))
-                    
-                    conn.commit()
-                    return True
-                    
+            writer.add(self.build_opportunity_row(opportunity, source_url, source_name, country))
+            writer.flush()
         except Exception as e:
             print(f"Database error: {e}")
-            return False
+        return writer.counts()
     
     async def run_bot(self, bot_data: Dict) -> int:
         opportunities_found = 0
         driver = None
+        writer = self.create_opportunity_writer()
         
         try:
             # Get search targets for country
@@ -212,8 +206,8 @@ class BotManager:
                     
                     if formatted_data and 'opportunities' in formatted_data:
                         for opp in formatted_data['opportunities']:
-                            if self.save_opportunity(opp, target['url'], target['name'], bot_data['country']):
-                                opportunities_found += 1
+                            if writer.add(self.build_opportunity_row(opp, target['url'], target['name'], bot_data['country'])):
+                                opportunities_found += (await asyncio.to_thread(writer.flush))['inserted']
                     
                     # Small delay between requests
                     await asyncio.sleep(2)
@@ -222,12 +216,16 @@ class BotManager:
                     print(f"Error processing {target['url']}: {e}")
                     continue
             
+            opportunities_found += (await asyncio.to_thread(writer.flush))['inserted']
+            
         except Exception as e:
             print(f"Bot run error: {e}")
         finally:
             if driver:
                 driver.quit()
         
+        counts = writer.counts()
+        print(f"Bot {bot_data['id']} stored {counts['inserted']} new opportunities, skipped {counts['duplicates']} duplicates, dropped {counts['dropped']}")
         return opportunities_found
 
 bot_manager = BotManager()
@@ -0,0 +1,110 @@
+"""
+Batched writer for scraped funding opportunities
+Buffers rows from the bots and upserts them into donor_opportunities in one transaction per batch
+"""
+
+import logging
+from typing import Any, Dict, List, Sequence
+
+from psycopg2.extras import execute_values
+
+from server.database import db_manager
+
+logger = logging.getLogger(__name__)
+
+
+class OpportunityBatchWriter:
+    """Buffer opportunity rows and flush them with multi-row upserts.
+
+    Each flush is a single ``INSERT ... VALUES (...), (...) ON CONFLICT
+    (content_hash) DO NOTHING RETURNING content_hash`` in one transaction, so
+    deduplication happens in Postgres instead of a SELECT per row.
+    """
+
+    def __init__(
+        self,
+        columns: Sequence[str],
+        now_columns: Sequence[str] = (),
+        batch_size: int = 200,
+        database=None,
+    ):
+        if 'content_hash' not in columns:
+            raise ValueError("columns must include content_hash for deduplication")
+
+        self.columns = list(columns)
+        self.now_columns = list(now_columns)
+        self.batch_size = batch_size
+        self.database = database or db_manager
+        self._buffer: List[Dict[str, Any]] = []
+        self._buffered_hashes = set()
+        self._pending_duplicates = 0
+        self.totals = {'inserted': 0, 'duplicates': 0, 'flushes': 0, 'dropped': 0}
+
+        self._sql = (
+            f"INSERT INTO donor_opportunities ({', '.join(self.columns + self.now_columns)}) "
+            "VALUES %s ON CONFLICT (content_hash) DO NOTHING RETURNING content_hash"
+        )
+        self._template = "(" + ", ".join(
+            [f"%({column})s" for column in self.columns] + ["NOW()"] * len(self.now_columns)
+        ) + ")"
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    def add(self, row: Dict[str, Any]) -> bool:
+        """Queue a row; returns True once the batch is full and should be flushed.
+
+        Flushing is left to the caller so async callers can run it off the event loop.
+        """
+        content_hash = row['content_hash']
+        if content_hash in self._buffered_hashes:
+            # Same opportunity extracted twice before a flush
+            self._pending_duplicates += 1
+            return False
+
+        self._buffer.append({column: row.get(column) for column in self.columns})
+        self._buffered_hashes.add(content_hash)
+        return len(self._buffer) >= self.batch_size
+
+    def flush(self) -> Dict[str, int]:
+        """Write all buffered rows; returns inserted vs. duplicate counts for this flush"""
+        rows, self._buffer = self._buffer, []
+        self._buffered_hashes = set()
+        duplicates, self._pending_duplicates = self._pending_duplicates, 0
+
+        inserted = 0
+        if rows:
+            try:
+                with self.database.get_connection() as conn:
+                    with conn.cursor() as cur:
+                        returned = execute_values(
+                            cur, self._sql, rows, template=self._template,
+                            page_size=len(rows), fetch=True
+                        )
+                    conn.commit()
+            except Exception as e:
+                # The batch is not retried: a bad row would fail every later flush too
+                self.totals['dropped'] += len(rows)
+                titles = ', '.join(str(row.get('title')) for row in rows[:10])
+                logger.error(f"Dropped {len(rows)} opportunities after a failed flush ({e}): {titles}")
+                raise
+            inserted = len(returned)
+            duplicates += len(rows) - inserted
+
+        result = {'inserted': inserted, 'duplicates': duplicates}
+        if rows or duplicates:
+            self.totals['inserted'] += inserted
+            self.totals['duplicates'] += duplicates
+            self.totals['flushes'] += 1
+            logger.info(f"Flushed {len(rows)} opportunities: {inserted} inserted, {duplicates} duplicates")
+        return result
+
+    def __enter__(self) -> "OpportunityBatchWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.flush()
+
+    def counts(self) -> Dict[str, int]:
+        """Rows inserted, skipped as duplicates and dropped by failed flushes so far"""
+        return {key: self.totals[key] for key in ('inserted', 'duplicates', 'dropped')}
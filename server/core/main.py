@@ -3,8 +3,10 @@ Granada OS FastAPI Backend
 Main API server for funding opportunities platform
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from starlette.routing import Match
 import uvicorn
 from dotenv import load_dotenv
 
@@ -17,6 +19,16 @@ from ..proposals import routes as proposals_routes
 from .api.documents import routes as documents_routes
 from .api.admin import routes as admin_routes
 from .api.agent import routes as agent_routes
+from server.database import db_manager
+from server.database.migrations import run_migrations
+from server.donors.cache import opportunity_listener
+from server.app.agent.pool import agent_pool_stats, close_agent_pools, get_manus_pool
+from server.app.llm_cache import completion_cache, in_flight_requests
+from server.app.llm_scheduler import scheduler_stats
+from server.app.llm_resilience import endpoint_stats
+from server.app.llm_router import router_stats
+from server.app.token_ledger import token_ledger, token_run
+from server.app.logger import logger
 
 app = FastAPI(
     title="Granada OS API",
@@ -33,10 +45,72 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+def route_template(request: Request):
+    """Path template of the route that will serve the request, with {param} placeholders rather than values.
+
+    Routing has not run yet inside the middleware, so the match is resolved here;
+    unmatched requests get no route label rather than one series per raw URL.
+    """
+    for route in request.app.router.routes:
+        match, _ = route.matches(request.scope)
+        if match == Match.FULL:
+            return getattr(route, "path", None)
+    return None
+
+@app.middleware("http")
+async def llm_usage_scope(request: Request, call_next):
+    """Charge LLM usage and input token budgets to the route that caused it.
+
+    The API has no authenticated identity, so usage is not split by user: a
+    client-supplied header would let callers charge or hide usage under any name.
+    """
+    with token_run(route=route_template(request)):
+        return await call_next(request)
+
+@app.on_event("startup")
+async def startup_event():
+    """Apply pending database migrations, start cache invalidation and warm the agent pool.
+
+    A database that is down or not yet set up is logged rather than fatal, so the
+    routes that do not need it (LLM, proposals) still come up.
+    """
+    try:
+        await db_manager.run(run_migrations)
+    except Exception as e:
+        logger.error(f"Database migrations failed; database routes will fail until it is reachable: {e}")
+    opportunity_listener.start()
+    get_manus_pool().start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release pooled database connections and agents"""
+    await opportunity_listener.stop()
+    await close_agent_pools()
+    db_manager.close()
+
 @app.get("/")
 async def root():
     return {"message": "Granada OS FastAPI Backend", "status": "running"}
 
+@app.get("/api/llm/stats")
+async def llm_stats():
+    """Counters of the LLM completion cache, request coalescing, per-model schedulers, endpoint circuits, routing and agent pools"""
+    return {
+        "cache": completion_cache.stats(),
+        "coalescing": in_flight_requests.stats(),
+        "schedulers": scheduler_stats(),
+        "endpoints": endpoint_stats(),
+        "routers": router_stats(),
+        "agent_pools": agent_pool_stats(),
+    }
+
+@app.get("/api/llm/usage")
+async def llm_usage(format: str = "json"):
+    """Token usage by route, user and model; ``format=prometheus`` for a scrape target"""
+    if format == "prometheus":
+        return PlainTextResponse(token_ledger.prometheus(), media_type="text/plain; version=0.0.4")
+    return {"usage": token_ledger.snapshot()}
+
 app.include_router(opportunities_routes.router, prefix="/api")
 app.include_router(bots_routes.router, prefix="/api")
 app.include_router(proposals_routes.router, prefix="/api")
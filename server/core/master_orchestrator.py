@@ -10,15 +10,20 @@ from pydantic import BaseModel
 from typing import Dict, List, Optional, Any
 import asyncio
 import json
+import math
 import os
 import time
+from collections import deque
 from datetime import datetime
-import psycopg2
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 import uuid
 import httpx
 import logging
 
+from server.database import WriteBehindQueue, db_manager
+from server.database.migrations import run_migrations
+from server.database.partitions import run_partition_maintenance
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -86,130 +91,16 @@ class MasterDatabase:
             raise ValueError("DATABASE_URL environment variable not set")
 
     def get_connection(self):
-        return psycopg2.connect(self.db_url, cursor_factory=RealDictCursor)
+        return db_manager.get_connection(cursor_factory=RealDictCursor)
 
     def create_tables(self):
-        """Create all necessary tables for Granada OS services"""
+        """Bring the database schema up to date by applying pending migrations"""
         with self.get_connection() as conn:
-            with conn.cursor() as cur:
-                # Organizations table for Genesis Engine
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS organizations (
-                        id VARCHAR(50) PRIMARY KEY,
-                        name VARCHAR(255),
-                        concept TEXT,
-                        sector VARCHAR(100),
-                        location VARCHAR(100),
-                        target_audience TEXT,
-                        funding_needs VARCHAR(50),
-                        organization_type VARCHAR(50),
-                        user_id VARCHAR(50),
-                        status VARCHAR(50),
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Organization documents for Genesis Engine
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS organization_documents (
-                        id VARCHAR(50) PRIMARY KEY,
-                        organization_id VARCHAR(50),
-                        document_type VARCHAR(100),
-                        content TEXT,
-                        metadata JSONB,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (organization_id) REFERENCES organizations(id)
-                    )
-                """)
-                
-                # User CVs for Career Engine
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS user_cvs (
-                        id VARCHAR(50) PRIMARY KEY,
-                        user_id VARCHAR(50),
-                        cv_data JSONB,
-                        pdf_content BYTEA,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Interview sessions for Career Engine
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS interview_sessions (
-                        id VARCHAR(50) PRIMARY KEY,
-                        user_id VARCHAR(50),
-                        session_data JSONB,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Literature searches for Academic Engine
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS literature_searches (
-                        id VARCHAR(50) PRIMARY KEY,
-                        user_id VARCHAR(50),
-                        search_query TEXT,
-                        search_parameters JSONB,
-                        results_count INTEGER,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Research papers for Academic Engine
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS research_papers (
-                        id VARCHAR(50) PRIMARY KEY,
-                        search_id VARCHAR(50),
-                        paper_data JSONB,
-                        relevance_score FLOAT,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        FOREIGN KEY (search_id) REFERENCES literature_searches(id)
-                    )
-                """)
-                
-                # Research analyses for Academic Engine
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS research_analyses (
-                        id VARCHAR(50) PRIMARY KEY,
-                        user_id VARCHAR(50),
-                        analysis_type VARCHAR(100),
-                        content JSONB,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Master orchestration sessions
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS orchestration_sessions (
-                        id VARCHAR(50) PRIMARY KEY,
-                        user_id VARCHAR(50),
-                        task_type VARCHAR(100),
-                        goals JSONB,
-                        timeline VARCHAR(100),
-                        status VARCHAR(50),
-                        progress JSONB,
-                        services_involved JSONB,
-                        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                    )
-                """)
-                
-                # Service health monitoring
-                cur.execute("""
-                    CREATE TABLE IF NOT EXISTS service_health (
-                        id VARCHAR(50) PRIMARY KEY,
-                        service_name VARCHAR(100),
-                        status VARCHAR(50),
-                        response_time FLOAT,
-                        last_check TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                        error_details TEXT
-                    )
-                """)
-                
-                conn.commit()
-                logger.info("All Granada OS database tables created successfully")
+            applied = run_migrations(conn)
+        if applied:
+            logger.info(f"Applied database migrations: {applied}")
+        else:
+            logger.info("Database schema is up to date")
 
     def save_orchestration_session(self, session_data: Dict) -> str:
         """Save AI orchestration session"""
@@ -251,35 +142,86 @@ class MasterDatabase:
                 ))
                 conn.commit()
 
-    def log_service_health(self, service_name: str, status: str, response_time: float, error_details: str = None):
-        """Log service health status"""
-        with self.get_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    INSERT INTO service_health (id, service_name, status, response_time, error_details)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT (service_name) DO UPDATE SET
-                        status = EXCLUDED.status,
-                        response_time = EXCLUDED.response_time,
-                        last_check = CURRENT_TIMESTAMP,
-                        error_details = EXCLUDED.error_details
-                """, (
+    def write_service_health(self, conn, samples: List[Dict[str, Any]]):
+        """Append a batch of buffered health samples to the partitioned history"""
+        with conn.cursor() as cur:
+            execute_values(cur, """
+                INSERT INTO service_health (id, service_name, status, response_time, last_check, error_details)
+                VALUES %s
+            """, [
+                (
                     str(uuid.uuid4()),
-                    service_name,
-                    status,
-                    response_time,
-                    error_details
-                ))
-                conn.commit()
+                    sample["service"],
+                    sample["status"],
+                    sample["response_time"],
+                    sample["checked_at"],
+                    sample["error"]
+                )
+                for sample in samples
+            ], page_size=len(samples))
+        conn.commit()
 
 # Initialize database
 master_db = MasterDatabase()
 
+HEALTH_CHECK_INTERVAL = float(os.environ.get("HEALTH_CHECK_INTERVAL", "30"))
+HEALTH_SAMPLE_WINDOW = int(os.environ.get("HEALTH_SAMPLE_WINDOW", "256"))
+HEALTH_FLUSH_INTERVAL = float(os.environ.get("HEALTH_FLUSH_INTERVAL", "60"))
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))]
+
 class ServiceHealthMonitor:
-    """Monitor health of all Granada OS services"""
+    """Monitor health of all Granada OS services
+
+    Probes run in a background loop. Every sample lands in a per-service ring
+    buffer (for percentile summaries) and a write-behind queue that appends it
+    to the monthly-partitioned service_health history in periodic batches.
+    /health serves the cached snapshot without touching Postgres.
+    """
     
     def __init__(self):
         self.client = httpx.AsyncClient(timeout=10.0)
+        self.samples: Dict[str, deque] = {}
+        self.last_status: Optional[Dict[str, Any]] = None
+        self.writer = WriteBehindQueue(
+            "service_health",
+            master_db.write_service_health,
+            max_batch=200,
+            flush_interval=HEALTH_FLUSH_INTERVAL,
+            max_pending=HEALTH_SAMPLE_WINDOW * len(SERVICE_REGISTRY)
+        )
+        self._loop_task: Optional[asyncio.Task] = None
+    
+    def record_sample(self, service_name: str, status: str, response_time: float, error: Optional[str] = None):
+        """Keep a health sample in memory and queue it for persistence"""
+        sample = {
+            "service": service_name,
+            "status": status,
+            "response_time": response_time,
+            "error": error,
+            "checked_at": datetime.now()
+        }
+        self.samples.setdefault(service_name, deque(maxlen=HEALTH_SAMPLE_WINDOW)).append(sample)
+        self.writer.put(sample)
+    
+    def summarize(self, service_name: str) -> Dict[str, Any]:
+        """Response-time percentiles and availability over the sample window"""
+        samples = list(self.samples.get(service_name, ()))
+        timings = [s["response_time"] for s in samples if s["status"] != "down"]
+        healthy = sum(1 for s in samples if s["status"] == "healthy")
+        
+        return {
+            "samples": len(samples),
+            "availability": round(healthy / len(samples), 4) if samples else None,
+            "response_time_p50": _percentile(timings, 50),
+            "response_time_p95": _percentile(timings, 95),
+            "response_time_max": max(timings) if timings else None
+        }
         
     async def check_service_health(self, service_name: str, service_config: Dict) -> Dict[str, Any]:
         """Check health of individual service"""
@@ -289,28 +231,31 @@ class ServiceHealthMonitor:
             response_time = time.time() - start_time
             
             if response.status_code == 200:
-                master_db.log_service_health(service_name, "healthy", response_time)
+                self.record_sample(service_name, "healthy", response_time)
                 return {
                     "service": service_name,
                     "status": "healthy",
                     "response_time": response_time,
-                    "url": service_config["url"]
+                    "url": service_config["url"],
+                    "summary": self.summarize(service_name)
                 }
             else:
-                master_db.log_service_health(service_name, "unhealthy", response_time, f"HTTP {response.status_code}")
+                self.record_sample(service_name, "unhealthy", response_time, f"HTTP {response.status_code}")
                 return {
                     "service": service_name,
                     "status": "unhealthy", 
                     "response_time": response_time,
-                    "error": f"HTTP {response.status_code}"
+                    "error": f"HTTP {response.status_code}",
+                    "summary": self.summarize(service_name)
                 }
                 
         except Exception as e:
-            master_db.log_service_health(service_name, "down", 0, str(e))
+            self.record_sample(service_name, "down", 0, str(e))
             return {
                 "service": service_name,
                 "status": "down",
-                "error": str(e)
+                "error": str(e),
+                "summary": self.summarize(service_name)
             }
     
     async def check_all_services(self) -> Dict[str, Any]:
@@ -324,13 +269,46 @@ class ServiceHealthMonitor:
         
         healthy_count = sum(1 for r in results if isinstance(r, dict) and r.get("status") == "healthy")
         
-        return {
+        self.last_status = {
             "overall_status": "healthy" if healthy_count == len(SERVICE_REGISTRY) else "degraded",
             "healthy_services": healthy_count,
             "total_services": len(SERVICE_REGISTRY),
             "services": results,
             "last_check": datetime.now().isoformat()
         }
+        return self.last_status
+    
+    async def get_status(self, refresh: bool = False) -> Dict[str, Any]:
+        """Latest health snapshot; probes the services only when asked or when none exists"""
+        if refresh or self.last_status is None:
+            return await self.check_all_services()
+        return self.last_status
+    
+    async def _run_checks(self):
+        while True:
+            await asyncio.sleep(HEALTH_CHECK_INTERVAL)
+            try:
+                await self.check_all_services()
+            except Exception as e:
+                logger.error(f"Health check loop failed: {str(e)}")
+    
+    def start(self):
+        """Start the periodic probe loop and the telemetry writer"""
+        self.writer.start()
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._run_checks())
+    
+    async def stop(self):
+        """Stop probing and flush buffered samples to Postgres"""
+        if self._loop_task is not None:
+            self._loop_task.cancel()
+            try:
+                await self._loop_task
+            except asyncio.CancelledError:
+                pass
+            self._loop_task = None
+        await self.writer.stop()
+        await self.client.aclose()
 
 health_monitor = ServiceHealthMonitor()
 
@@ -343,7 +321,7 @@ class AIOrchestrator:
     async def orchestrate_comprehensive_setup(self, request: AIOrchestrationRequest) -> Dict[str, Any]:
         """Orchestrate complete organization setup using multiple services"""
         
-        session_id = master_db.save_orchestration_session({
+        session_id = await asyncio.to_thread(master_db.save_orchestration_session, {
             "user_id": request.user_id,
             "task_type": request.task_type,
             "goals": request.goals,
@@ -442,7 +420,8 @@ class AIOrchestrator:
                 execution_results["overall_progress"] = int(((i + 1) / total_phases) * 100)
                 
                 # Update database
-                master_db.update_session_progress(
+                await asyncio.to_thread(
+                    master_db.update_session_progress,
                     session_id, 
                     execution_results, 
                     plan["services_involved"]
@@ -530,6 +509,21 @@ ai_orchestrator = AIOrchestrator()
 
 # API Endpoints
 
+PARTITION_MAINTENANCE_INTERVAL = float(os.environ.get("PARTITION_MAINTENANCE_INTERVAL", str(6 * 3600)))
+partition_task: Optional[asyncio.Task] = None
+
+async def partition_maintenance_loop():
+    """Create upcoming partitions and drop expired ones for the history tables"""
+    while True:
+        try:
+            report = await db_manager.run(run_partition_maintenance)
+            dropped = {table: r["dropped"] for table, r in report.items() if r["dropped"]}
+            if dropped:
+                logger.info(f"Dropped expired partitions: {dropped}")
+        except Exception as e:
+            logger.error(f"Partition maintenance failed: {str(e)}")
+        await asyncio.sleep(PARTITION_MAINTENANCE_INTERVAL)
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize database and services on startup"""
@@ -537,13 +531,25 @@ async def startup_event():
         master_db.create_tables()
         logger.info("Granada OS Master Orchestrator started successfully")
         
-        # Initial health check
+        # Initial health check, then keep probing in the background
+        health_monitor.start()
         health_status = await health_monitor.check_all_services()
         logger.info(f"Service health check: {health_status['healthy_services']}/{health_status['total_services']} services healthy")
         
+        global partition_task
+        partition_task = asyncio.create_task(partition_maintenance_loop())
+        
     except Exception as e:
         logger.error(f"Startup failed: {str(e)}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush buffered telemetry and release pooled database connections"""
+    if partition_task is not None:
+        partition_task.cancel()
+    await health_monitor.stop()
+    db_manager.close()
+
 @app.get("/")
 async def root():
     return {
@@ -556,14 +562,19 @@ async def root():
     }
 
 @app.get("/health")
-async def health_check():
-    """Comprehensive health check of all services"""
+async def health_check(refresh: bool = False):
+    """Comprehensive health check of all services
+
+    Serves the snapshot from the background probe loop; ``refresh=true`` probes now.
+    """
     try:
-        service_health = await health_monitor.check_all_services()
+        service_health = await health_monitor.get_status(refresh)
         
         return {
             "orchestrator_status": "healthy",
             "database_status": "connected",
+            "database_pool": db_manager.stats(),
+            "telemetry_writer": health_monitor.writer.stats(),
             "services": service_health,
             "timestamp": datetime.now().isoformat()
         }
@@ -643,68 +654,104 @@ async def unified_api_gateway(request: UnifiedRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Gateway request failed: {str(e)}")
 
+def _fetch_orchestration_session(conn, session_id: str):
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT * FROM orchestration_sessions WHERE id = %s
+        """, (session_id,))
+        return cur.fetchone()
+
 @app.get("/orchestration/{session_id}/status")
 async def get_orchestration_status(session_id: str):
     """Get orchestration session status"""
     try:
-        with master_db.get_connection() as conn:
-            with conn.cursor() as cur:
-                cur.execute("""
-                    SELECT * FROM orchestration_sessions WHERE id = %s
-                """, (session_id,))
-                
-                session = cur.fetchone()
-                if not session:
-                    raise HTTPException(status_code=404, detail="Session not found")
-                
-                return {
-                    "session_id": session_id,
-                    "status": session["status"],
-                    "progress": json.loads(session["progress"]) if session["progress"] else {},
-                    "services_involved": json.loads(session["services_involved"]) if session["services_involved"] else [],
-                    "created_at": session["created_at"].isoformat(),
-                    "updated_at": session["updated_at"].isoformat()
-                }
+        session = await db_manager.run(_fetch_orchestration_session, session_id, cursor_factory=RealDictCursor)
+        if not session:
+            raise HTTPException(status_code=404, detail="Session not found")
+        
+        return {
+            "session_id": session_id,
+            "status": session["status"],
+            "progress": json.loads(session["progress"]) if session["progress"] else {},
+            "services_involved": json.loads(session["services_involved"]) if session["services_involved"] else [],
+            "created_at": session["created_at"].isoformat(),
+            "updated_at": session["updated_at"].isoformat()
+        }
                 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Status check failed: {str(e)}")
 
+# platform metric name -> table whose rows it counts (maintained by migration 5 triggers)
+PLATFORM_METRICS = {
+    "total_orchestration_sessions": "orchestration_sessions",
+    "organizations_created": "organizations",
+    "cvs_generated": "user_cvs",
+    "literature_searches": "literature_searches"
+}
+
+def _read_platform_metrics(conn) -> Dict[str, int]:
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT metric, value FROM platform_counters WHERE metric = ANY(%s)
+        """, (list(PLATFORM_METRICS.values()),))
+        counters = {row["metric"]: row["value"] for row in cur.fetchall()}
+        
+        return {name: counters.get(table, 0) for name, table in PLATFORM_METRICS.items()}
+
+def _read_platform_series(conn, bucket: str, days: int) -> List[Dict[str, Any]]:
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT date_trunc(%s, day)::date AS bucket, metric, SUM(value) AS value
+            FROM platform_daily_stats
+            WHERE day >= CURRENT_DATE - %s AND metric = ANY(%s)
+            GROUP BY 1, 2
+            ORDER BY 1
+        """, (bucket, days, list(PLATFORM_METRICS.values())))
+        
+        series: Dict[str, Dict[str, Any]] = {}
+        for row in cur.fetchall():
+            point = series.setdefault(row["bucket"].isoformat(), {
+                "bucket": row["bucket"].isoformat(),
+                **{name: 0 for name in PLATFORM_METRICS}
+            })
+            for name, table in PLATFORM_METRICS.items():
+                if table == row["metric"]:
+                    point[name] = int(row["value"])
+        return list(series.values())
+
 @app.get("/analytics/platform")
-async def get_platform_analytics():
-    """Get comprehensive platform analytics"""
+async def get_platform_analytics(bucket: Optional[str] = None, days: int = 30):
+    """Get comprehensive platform analytics
+
+    Totals come from trigger-maintained counters, so the cost does not grow with
+    table size. Pass ``bucket=day`` or ``bucket=week`` for a series over ``days``.
+    """
+    if bucket is not None and bucket not in ("day", "week"):
+        raise HTTPException(status_code=400, detail="bucket must be 'day' or 'week'")
+    
     try:
-        with master_db.get_connection() as conn:
-            with conn.cursor() as cur:
-                # Get orchestration sessions count
-                cur.execute("SELECT COUNT(*) as total FROM orchestration_sessions")
-                sessions_count = cur.fetchone()["total"]
-                
-                # Get organizations count
-                cur.execute("SELECT COUNT(*) as total FROM organizations")
-                orgs_count = cur.fetchone()["total"]
-                
-                # Get CVs count
-                cur.execute("SELECT COUNT(*) as total FROM user_cvs")
-                cvs_count = cur.fetchone()["total"]
-                
-                # Get literature searches count
-                cur.execute("SELECT COUNT(*) as total FROM literature_searches")
-                searches_count = cur.fetchone()["total"]
-                
-                return {
-                    "platform_metrics": {
-                        "total_orchestration_sessions": sessions_count,
-                        "organizations_created": orgs_count,
-                        "cvs_generated": cvs_count,
-                        "literature_searches": searches_count
-                    },
-                    "service_architecture": {
-                        "backend_services": len(SERVICE_REGISTRY),
-                        "python_fastapi_percentage": 90,
-                        "react_frontend_percentage": 10
-                    },
-                    "generated_at": datetime.now().isoformat()
-                }
+        platform_metrics = await db_manager.run(_read_platform_metrics, cursor_factory=RealDictCursor)
+        
+        analytics = {
+            "platform_metrics": platform_metrics,
+            "service_architecture": {
+                "backend_services": len(SERVICE_REGISTRY),
+                "python_fastapi_percentage": 90,
+                "react_frontend_percentage": 10
+            },
+            "generated_at": datetime.now().isoformat()
+        }
+        
+        if bucket:
+            analytics["series"] = {
+                "bucket": bucket,
+                "days": days,
+                "points": await db_manager.run(_read_platform_series, bucket, days, cursor_factory=RealDictCursor)
+            }
+        
+        return analytics
                 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analytics failed: {str(e)}")
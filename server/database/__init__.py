@@ -0,0 +1,5 @@
+from server.database.database import DatabaseManager, PoolTimeoutError, db_manager
+from server.database.listener import NotificationListener
+from server.database.write_behind import WriteBehindQueue
+
+__all__ = ["DatabaseManager", "NotificationListener", "PoolTimeoutError", "WriteBehindQueue", "db_manager"]
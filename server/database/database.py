@@ -1,27 +1,208 @@
+import asyncio
+import functools
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional, TypeVar
+
 import psycopg2
-from psycopg2.extras import RealDictCursor
-from urllib.parse import urlparse
-from typing import Dict
+from psycopg2 import pool as pg_pool
+
+T = TypeVar('T')
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time"""
+
 
 class DatabaseManager:
-    def __init__(self):
-        self.db_config = self._parse_db_url(os.getenv('DATABASE_URL'))
-    
-    def _parse_db_url(self, url: str) -> Dict[str, str]:
-        if not url:
-            raise ValueError("DATABASE_URL environment variable not set")
-        
-        parsed = urlparse(url)
+    """Process-wide pooled access to the Granada OS Postgres database.
+
+    Connections are opened lazily, kept in a ThreadedConnectionPool and handed
+    out through ``get_connection()``, which behaves like
+    ``with psycopg2.connect(...) as conn``: commit on success, rollback on
+    error - except that the connection goes back to the pool instead of leaking.
+
+    Async handlers use ``run()``, which borrows the connection, executes the
+    query code and hands the connection back on a bounded worker pool, so
+    neither a slow statement nor the commit stalls the event loop.
+    """
+
+    def __init__(
+        self,
+        dsn: Optional[str] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        acquire_timeout: Optional[float] = None,
+        health_check_interval: Optional[float] = None,
+    ):
+        self.dsn = dsn or os.getenv('DATABASE_URL')
+        self.min_size = min_size if min_size is not None else int(os.getenv('DB_POOL_MIN_SIZE', '1'))
+        self.max_size = max_size if max_size is not None else int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+        self.acquire_timeout = (
+            acquire_timeout if acquire_timeout is not None
+            else float(os.getenv('DB_POOL_ACQUIRE_TIMEOUT', '10'))
+        )
+        # Connections idle for longer than this are pinged before being handed out
+        self.health_check_interval = (
+            health_check_interval if health_check_interval is not None
+            else float(os.getenv('DB_POOL_HEALTH_CHECK_INTERVAL', '30'))
+        )
+
+        if self.min_size < 0 or self.max_size < 1 or self.min_size > self.max_size:
+            raise ValueError(f"Invalid pool size: min={self.min_size}, max={self.max_size}")
+
+        self._pool: Optional[pg_pool.ThreadedConnectionPool] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+        self._last_used: Dict[int, float] = {}
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            'acquired': 0,
+            'released': 0,
+            'timeouts': 0,
+            'health_check_failures': 0,
+            'total_wait_time': 0.0,
+        }
+
+    def _get_pool(self) -> pg_pool.ThreadedConnectionPool:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    if not self.dsn:
+                        raise ValueError("DATABASE_URL environment variable not set")
+                    self._pool = pg_pool.ThreadedConnectionPool(self.min_size, self.max_size, self.dsn)
+        return self._pool
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        last_used = self._last_used.get(id(conn))
+        if last_used is not None and time.monotonic() - last_used < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _acquire(self, cursor_factory=None):
+        start = time.monotonic()
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._stats_lock:
+                self._stats['timeouts'] += 1
+            raise PoolTimeoutError(
+                f"Timed out after {self.acquire_timeout}s waiting for a database connection"
+            )
+
+        try:
+            pool = self._get_pool()
+            conn = pool.getconn()
+            if not self._is_healthy(conn):
+                with self._stats_lock:
+                    self._stats['health_check_failures'] += 1
+                self._last_used.pop(id(conn), None)
+                pool.putconn(conn, close=True)
+                conn = pool.getconn()
+        except Exception:
+            self._slots.release()
+            raise
+
+        conn.cursor_factory = cursor_factory
+        with self._stats_lock:
+            self._stats['acquired'] += 1
+            self._stats['total_wait_time'] += time.monotonic() - start
+        return conn
+
+    def _release(self, conn) -> None:
+        try:
+            conn.cursor_factory = None
+            self._last_used[id(conn)] = time.monotonic()
+            if conn.closed:
+                self._last_used.pop(id(conn), None)
+            self._get_pool().putconn(conn, close=bool(conn.closed))
+        finally:
+            self._slots.release()
+            with self._stats_lock:
+                self._stats['released'] += 1
+
+    @staticmethod
+    def _finish(conn, failed: bool) -> None:
+        if conn.closed:
+            return
+        if failed:
+            conn.rollback()
+        else:
+            conn.commit()
+
+    @contextmanager
+    def get_connection(self, cursor_factory=None):
+        """Borrow a pooled connection for the duration of a ``with`` block"""
+        conn = self._acquire(cursor_factory)
+        try:
+            yield conn
+        except BaseException:
+            self._finish(conn, failed=True)
+            raise
+        else:
+            self._finish(conn, failed=False)
+        finally:
+            self._release(conn)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._pool_lock:
+                if self._executor is None:
+                    # One worker per pooled connection: more threads would only queue on the pool
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_size, thread_name_prefix='db')
+        return self._executor
+
+    def _run_with_connection(self, fn: Callable[..., T], cursor_factory, args, kwargs) -> T:
+        with self.get_connection(cursor_factory=cursor_factory) as conn:
+            return fn(conn, *args, **kwargs)
+
+    async def run(self, fn: Callable[..., T], *args, cursor_factory=None, **kwargs) -> T:
+        """Run ``fn(conn, *args, **kwargs)`` off the event loop with a pooled connection"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(),
+            functools.partial(self._run_with_connection, fn, cursor_factory, args, kwargs),
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool configuration and usage counters"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        in_use = stats['acquired'] - stats['released']
+        pool = self._pool
         return {
-            'host': parsed.hostname,
-            'port': parsed.port or 5432,
-            'database': parsed.path[1:],
-            'user': parsed.username,
-            'password': parsed.password
+            'min_size': self.min_size,
+            'max_size': self.max_size,
+            'acquire_timeout': self.acquire_timeout,
+            'open_connections': (len(pool._pool) + len(pool._used)) if pool else 0,
+            'idle_connections': len(pool._pool) if pool else 0,
+            'in_use': in_use,
+            'acquired': stats['acquired'],
+            'timeouts': stats['timeouts'],
+            'health_check_failures': stats['health_check_failures'],
+            'avg_wait_ms': round(stats['total_wait_time'] / stats['acquired'] * 1000, 3) if stats['acquired'] else 0.0,
         }
-    
-    def get_connection(self):
-        return psycopg2.connect(**self.db_config)
+
+    def close(self) -> None:
+        """Close every pooled connection and stop the query workers"""
+        with self._pool_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                self._last_used.clear()
+
 
 db_manager = DatabaseManager()
@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import os
+from typing import Callable, Optional
+
+import psycopg2
+from psycopg2 import sql
+
+logger = logging.getLogger(__name__)
+
+
+class NotificationListener:
+    """Deliver Postgres NOTIFY payloads for one channel to a callback on the event loop.
+
+    Uses its own autocommit connection rather than a pooled one, since LISTEN
+    holds the session for the lifetime of the process. The socket is watched
+    with ``loop.add_reader`` so waiting for notifications costs no thread.
+
+    Notifications sent while disconnected are lost, so ``on_connect`` and
+    ``on_disconnect`` let callers drop or stop trusting derived state. The
+    listener reconnects after ``reconnect_delay`` seconds.
+    """
+
+    def __init__(
+        self,
+        channel: str,
+        on_notify: Callable[[str], None],
+        on_connect: Optional[Callable[[], None]] = None,
+        on_disconnect: Optional[Callable[[], None]] = None,
+        dsn: Optional[str] = None,
+        reconnect_delay: float = 5.0,
+    ):
+        self.channel = channel
+        self.on_notify = on_notify
+        self.on_connect = on_connect
+        self.on_disconnect = on_disconnect
+        self.dsn = dsn or os.getenv('DATABASE_URL')
+        self.reconnect_delay = reconnect_delay
+        self.connected = False
+        self._task: Optional[asyncio.Task] = None
+        self._stats = {'notifications': 0, 'connects': 0, 'disconnects': 0}
+
+    def _connect(self):
+        # Keepalives make a silently dropped connection surface as a read error
+        conn = psycopg2.connect(
+            self.dsn, keepalives=1, keepalives_idle=30, keepalives_interval=10, keepalives_count=3
+        )
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(sql.SQL("LISTEN {}").format(sql.Identifier(self.channel)))
+        return conn
+
+    def _drain(self, conn, lost: asyncio.Event) -> None:
+        try:
+            conn.poll()
+        except psycopg2.Error as e:
+            logger.warning(f"LISTEN {self.channel}: connection lost: {e}")
+            lost.set()
+            return
+        while conn.notifies:
+            notification = conn.notifies.pop(0)
+            self._stats['notifications'] += 1
+            try:
+                self.on_notify(notification.payload)
+            except Exception as e:
+                logger.error(f"LISTEN {self.channel}: handler failed: {e}")
+
+    def _set_connected(self, connected: bool) -> None:
+        self.connected = connected
+        self._stats['connects' if connected else 'disconnects'] += 1
+        callback = self.on_connect if connected else self.on_disconnect
+        if callback is not None:
+            callback()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                conn = await asyncio.to_thread(self._connect)
+            except Exception as e:
+                logger.error(f"LISTEN {self.channel}: could not connect: {e}")
+                await asyncio.sleep(self.reconnect_delay)
+                continue
+
+            lost = asyncio.Event()
+            fd = conn.fileno()
+            loop.add_reader(fd, self._drain, conn, lost)
+            self._set_connected(True)
+            try:
+                await lost.wait()
+            finally:
+                loop.remove_reader(fd)
+                conn.close()
+                self._set_connected(False)
+            await asyncio.sleep(self.reconnect_delay)
+
+    def start(self) -> None:
+        """Start listening on the running event loop"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=f"listen:{self.channel}")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self):
+        return {'channel': self.channel, 'connected': self.connected, **self._stats}
@@ -0,0 +1,561 @@
+"""
+Versioned schema migrations for the Granada OS Postgres database
+
+Each migration runs once, in its own transaction, and is recorded in
+schema_migrations. Startup therefore costs a single SELECT once the schema is
+current. Append new migrations to MIGRATIONS; never edit one that has shipped.
+
+A migration that needs a table declared in shared/schema.ts raises
+undefined_table while that table is missing. It is then left pending, with
+the migrations after it, until a later run finds the table.
+"""
+
+import logging
+from typing import List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary key shared by every service so concurrent startups apply migrations once
+MIGRATION_LOCK_ID = 727_001
+# SQLSTATE of a missing table
+UNDEFINED_TABLE = "42P01"
+
+MIGRATIONS: List[Tuple[int, str, str]] = [
+    (1, "baseline_service_tables", """
+    -- Organizations table for Genesis Engine
+    CREATE TABLE IF NOT EXISTS organizations (
+        id VARCHAR(50) PRIMARY KEY,
+        name VARCHAR(255),
+        concept TEXT,
+        sector VARCHAR(100),
+        location VARCHAR(100),
+        target_audience TEXT,
+        funding_needs VARCHAR(50),
+        organization_type VARCHAR(50),
+        user_id VARCHAR(50),
+        status VARCHAR(50),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Organization documents for Genesis Engine
+    CREATE TABLE IF NOT EXISTS organization_documents (
+        id VARCHAR(50) PRIMARY KEY,
+        organization_id VARCHAR(50),
+        document_type VARCHAR(100),
+        content TEXT,
+        metadata JSONB,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (organization_id) REFERENCES organizations(id)
+    );
+
+    -- User CVs for Career Engine
+    CREATE TABLE IF NOT EXISTS user_cvs (
+        id VARCHAR(50) PRIMARY KEY,
+        user_id VARCHAR(50),
+        cv_data JSONB,
+        pdf_content BYTEA,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Interview sessions for Career Engine
+    CREATE TABLE IF NOT EXISTS interview_sessions (
+        id VARCHAR(50) PRIMARY KEY,
+        user_id VARCHAR(50),
+        session_data JSONB,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Literature searches for Academic Engine
+    CREATE TABLE IF NOT EXISTS literature_searches (
+        id VARCHAR(50) PRIMARY KEY,
+        user_id VARCHAR(50),
+        search_query TEXT,
+        search_parameters JSONB,
+        results_count INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Research papers for Academic Engine
+    CREATE TABLE IF NOT EXISTS research_papers (
+        id VARCHAR(50) PRIMARY KEY,
+        search_id VARCHAR(50),
+        paper_data JSONB,
+        relevance_score FLOAT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (search_id) REFERENCES literature_searches(id)
+    );
+
+    -- Research analyses for Academic Engine
+    CREATE TABLE IF NOT EXISTS research_analyses (
+        id VARCHAR(50) PRIMARY KEY,
+        user_id VARCHAR(50),
+        analysis_type VARCHAR(100),
+        content JSONB,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Master orchestration sessions
+    CREATE TABLE IF NOT EXISTS orchestration_sessions (
+        id VARCHAR(50) PRIMARY KEY,
+        user_id VARCHAR(50),
+        task_type VARCHAR(100),
+        goals JSONB,
+        timeline VARCHAR(100),
+        status VARCHAR(50),
+        progress JSONB,
+        services_involved JSONB,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    -- Service health monitoring
+    CREATE TABLE IF NOT EXISTS service_health (
+        id VARCHAR(50) PRIMARY KEY,
+        service_name VARCHAR(100),
+        status VARCHAR(50),
+        response_time FLOAT,
+        last_check TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        error_details TEXT
+    );
+"""),
+    (2, "service_health_unique_service_name", """
+    -- log_service_health upserts ON CONFLICT (service_name); keep the newest row per service
+    DELETE FROM service_health a
+        USING service_health b
+        WHERE a.service_name = b.service_name
+          AND (a.last_check, a.ctid) < (b.last_check, b.ctid);
+
+    CREATE UNIQUE INDEX IF NOT EXISTS uq_service_health_service_name
+        ON service_health (service_name);
+"""),
+    (3, "opportunity_and_target_indexes", """
+    -- Both tables are declared in shared/schema.ts; wait for drizzle-kit push to create them
+    DO $$
+    BEGIN
+        IF to_regclass('donor_opportunities') IS NULL OR to_regclass('search_targets') IS NULL THEN
+            RAISE EXCEPTION 'donor_opportunities and search_targets do not exist yet'
+                USING ERRCODE = 'undefined_table';
+        END IF;
+    END
+    $$;
+
+    -- GET /opportunities: active rows newest first, keyset on (created_at, id)
+    CREATE INDEX IF NOT EXISTS idx_donor_opportunities_active_created
+        ON donor_opportunities (created_at DESC, id DESC)
+        WHERE is_active = true;
+
+    CREATE INDEX IF NOT EXISTS idx_donor_opportunities_active_country_created
+        ON donor_opportunities (country, created_at DESC)
+        WHERE is_active = true;
+
+    CREATE INDEX IF NOT EXISTS idx_donor_opportunities_active_sector_created
+        ON donor_opportunities (sector, created_at DESC)
+        WHERE is_active = true;
+
+    -- Bots load their targets by country
+    CREATE INDEX IF NOT EXISTS idx_search_targets_active_country
+        ON search_targets (country)
+        WHERE is_active = true;
+"""),
+    (4, "donor_opportunities_full_text_search", """
+    -- search_vector is kept current by a trigger so writers (bots, create_opportunity)
+    -- need no changes; weights rank title hits above keyword/focus-area hits, and so on.
+    ALTER TABLE donor_opportunities ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+    CREATE OR REPLACE FUNCTION donor_opportunities_search_vector_update() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('english', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('english',
+                coalesce(NEW.keywords::text, '') || ' ' || coalesce(NEW.focus_areas::text, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce(NEW.description, '')), 'C') ||
+            setweight(to_tsvector('english', coalesce(NEW.eligibility_criteria, '')), 'D');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS donor_opportunities_search_vector_trg ON donor_opportunities;
+    CREATE TRIGGER donor_opportunities_search_vector_trg
+        BEFORE INSERT OR UPDATE OF title, description, keywords, focus_areas, eligibility_criteria
+        ON donor_opportunities
+        FOR EACH ROW EXECUTE FUNCTION donor_opportunities_search_vector_update();
+
+    CREATE INDEX IF NOT EXISTS idx_donor_opportunities_search_vector
+        ON donor_opportunities USING GIN (search_vector);
+
+    -- Backfill rows written before the trigger existed
+    UPDATE donor_opportunities SET title = title WHERE search_vector IS NULL;
+"""),
+    (5, "platform_analytics_rollups", """
+    -- /analytics/platform reads these instead of COUNT(*) over each table.
+    -- Statement-level triggers fold a whole INSERT/DELETE into one counter update.
+    LOCK TABLE orchestration_sessions, organizations, user_cvs, literature_searches IN SHARE ROW EXCLUSIVE MODE;
+
+    CREATE TABLE IF NOT EXISTS platform_counters (
+        metric VARCHAR(100) PRIMARY KEY,
+        value BIGINT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS platform_daily_stats (
+        day DATE NOT NULL,
+        metric VARCHAR(100) NOT NULL,
+        value BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, metric)
+    );
+
+    CREATE OR REPLACE FUNCTION platform_counters_on_insert() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO platform_counters AS c (metric, value)
+            SELECT TG_TABLE_NAME, count(*) FROM new_rows
+        ON CONFLICT (metric) DO UPDATE
+            SET value = c.value + EXCLUDED.value, updated_at = CURRENT_TIMESTAMP;
+        INSERT INTO platform_daily_stats AS d (day, metric, value)
+            SELECT coalesce(created_at, CURRENT_TIMESTAMP)::date, TG_TABLE_NAME, count(*)
+            FROM new_rows GROUP BY 1
+        ON CONFLICT (day, metric) DO UPDATE SET value = d.value + EXCLUDED.value;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION platform_counters_on_delete() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO platform_counters AS c (metric, value)
+            SELECT TG_TABLE_NAME, -count(*) FROM old_rows
+        ON CONFLICT (metric) DO UPDATE
+            SET value = c.value + EXCLUDED.value, updated_at = CURRENT_TIMESTAMP;
+        INSERT INTO platform_daily_stats AS d (day, metric, value)
+            SELECT coalesce(created_at, CURRENT_TIMESTAMP)::date, TG_TABLE_NAME, -count(*)
+            FROM old_rows GROUP BY 1
+        ON CONFLICT (day, metric) DO UPDATE SET value = d.value + EXCLUDED.value;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION platform_counters_on_truncate() RETURNS trigger AS $$
+    BEGIN
+        UPDATE platform_counters SET value = 0, updated_at = CURRENT_TIMESTAMP
+            WHERE metric = TG_TABLE_NAME;
+        DELETE FROM platform_daily_stats WHERE metric = TG_TABLE_NAME;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER trg_platform_counters_insert AFTER INSERT ON orchestration_sessions
+        REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT
+        EXECUTE FUNCTION platform_counters_on_insert();
+    CREATE TRIGGER trg_platform_counters_delete AFTER DELETE ON orchestration_sessions
+        REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT
+        EXECUTE FUNCTION platform_counters_on_delete();
+    CREATE TRIGGER trg_platform_counters_truncate AFTER TRUNCATE ON orchestration_sessions
+        FOR EACH STATEMENT EXECUTE FUNCTION platform_counters_on_truncate();
+
+    CREATE TRIGGER trg_platform_counters_insert AFTER INSERT ON organizations
+        REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT
+        EXECUTE FUNCTION platform_counters_on_insert();
+    CREATE TRIGGER trg_platform_counters_delete AFTER DELETE ON organizations
+        REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT
+        EXECUTE FUNCTION platform_counters_on_delete();
+    CREATE TRIGGER trg_platform_counters_truncate AFTER TRUNCATE ON organizations
+        FOR EACH STATEMENT EXECUTE FUNCTION platform_counters_on_truncate();
+
+    CREATE TRIGGER trg_platform_counters_insert AFTER INSERT ON user_cvs
+        REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT
+        EXECUTE FUNCTION platform_counters_on_insert();
+    CREATE TRIGGER trg_platform_counters_delete AFTER DELETE ON user_cvs
+        REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT
+        EXECUTE FUNCTION platform_counters_on_delete();
+    CREATE TRIGGER trg_platform_counters_truncate AFTER TRUNCATE ON user_cvs
+        FOR EACH STATEMENT EXECUTE FUNCTION platform_counters_on_truncate();
+
+    CREATE TRIGGER trg_platform_counters_insert AFTER INSERT ON literature_searches
+        REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT
+        EXECUTE FUNCTION platform_counters_on_insert();
+    CREATE TRIGGER trg_platform_counters_delete AFTER DELETE ON literature_searches
+        REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT
+        EXECUTE FUNCTION platform_counters_on_delete();
+    CREATE TRIGGER trg_platform_counters_truncate AFTER TRUNCATE ON literature_searches
+        FOR EACH STATEMENT EXECUTE FUNCTION platform_counters_on_truncate();
+
+    INSERT INTO platform_counters (metric, value) SELECT 'orchestration_sessions', count(*) FROM orchestration_sessions;
+    INSERT INTO platform_daily_stats (day, metric, value)
+        SELECT created_at::date, 'orchestration_sessions', count(*) FROM orchestration_sessions WHERE created_at IS NOT NULL GROUP BY 1;
+
+    INSERT INTO platform_counters (metric, value) SELECT 'organizations', count(*) FROM organizations;
+    INSERT INTO platform_daily_stats (day, metric, value)
+        SELECT created_at::date, 'organizations', count(*) FROM organizations WHERE created_at IS NOT NULL GROUP BY 1;
+
+    INSERT INTO platform_counters (metric, value) SELECT 'user_cvs', count(*) FROM user_cvs;
+    INSERT INTO platform_daily_stats (day, metric, value)
+        SELECT created_at::date, 'user_cvs', count(*) FROM user_cvs WHERE created_at IS NOT NULL GROUP BY 1;
+
+    INSERT INTO platform_counters (metric, value) SELECT 'literature_searches', count(*) FROM literature_searches;
+    INSERT INTO platform_daily_stats (day, metric, value)
+        SELECT created_at::date, 'literature_searches', count(*) FROM literature_searches WHERE created_at IS NOT NULL GROUP BY 1;
+"""),
+    (6, "time_partitioned_history_tables", """
+    -- Append-heavy tables become monthly RANGE partitions so recent-window queries
+    -- prune to a few small partitions and retention drops whole partitions
+    -- (server/database/partitions.py) instead of running DELETE.
+    CREATE OR REPLACE FUNCTION ensure_monthly_partitions(parent text, from_month date, to_month date)
+    RETURNS integer AS $$
+    DECLARE
+        month date := date_trunc('month', from_month)::date;
+        child text;
+        created integer := 0;
+    BEGIN
+        WHILE month <= to_month LOOP
+            child := format('%s_p%s', parent, to_char(month, 'YYYYMM'));
+            IF to_regclass(child) IS NULL THEN
+                EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                               child, parent, month, (month + interval '1 month')::date);
+                created := created + 1;
+            END IF;
+            month := (month + interval '1 month')::date;
+        END LOOP;
+        RETURN created;
+    END
+    $$ LANGUAGE plpgsql;
+
+    -- Orchestration sessions
+    ALTER TABLE orchestration_sessions RENAME TO orchestration_sessions_unpartitioned;
+    CREATE TABLE orchestration_sessions (
+        id VARCHAR(50) NOT NULL,
+        user_id VARCHAR(50),
+        task_type VARCHAR(100),
+        goals JSONB,
+        timeline VARCHAR(100),
+        status VARCHAR(50),
+        progress JSONB,
+        services_involved JSONB,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at);
+    CREATE TABLE orchestration_sessions_default PARTITION OF orchestration_sessions DEFAULT;
+    SELECT ensure_monthly_partitions('orchestration_sessions',
+        coalesce((SELECT min(created_at) FROM orchestration_sessions_unpartitioned), CURRENT_TIMESTAMP)::date,
+        (CURRENT_DATE + interval '2 months')::date);
+    -- Copied before the rollup triggers exist so platform_counters is not counted twice
+    INSERT INTO orchestration_sessions (id, user_id, task_type, goals, timeline, status, progress,
+                                        services_involved, created_at, updated_at)
+        SELECT id, user_id, task_type, goals, timeline, status, progress, services_involved,
+               coalesce(created_at, updated_at, CURRENT_TIMESTAMP), updated_at
+        FROM orchestration_sessions_unpartitioned;
+    DROP TABLE orchestration_sessions_unpartitioned;
+
+    CREATE TRIGGER trg_platform_counters_insert AFTER INSERT ON orchestration_sessions
+        REFERENCING NEW TABLE AS new_rows FOR EACH STATEMENT
+        EXECUTE FUNCTION platform_counters_on_insert();
+    CREATE TRIGGER trg_platform_counters_delete AFTER DELETE ON orchestration_sessions
+        REFERENCING OLD TABLE AS old_rows FOR EACH STATEMENT
+        EXECUTE FUNCTION platform_counters_on_delete();
+    CREATE TRIGGER trg_platform_counters_truncate AFTER TRUNCATE ON orchestration_sessions
+        FOR EACH STATEMENT EXECUTE FUNCTION platform_counters_on_truncate();
+
+    -- Research papers
+    ALTER TABLE research_papers RENAME TO research_papers_unpartitioned;
+    CREATE TABLE research_papers (
+        id VARCHAR(50) NOT NULL,
+        search_id VARCHAR(50),
+        paper_data JSONB,
+        relevance_score FLOAT,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, created_at),
+        FOREIGN KEY (search_id) REFERENCES literature_searches(id)
+    ) PARTITION BY RANGE (created_at);
+    CREATE TABLE research_papers_default PARTITION OF research_papers DEFAULT;
+    SELECT ensure_monthly_partitions('research_papers',
+        coalesce((SELECT min(created_at) FROM research_papers_unpartitioned), CURRENT_TIMESTAMP)::date,
+        (CURRENT_DATE + interval '2 months')::date);
+    INSERT INTO research_papers (id, search_id, paper_data, relevance_score, created_at)
+        SELECT id, search_id, paper_data, relevance_score, coalesce(created_at, CURRENT_TIMESTAMP)
+        FROM research_papers_unpartitioned;
+    DROP TABLE research_papers_unpartitioned;
+    CREATE INDEX IF NOT EXISTS idx_research_papers_search_id ON research_papers (search_id);
+
+    -- Service health becomes an append-only sample history keyed on last_check;
+    -- the orchestrator serves the latest status from memory
+    ALTER TABLE service_health RENAME TO service_health_unpartitioned;
+    DROP INDEX IF EXISTS uq_service_health_service_name;
+    CREATE TABLE service_health (
+        id VARCHAR(50) NOT NULL,
+        service_name VARCHAR(100),
+        status VARCHAR(50),
+        response_time FLOAT,
+        last_check TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        error_details TEXT,
+        PRIMARY KEY (id, last_check)
+    ) PARTITION BY RANGE (last_check);
+    CREATE TABLE service_health_default PARTITION OF service_health DEFAULT;
+    SELECT ensure_monthly_partitions('service_health',
+        coalesce((SELECT min(last_check) FROM service_health_unpartitioned), CURRENT_TIMESTAMP)::date,
+        (CURRENT_DATE + interval '2 months')::date);
+    INSERT INTO service_health (id, service_name, status, response_time, last_check, error_details)
+        SELECT id, service_name, status, response_time, coalesce(last_check, CURRENT_TIMESTAMP), error_details
+        FROM service_health_unpartitioned;
+    DROP TABLE service_health_unpartitioned;
+    CREATE INDEX IF NOT EXISTS idx_service_health_service_last_check
+        ON service_health (service_name, last_check DESC);
+
+    -- Mood history is declared in shared/schema.ts and may not exist yet
+    DO $$
+    BEGIN
+        IF to_regclass('user_mood_history') IS NOT NULL THEN
+            ALTER TABLE user_mood_history RENAME TO user_mood_history_unpartitioned;
+        END IF;
+    END
+    $$;
+    CREATE TABLE user_mood_history (
+        id VARCHAR NOT NULL,
+        user_id VARCHAR NOT NULL,
+        detected_mood VARCHAR NOT NULL,
+        confidence NUMERIC NOT NULL,
+        interaction_data JSONB,
+        theme_applied JSONB,
+        created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (id, created_at)
+    ) PARTITION BY RANGE (created_at);
+    CREATE TABLE user_mood_history_default PARTITION OF user_mood_history DEFAULT;
+    DO $$
+    DECLARE
+        first_month date := CURRENT_DATE;
+    BEGIN
+        IF to_regclass('user_mood_history_unpartitioned') IS NOT NULL THEN
+            EXECUTE 'SELECT coalesce(min(created_at), CURRENT_TIMESTAMP)::date FROM user_mood_history_unpartitioned'
+                INTO first_month;
+        END IF;
+        PERFORM ensure_monthly_partitions('user_mood_history', first_month,
+                                          (CURRENT_DATE + interval '2 months')::date);
+        IF to_regclass('user_mood_history_unpartitioned') IS NOT NULL THEN
+            EXECUTE 'INSERT INTO user_mood_history (id, user_id, detected_mood, confidence,
+                                                    interaction_data, theme_applied, created_at)
+                     SELECT id, user_id, detected_mood, confidence, interaction_data, theme_applied,
+                            coalesce(created_at, CURRENT_TIMESTAMP)
+                     FROM user_mood_history_unpartitioned';
+            EXECUTE 'DROP TABLE user_mood_history_unpartitioned';
+        END IF;
+    END
+    $$;
+    CREATE INDEX IF NOT EXISTS idx_user_mood_history_user_created
+        ON user_mood_history (user_id, created_at DESC);
+"""),
+    (7, "donor_opportunities_change_notify", """
+    -- Opportunity query caches LISTEN on this channel and clear themselves.
+    -- Statement-level with transition tables: one NOTIFY per statement that
+    -- actually changed rows (ON CONFLICT DO NOTHING batches with no new rows stay silent).
+    CREATE OR REPLACE FUNCTION donor_opportunities_notify_change() RETURNS trigger AS $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM changed_rows) THEN
+            PERFORM pg_notify('donor_opportunities_changed', TG_OP);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+
+    CREATE OR REPLACE FUNCTION donor_opportunities_notify_truncate() RETURNS trigger AS $$
+    BEGIN
+        PERFORM pg_notify('donor_opportunities_changed', TG_OP);
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+
+    DROP TRIGGER IF EXISTS trg_donor_opportunities_notify_insert ON donor_opportunities;
+    CREATE TRIGGER trg_donor_opportunities_notify_insert AFTER INSERT ON donor_opportunities
+        REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT
+        EXECUTE FUNCTION donor_opportunities_notify_change();
+    DROP TRIGGER IF EXISTS trg_donor_opportunities_notify_update ON donor_opportunities;
+    CREATE TRIGGER trg_donor_opportunities_notify_update AFTER UPDATE ON donor_opportunities
+        REFERENCING NEW TABLE AS changed_rows FOR EACH STATEMENT
+        EXECUTE FUNCTION donor_opportunities_notify_change();
+    DROP TRIGGER IF EXISTS trg_donor_opportunities_notify_delete ON donor_opportunities;
+    CREATE TRIGGER trg_donor_opportunities_notify_delete AFTER DELETE ON donor_opportunities
+        REFERENCING OLD TABLE AS changed_rows FOR EACH STATEMENT
+        EXECUTE FUNCTION donor_opportunities_notify_change();
+    DROP TRIGGER IF EXISTS trg_donor_opportunities_notify_truncate ON donor_opportunities;
+    CREATE TRIGGER trg_donor_opportunities_notify_truncate AFTER TRUNCATE ON donor_opportunities
+        FOR EACH STATEMENT EXECUTE FUNCTION donor_opportunities_notify_truncate();
+"""),
+    (8, "donor_opportunities_null_safe_keyset", """
+    DO $$
+    BEGIN
+        IF to_regclass('donor_opportunities') IS NULL THEN
+            RAISE EXCEPTION 'donor_opportunities does not exist yet' USING ERRCODE = 'undefined_table';
+        END IF;
+    END
+    $$;
+
+    -- created_at is nullable in shared/schema.ts; GET /opportunities orders and
+    -- pages on coalesce(created_at, '-infinity') so NULL rows sort last
+    DROP INDEX IF EXISTS idx_donor_opportunities_active_created;
+    DROP INDEX IF EXISTS idx_donor_opportunities_active_country_created;
+    DROP INDEX IF EXISTS idx_donor_opportunities_active_sector_created;
+
+    CREATE INDEX IF NOT EXISTS idx_donor_opportunities_active_sort
+        ON donor_opportunities ((coalesce(created_at, '-infinity'::timestamp)) DESC, id DESC)
+        WHERE is_active = true;
+
+    CREATE INDEX IF NOT EXISTS idx_donor_opportunities_active_country_sort
+        ON donor_opportunities (country, (coalesce(created_at, '-infinity'::timestamp)) DESC)
+        WHERE is_active = true;
+
+    CREATE INDEX IF NOT EXISTS idx_donor_opportunities_active_sector_sort
+        ON donor_opportunities (sector, (coalesce(created_at, '-infinity'::timestamp)) DESC)
+        WHERE is_active = true;
+"""),
+]
+
+
+def applied_versions(conn) -> List[int]:
+    """Versions already recorded in schema_migrations"""
+    with conn.cursor() as cur:
+        cur.execute("SELECT version FROM schema_migrations ORDER BY version")
+        return [row[0] if isinstance(row, tuple) else row["version"] for row in cur.fetchall()]
+
+
+def run_migrations(conn, migrations: Sequence[Tuple[int, str, str]] = MIGRATIONS) -> List[int]:
+    """Apply pending migrations in version order; returns the versions applied"""
+    applied = []
+    with conn.cursor() as cur:
+        # Session-level lock: other services block here until we finish
+        cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+    try:
+        with conn.cursor() as cur:
+            cur.execute("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    name VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+        conn.commit()
+
+        done = set(applied_versions(conn))
+        for version, name, sql in sorted(migrations):
+            if version in done:
+                continue
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(sql)
+                    cur.execute(
+                        "INSERT INTO schema_migrations (version, name) VALUES (%s, %s)",
+                        (version, name)
+                    )
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                if getattr(e, "pgcode", None) != UNDEFINED_TABLE:
+                    raise
+                # Later migrations may build on this one, so they wait too
+                logger.warning(
+                    f"Migration {version} ({name}) deferred until its tables exist: {e}"
+                )
+                break
+            applied.append(version)
+    finally:
+        with conn.cursor() as cur:
+            cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+        conn.commit()
+    return applied
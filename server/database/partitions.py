@@ -0,0 +1,141 @@
+"""
+Partition maintenance for the time-partitioned history tables
+Creates monthly partitions ahead of time and drops those older than each table's retention, if it has one
+
+Run periodically by the master orchestrator, or once from cron:
+    python -m server.database.partitions [--dry-run]
+"""
+
+import argparse
+import logging
+import os
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from psycopg2 import sql
+
+logger = logging.getLogger(__name__)
+
+
+def _retention_days(variable: str, default: Optional[str] = None) -> Optional[int]:
+    """Retention from the environment; unset or empty keeps partitions forever"""
+    value = os.getenv(variable, default)
+    return int(value) if value else None
+
+
+# Partitioned by migration 6; value is the retention in days (None: never dropped).
+# Only telemetry expires by default: sessions and papers are user data, so
+# dropping them must be opted into with their RETENTION_DAYS_* variable.
+PARTITIONED_TABLES: Dict[str, Optional[int]] = {
+    'user_mood_history': _retention_days('RETENTION_DAYS_USER_MOOD_HISTORY', '180'),
+    'service_health': _retention_days('RETENTION_DAYS_SERVICE_HEALTH', '30'),
+    'orchestration_sessions': _retention_days('RETENTION_DAYS_ORCHESTRATION_SESSIONS'),
+    'research_papers': _retention_days('RETENTION_DAYS_RESEARCH_PAPERS'),
+}
+
+PARTITION_MONTHS_AHEAD = int(os.getenv('PARTITION_MONTHS_AHEAD', '2'))
+
+_PARTITION_SUFFIX = re.compile(r'_p(\d{4})(\d{2})$')
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def list_partitions(conn, table: str) -> List[str]:
+    """Names of the monthly partitions attached to ``table`` (the default partition excluded)"""
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = to_regclass(%s)
+            ORDER BY c.relname
+        """, (table,))
+        names = [row[0] if isinstance(row, tuple) else row['relname'] for row in cur.fetchall()]
+    return [name for name in names if _PARTITION_SUFFIX.search(name)]
+
+
+def ensure_partitions(conn, table: str, months_ahead: int = PARTITION_MONTHS_AHEAD) -> int:
+    """Create any missing monthly partitions from this month to ``months_ahead``; returns how many"""
+    today = date.today().replace(day=1)
+    until = today
+    for _ in range(months_ahead):
+        until = _next_month(until)
+
+    with conn.cursor() as cur:
+        cur.execute("SELECT ensure_monthly_partitions(%s, %s, %s)", (table, today, until))
+        created = cur.fetchone()
+        return created[0] if isinstance(created, tuple) else created['ensure_monthly_partitions']
+
+
+def expired_partitions(conn, table: str, retention_days: int, now: Optional[datetime] = None) -> List[str]:
+    """Partitions whose whole range is older than the retention window"""
+    cutoff = ((now or datetime.now()) - timedelta(days=retention_days)).date()
+    expired = []
+    for name in list_partitions(conn, table):
+        match = _PARTITION_SUFFIX.search(name)
+        upper = _next_month(date(int(match.group(1)), int(match.group(2)), 1))
+        if upper <= cutoff:
+            expired.append(name)
+    return expired
+
+
+def drop_partition(conn, table: str, partition: str) -> None:
+    """Detach then drop a partition; far cheaper than DELETE and leaves nothing to vacuum"""
+    with conn.cursor() as cur:
+        cur.execute(sql.SQL("ALTER TABLE {} DETACH PARTITION {}").format(
+            sql.Identifier(table), sql.Identifier(partition)
+        ))
+        cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(partition)))
+
+
+def run_partition_maintenance(conn, tables: Optional[Dict[str, Optional[int]]] = None,
+                              dry_run: bool = False) -> Dict[str, Dict]:
+    """Create upcoming partitions and drop expired ones for every table, one transaction each.
+
+    Tables without a retention only get new partitions.
+
+    Rows in a dropped partition are not subtracted from platform_counters:
+    the analytics rollups keep counting everything that was ever created.
+    """
+    report = {}
+    for table, retention_days in (tables or PARTITIONED_TABLES).items():
+        result = {'created': 0, 'dropped': [], 'error': None}
+        try:
+            if not dry_run:
+                result['created'] = ensure_partitions(conn, table)
+            expired = [] if retention_days is None else expired_partitions(conn, table, retention_days)
+            for partition in expired:
+                if not dry_run:
+                    drop_partition(conn, table, partition)
+                result['dropped'].append(partition)
+            conn.commit()
+        except Exception as e:
+            # e.g. the default partition already holds rows for a month being created
+            conn.rollback()
+            result['error'] = str(e)
+            logger.error(f"Partition maintenance failed for {table}: {e}")
+        report[table] = result
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create upcoming and drop expired table partitions")
+    parser.add_argument("--dry-run", action="store_true", help="only report partitions that would be dropped")
+    args = parser.parse_args()
+
+    from server.database import db_manager
+
+    with db_manager.get_connection() as conn:
+        report = run_partition_maintenance(conn, dry_run=args.dry_run)
+    for table, result in report.items():
+        print(f"{table}: created {result['created']}, dropped {result['dropped'] or 'none'}"
+              + (f", error: {result['error']}" if result['error'] else ""))
+    db_manager.close()
+    return 1 if any(result['error'] for result in report.values()) else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+from server.database.database import db_manager
+
+logger = logging.getLogger(__name__)
+
+
+class WriteBehindQueue:
+    """Collect rows in memory and write them to Postgres in batches.
+
+    ``put()`` never touches the database. A background task calls
+    ``flush_fn(conn, items)`` through the shared pool whenever ``max_batch``
+    items are waiting or ``flush_interval`` seconds have passed, and once more
+    on ``stop()``. Memory is bounded by ``max_pending``: when full, the oldest
+    unflushed items are dropped and counted. A batch that fails goes back to
+    the head of the queue; after ``max_attempts`` failures in a row it is
+    logged and discarded so it cannot block the items queued behind it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush_fn: Callable[[Any, List[Any]], Any],
+        max_batch: int = 500,
+        flush_interval: float = 5.0,
+        max_pending: int = 10000,
+        max_attempts: int = 5,
+        database=None,
+    ):
+        if max_batch < 1 or max_pending < max_batch or max_attempts < 1:
+            raise ValueError(
+                f"Invalid queue bounds: max_batch={max_batch}, max_pending={max_pending}, "
+                f"max_attempts={max_attempts}"
+            )
+
+        self.name = name
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.database = database or db_manager
+
+        self._pending: deque = deque()
+        # The batch being written, still visible to pending()
+        self._in_flight: List[Any] = []
+        # Consecutive failed attempts of the batch at the head of the queue
+        self._head_failures = 0
+        self._wake: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._stopping = False
+        self._stats = {
+            'queued': 0,
+            'written': 0,
+            'dropped': 0,
+            'flushes': 0,
+            'failed_flushes': 0,
+            'discarded': 0,
+            'last_flush_ms': 0.0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def pending(self, predicate: Optional[Callable[[Any], bool]] = None) -> List[Any]:
+        """Items queued or being written but not yet committed, oldest first"""
+        items = list(self._in_flight) + list(self._pending)
+        if predicate is None:
+            return items
+        return [item for item in items if predicate(item)]
+
+    def put(self, item: Any) -> None:
+        """Queue an item for the next flush"""
+        if len(self._pending) >= self.max_pending:
+            self._pending.popleft()
+            self._stats['dropped'] += 1
+        self._pending.append(item)
+        self._stats['queued'] += 1
+        if len(self._pending) >= self.max_batch and self._wake is not None:
+            self._wake.set()
+
+    def start(self) -> None:
+        """Start the background flusher on the running event loop"""
+        if self._task is not None:
+            return
+        self._stopping = False
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run(), name=f"write-behind:{self.name}")
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self) -> int:
+        """Write everything pending in batches of max_batch; returns rows written"""
+        lock = self._flush_lock or asyncio.Lock()
+        written = 0
+        async with lock:
+            while self._pending:
+                batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+                self._in_flight = batch
+                start = time.monotonic()
+                try:
+                    await self.database.run(self.flush_fn, batch)
+                except Exception as e:
+                    self._stats['failed_flushes'] += 1
+                    self._head_failures += 1
+                    if self._head_failures >= self.max_attempts:
+                        # Most likely a bad row rather than an outage: give up on this batch only
+                        self._head_failures = 0
+                        self._stats['discarded'] += len(batch)
+                        logger.error(
+                            f"{self.name}: discarding {len(batch)} items after "
+                            f"{self.max_attempts} failed flushes: {e}; first item: {batch[0]!r}"
+                        )
+                        continue
+                    logger.error(
+                        f"{self.name}: flush of {len(batch)} items failed "
+                        f"(attempt {self._head_failures}/{self.max_attempts}): {e}"
+                    )
+                    # Put the batch back for the next attempt, still within max_pending
+                    room = self.max_pending - len(self._pending)
+                    self._stats['dropped'] += max(0, len(batch) - room)
+                    self._pending.extendleft(reversed(batch[:max(0, room)]))
+                    break
+                finally:
+                    self._in_flight = []
+                self._head_failures = 0
+                self._stats['flushes'] += 1
+                self._stats['written'] += len(batch)
+                self._stats['last_flush_ms'] = round((time.monotonic() - start) * 1000, 3)
+                written += len(batch)
+        return written
+
+    async def stop(self) -> None:
+        """Stop the background flusher and write whatever is still pending"""
+        self._stopping = True
+        if self._task is not None:
+            self._wake.set()
+            await self._task
+            self._task = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {'name': self.name, 'pending': len(self._pending), **self._stats}
@@ -0,0 +1,125 @@
+"""
+In-process cache for GET /api/opportunities
+LRU + TTL over response bodies, cleared whenever donor_opportunities changes (migration 7 NOTIFY)
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+from server.database.listener import NotificationListener
+
+OPPORTUNITY_CHANGES_CHANNEL = "donor_opportunities_changed"
+
+OPPORTUNITY_CACHE_MAX_ENTRIES = int(os.getenv('OPPORTUNITY_CACHE_MAX_ENTRIES', '1024'))
+OPPORTUNITY_CACHE_TTL = float(os.getenv('OPPORTUNITY_CACHE_TTL', '60'))
+
+
+class QueryCache:
+    """Bounded LRU of query results with a per-entry TTL.
+
+    The cache starts disabled and only serves entries while its invalidation
+    feed is connected; ``enable()``/``disable()`` are wired to the listener so
+    a missed NOTIFY can never leave stale results behind.
+
+    ``generation()`` is captured before running a query and handed back to
+    ``put()``: if an invalidation arrived in between, the result is discarded.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.enabled = False
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'bypassed': 0,
+            'invalidations': 0,
+            'evictions': 0,
+            'expirations': 0,
+        }
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            if not self.enabled:
+                self._stats['bypassed'] += 1
+                return None
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def generation(self) -> int:
+        return self._generation
+
+    def put(self, key: Hashable, value: Any, generation: int) -> None:
+        with self._lock:
+            if not self.enabled or generation != self._generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._stats['invalidations'] += 1
+
+    def enable(self) -> None:
+        self.invalidate()
+        self.enabled = True
+
+    def disable(self) -> None:
+        self.enabled = False
+        self.invalidate()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            size = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        return {
+            'enabled': self.enabled,
+            'size': size,
+            'max_entries': self.max_entries,
+            'ttl': self.ttl,
+            'hit_rate': round(stats['hits'] / lookups, 4) if lookups else 0.0,
+            **stats,
+        }
+
+
+def cache_key(**params: Any) -> Tuple:
+    """Normalize filters so equivalent requests share an entry"""
+    normalized = []
+    for name, value in sorted(params.items()):
+        if isinstance(value, str):
+            value = " ".join(value.split()) or None
+        normalized.append((name, value))
+    return tuple(normalized)
+
+
+opportunity_cache = QueryCache(OPPORTUNITY_CACHE_MAX_ENTRIES, OPPORTUNITY_CACHE_TTL)
+
+opportunity_listener = NotificationListener(
+    OPPORTUNITY_CHANGES_CHANNEL,
+    on_notify=lambda payload: opportunity_cache.invalidate(),
+    on_connect=opportunity_cache.enable,
+    on_disconnect=opportunity_cache.disable,
+)
@@ -1,38 +1,192 @@
-from fastapi import APIRouter, HTTPException
-from typing import Dict, Any, Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+from datetime import datetime
 from server.database import db_manager
+from server.donors.cache import cache_key, opportunity_cache, opportunity_listener
+from server.donors.search import search_opportunities
 from psycopg2.extras import RealDictCursor
-from server.app.agent.manus import Manus
-from app.logger import logger
+from server.app.agent.pool import get_manus_pool
+from server.app.exceptions import AgentPoolExhausted
+from server.app.llm_scheduler import Priority, llm_priority
+from server.app.logger import logger
+import base64
 import json
+import uuid
 
 router = APIRouter()
 
-async def run_agent_with_prompt(prompt: str):
-    """Helper function to create and run a Manus agent with a given prompt."""
+async def run_agent_with_prompt(prompt: str, priority: Priority = Priority.INTERACTIVE):
+    """Helper function to run a pooled Manus agent with a given prompt."""
+    response_str = None
     try:
-        agent = await Manus.create()
-        response_str = await agent.run(prompt)
-        # The agent's response is expected to be a JSON string.
-        return json.loads(response_str)
+        async with get_manus_pool().agent() as agent:
+            with llm_priority(priority):
+                response_str = await agent.run(prompt)
+            # run() returns a step summary; the answer is in memory, reset once the agent is returned
+            answer = agent.json_answer()
+        return answer if answer is not None else json.loads(response_str)
     except json.JSONDecodeError as e:
         logger.error(f"Agent response was not valid JSON: {response_str}")
         raise HTTPException(status_code=500, detail="Agent returned an invalid response format.")
+    except AgentPoolExhausted as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error running agent: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+OPPORTUNITY_COLUMNS = """
+    id, title, description, amount_min, amount_max, currency,
+    deadline, source_url, source_name, country, sector,
+    eligibility_criteria, application_process, keywords,
+    focus_areas, is_verified, scraped_at, created_at
+"""
+
+STREAM_BATCH_SIZE = 500
+
+# created_at is nullable; rows without one sort after all dated rows (indexed by migration 8)
+SORT_KEY = "COALESCE(created_at, '-infinity'::timestamp)"
+
+def encode_cursor(row: Dict[str, Any]) -> str:
+    """Encode the (created_at, id) keyset position of a row as an opaque cursor."""
+    created_at = row["created_at"]
+    payload = json.dumps([created_at.isoformat() if created_at else None, str(row["id"])])
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Optional[datetime], str]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        created_at = datetime.fromisoformat(created_at) if created_at is not None else None
+        return created_at, str(uuid.UUID(row_id))
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor: {e}")
+
+def _build_opportunity_query(
+    country: Optional[str],
+    sector: Optional[str],
+    verified_only: bool,
+    after: Optional[Tuple[Optional[datetime], str]],
+) -> Tuple[str, List[Any]]:
+    query = f"""
+        SELECT {OPPORTUNITY_COLUMNS}
+        FROM donor_opportunities
+        WHERE is_active = true
+    """
+    params: List[Any] = []
+    
+    if country:
+        query += " AND (country = %s OR country = 'Global')"
+        params.append(country)
+    
+    if sector:
+        query += " AND sector = %s"
+        params.append(sector)
+    
+    if verified_only:
+        query += " AND is_verified = true"
+    
+    if after:
+        query += f" AND ({SORT_KEY}, id) < (COALESCE(%s::timestamp, '-infinity'::timestamp), %s::uuid)"
+        params.extend(after)
+    
+    query += f" ORDER BY {SORT_KEY} DESC, id DESC"
+    return query, params
+
+def _fetch_opportunities(conn, country: Optional[str], sector: Optional[str], verified_only: bool,
+                         limit: int, after: Optional[Tuple[Optional[datetime], str]] = None):
+    query, params = _build_opportunity_query(country, sector, verified_only, after)
+    with conn.cursor() as cursor:
+        # One extra row tells us whether another page exists
+        cursor.execute(query + " LIMIT %s", params + [limit + 1])
+        rows = [dict(row) for row in cursor.fetchall()]
+    
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def _stream_opportunities(country: Optional[str], sector: Optional[str], verified_only: bool,
+                          after: Optional[Tuple[Optional[datetime], str]]) -> Iterator[bytes]:
+    """Yield matching opportunities as NDJSON lines from a server-side cursor.
+
+    Starlette drives sync iterators from its threadpool, so the blocking fetches
+    never run on the event loop and only one batch is held in memory at a time.
+    """
+    query, params = _build_opportunity_query(country, sector, verified_only, after)
+    with db_manager.get_connection(cursor_factory=RealDictCursor) as conn:
+        with conn.cursor(name=f"opportunities_{uuid.uuid4().hex}") as cursor:
+            cursor.itersize = STREAM_BATCH_SIZE
+            cursor.execute(query, params)
+            for row in cursor:
+                yield (json.dumps(dict(row), default=str) + "\n").encode()
+
+def _insert_opportunity(conn, enriched_data: Dict[str, Any]):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            INSERT INTO donor_opportunities (
+                title, description, amount_min, amount_max, currency,
+                deadline, source_url, source_name, country, sector,
+                eligibility_criteria, application_process, keywords,
+                focus_areas, content_hash, is_verified, is_active,
+                scraped_at, created_at, updated_at
+            ) VALUES (
+                %(title)s, %(description)s, %(amount_min)s, %(amount_max)s, %(currency)s,
+                %(deadline)s, %(source_url)s, %(source_name)s, %(country)s, %(sector)s,
+                %(eligibility_criteria)s, %(application_process)s, %(keywords)s,
+                %(focus_areas)s, %(content_hash)s, %(is_verified)s, %(is_active)s,
+                NOW(), NOW(), NOW()
+            ) RETURNING id
+        """, enriched_data)
+        
+        opportunity_id = cursor.fetchone()[0]
+        conn.commit()
+        return opportunity_id
+
+@router.get("/opportunities/cache/stats")
+async def get_opportunity_cache_stats():
+    """Hit/miss counters of the in-process opportunities cache"""
+    return {"cache": opportunity_cache.stats(), "listener": opportunity_listener.stats()}
+
 @router.get("/opportunities")
 async def get_opportunities(
     country: Optional[str] = None,
     sector: Optional[str] = None,
     verified_only: bool = False,
-    limit: int = 50,
-    natural_language_query: Optional[str] = None
+    limit: int = Query(50, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    stream: bool = False,
+    natural_language_query: Optional[str] = None,
+    highlight: bool = True,
+    use_agent: bool = False
 ):
-    """Get funding opportunities with filters, optionally using a natural language query."""
+    """Get funding opportunities with filters, optionally using a natural language query.
+
+    Results are ordered newest first and paginated by keyset: pass the returned
+    ``next_cursor`` back as ``cursor`` to get the following page. With
+    ``stream=true`` every matching row after ``cursor`` is sent as NDJSON.
+
+    ``natural_language_query`` is answered by ranked full-text search; set
+    ``use_agent=true`` to have the Manus agent interpret it instead.
+    """
     try:
-        if natural_language_query:
+        if natural_language_query and not use_agent:
+            key = cache_key(
+                mode="full_text", query=natural_language_query.lower(), country=country,
+                sector=sector, verified_only=verified_only, limit=limit, highlight=highlight
+            )
+            cached = opportunity_cache.get(key)
+            if cached is not None:
+                return cached
+            generation = opportunity_cache.generation()
+            opportunities = await db_manager.run(
+                search_opportunities, natural_language_query, country, sector,
+                verified_only, limit, highlight,
+                cursor_factory=RealDictCursor
+            )
+            result = {"opportunities": opportunities, "search_mode": "full_text"}
+            opportunity_cache.put(key, result, generation)
+            return result
+        elif natural_language_query:
             prompt = f"""
             Find funding opportunities based on the following criteria:
             Natural Language Query: {natural_language_query}
@@ -47,37 +201,30 @@ async def get_opportunities(
             """
             return await run_agent_with_prompt(prompt)
         else:
-            with db_manager.get_connection() as conn:
-                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    query = """
-                        SELECT id, title, description, amount_min, amount_max, currency,
-                               deadline, source_url, source_name, country, sector,
-                               eligibility_criteria, application_process, keywords,
-                               focus_areas, is_verified, scraped_at, created_at
-                        FROM donor_opportunities
-                        WHERE is_active = true
-                    """
-                    params = []
-                    
-                    if country:
-                        query += " AND (country = %s OR country = 'Global')"
-                        params.append(country)
-                    
-                    if sector:
-                        query += " AND sector = %s"
-                        params.append(sector)
-                    
-                    if verified_only:
-                        query += " AND is_verified = true"
-                    
-                    query += " ORDER BY created_at DESC LIMIT %s"
-                    params.append(limit)
-                    
-                    cursor.execute(query, params)
-                    opportunities = cursor.fetchall()
-                    
-                    return {"opportunities": [dict(row) for row in opportunities]}
+            after = decode_cursor(cursor) if cursor else None
+            if stream:
+                return StreamingResponse(
+                    _stream_opportunities(country, sector, verified_only, after),
+                    media_type="application/x-ndjson"
+                )
+            key = cache_key(
+                mode="page", country=country, sector=sector, verified_only=verified_only,
+                limit=limit, cursor=cursor
+            )
+            cached = opportunity_cache.get(key)
+            if cached is not None:
+                return cached
+            generation = opportunity_cache.generation()
+            opportunities, next_cursor = await db_manager.run(
+                _fetch_opportunities, country, sector, verified_only, limit, after,
+                cursor_factory=RealDictCursor
+            )
+            result = {"opportunities": opportunities, "next_cursor": next_cursor}
+            opportunity_cache.put(key, result, generation)
+            return result
                     
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -96,31 +243,14 @@ async def create_opportunity(opportunity_data: Dict[str, Any]):
 
     Return the enriched opportunity data as a JSON object, ready for database insertion.
     """
-    enriched_data = await run_agent_with_prompt(prompt)
+    # Enrichment is queued behind interactive searches and proposal calls
+    enriched_data = await run_agent_with_prompt(prompt, priority=Priority.BACKGROUND)
 
     try:
-        with db_manager.get_connection() as conn:
-            with conn.cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO donor_opportunities (
-                        title, description, amount_min, amount_max, currency,
-                        deadline, source_url, source_name, country, sector,
-                        eligibility_criteria, application_process, keywords,
-                        focus_areas, content_hash, is_verified, is_active,
-                        scraped_at, created_at, updated_at
-                    ) VALUES (
-                        %(title)s, %(description)s, %(amount_min)s, %(amount_max)s, %(currency)s,
-                        %(deadline)s, %(source_url)s, %(source_name)s, %(country)s, %(sector)s,
-                        %(eligibility_criteria)s, %(application_process)s, %(keywords)s,
-                        %(focus_areas)s, %(content_hash)s, %(is_verified)s, %(is_active)s,
-                        NOW(), NOW(), NOW()
-                    ) RETURNING id
-                """, enriched_data)
-                
-                opportunity_id = cursor.fetchone()[0]
-                conn.commit()
-                
-                return {"id": opportunity_id, "message": "Opportunity created successfully"}
+        opportunity_id = await db_manager.run(_insert_opportunity, enriched_data)
+        # Don't wait for the NOTIFY round trip to drop this process's entries
+        opportunity_cache.invalidate()
+        return {"id": opportunity_id, "message": "Opportunity created successfully"}
                 
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
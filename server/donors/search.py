@@ -0,0 +1,100 @@
+"""
+Full-text search over donor_opportunities
+Ranked Postgres tsvector search used by GET /api/opportunities before falling back to the agent
+The search_vector column, its trigger and GIN index are created by migration 4
+"""
+
+import html
+from typing import Any, Dict, List, Optional
+
+SEARCH_CONFIG = "english"
+
+# ts_headline brackets matches with these private-use characters (stripped from
+# the source text first). The fragment is then HTML-escaped and the markers become
+# <mark> tags, so markup in scraped titles and descriptions reaches clients as text.
+MARK_START = "\ue000"
+MARK_STOP = "\ue001"
+
+HIGHLIGHT_OPTIONS = (
+    f"StartSel={MARK_START}, StopSel={MARK_STOP}, MaxFragments=2, MaxWords=30, MinWords=10"
+)
+
+
+def render_highlight(fragment: Optional[str]) -> Optional[str]:
+    """HTML-escape a ts_headline fragment and turn its match markers into <mark> tags"""
+    if fragment is None:
+        return None
+    escaped = html.escape(fragment)
+    return escaped.replace(MARK_START, "<mark>").replace(MARK_STOP, "</mark>")
+
+
+def _marker_free(column: str) -> str:
+    return f"translate(coalesce({column}, ''), '{MARK_START}{MARK_STOP}', '')"
+
+
+def search_opportunities(
+    conn,
+    text: str,
+    country: Optional[str] = None,
+    sector: Optional[str] = None,
+    verified_only: bool = False,
+    limit: int = 50,
+    highlight: bool = True,
+) -> List[Dict[str, Any]]:
+    """Rank active opportunities against a web-style query (quotes, OR, -term).
+
+    Ranking and filtering use the GIN index; ts_headline only runs over the
+    final page of results because it re-parses the original documents.
+    """
+    filters = ""
+    params: List[Any] = [SEARCH_CONFIG, text]
+
+    if country:
+        filters += " AND (o.country = %s OR o.country = 'Global')"
+        params.append(country)
+
+    if sector:
+        filters += " AND o.sector = %s"
+        params.append(sector)
+
+    if verified_only:
+        filters += " AND o.is_verified = true"
+
+    params.append(limit)
+
+    highlight_columns = ""
+    if highlight:
+        highlight_columns = f""",
+            ts_headline('{SEARCH_CONFIG}', {_marker_free("ranked.title")}, ranked.query,
+                        'HighlightAll=true, StartSel={MARK_START}, StopSel={MARK_STOP}') AS title_highlight,
+            ts_headline('{SEARCH_CONFIG}', {_marker_free("ranked.description")}, ranked.query,
+                        '{HIGHLIGHT_OPTIONS}') AS description_highlight"""
+
+    query = f"""
+        SELECT ranked.id, ranked.title, ranked.description, ranked.amount_min, ranked.amount_max,
+               ranked.currency, ranked.deadline, ranked.source_url, ranked.source_name,
+               ranked.country, ranked.sector, ranked.eligibility_criteria,
+               ranked.application_process, ranked.keywords, ranked.focus_areas,
+               ranked.is_verified, ranked.scraped_at, ranked.created_at,
+               ranked.rank{highlight_columns}
+        FROM (
+            SELECT o.*, q.query, ts_rank_cd(o.search_vector, q.query) AS rank
+            FROM donor_opportunities o,
+                 websearch_to_tsquery(%s::regconfig, %s) AS q(query)
+            WHERE o.is_active = true
+              AND o.search_vector @@ q.query{filters}
+            ORDER BY rank DESC, o.created_at DESC
+            LIMIT %s
+        ) AS ranked
+        ORDER BY ranked.rank DESC, ranked.created_at DESC
+    """
+
+    with conn.cursor() as cur:
+        cur.execute(query, params)
+        rows = [dict(row) for row in cur.fetchall()]
+
+    if highlight:
+        for row in rows:
+            row["title_highlight"] = render_highlight(row["title_highlight"])
+            row["description_highlight"] = render_highlight(row["description_highlight"])
+    return rows
@@ -12,10 +12,9 @@ from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from pydantic import BaseModel
-import psycopg2
 from psycopg2.extras import RealDictCursor
-import os
-from urllib.parse import urlparse
+
+from server.database import db_manager
 
 # Request Models
 class PaperRequest(BaseModel):
@@ -46,84 +45,47 @@ class ResearchAssistRequest(BaseModel):
     context: Optional[str] = None
 
 class AcademicDatabase:
-    def __init__(self):
-        self.connection_params = self._parse_db_url(os.getenv('DATABASE_URL', ''))
-        
-    def _parse_db_url(self, url: str) -> Dict[str, str]:
-        """Parse DATABASE_URL into connection parameters"""
-        if not url:
-            return {
-                'host': 'localhost',
-                'database': 'granada_os',
-                'user': 'postgres',
-                'password': 'password',
-                'port': '5432'
-            }
-        
-        parsed = urlparse(url)
-        return {
-            'host': parsed.hostname,
-            'database': parsed.path[1:] if parsed.path else 'granada_os',
-            'user': parsed.username,
-            'password': parsed.password,
-            'port': str(parsed.port) if parsed.port else '5432'
-        }
-    
     def get_connection(self):
-        """Get database connection"""
-        try:
-            return psycopg2.connect(**self.connection_params)
-        except Exception as e:
-            print(f"Database connection error: {e}")
-            return None
+        """Borrow a connection from the shared pool"""
+        return db_manager.get_connection()
     
     def save_paper_project(self, user_id: str, project_data: Dict) -> str:
         """Save paper writing project"""
-        conn = self.get_connection()
-        if not conn:
-            return "demo_project_001"
-            
         try:
-            with conn.cursor() as cursor:
-                cursor.execute("""
-                    INSERT INTO academic_papers (user_id, title, paper_type, academic_level, 
-                                                word_count, citation_style, content, status, created_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    RETURNING id
-                """, (
-                    user_id, project_data['title'], project_data['paper_type'],
-                    project_data['academic_level'], project_data['word_count'],
-                    project_data['citation_style'], project_data['content'],
-                    'draft', datetime.now()
-                ))
-                project_id = cursor.fetchone()[0]
-                conn.commit()
-                return project_id
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute("""
+                        INSERT INTO academic_papers (user_id, title, paper_type, academic_level, 
+                                                    word_count, citation_style, content, status, created_at)
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                        RETURNING id
+                    """, (
+                        user_id, project_data['title'], project_data['paper_type'],
+                        project_data['academic_level'], project_data['word_count'],
+                        project_data['citation_style'], project_data['content'],
+                        'draft', datetime.now()
+                    ))
+                    project_id = cursor.fetchone()[0]
+                    conn.commit()
+                    return project_id
         except Exception as e:
             print(f"Error saving paper project: {e}")
             return f"demo_project_{hash(user_id) % 1000}"
-        finally:
-            conn.close()
     
     def get_user_papers(self, user_id: str) -> List[Dict]:
         """Get all papers for a user"""
-        conn = self.get_connection()
-        if not conn:
-            return self._get_demo_papers()
-            
         try:
-            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute("""
-                    SELECT * FROM academic_papers 
-                    WHERE user_id = %s 
-                    ORDER BY created_at DESC
-                """, (user_id,))
-                return [dict(row) for row in cursor.fetchall()]
+            with self.get_connection() as conn:
+                with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                    cursor.execute("""
+                        SELECT * FROM academic_papers 
+                        WHERE user_id = %s 
+                        ORDER BY created_at DESC
+                    """, (user_id,))
+                    return [dict(row) for row in cursor.fetchall()]
         except Exception as e:
             print(f"Error fetching user papers: {e}")
             return self._get_demo_papers()
-        finally:
-            conn.close()
     
     def _get_demo_papers(self) -> List[Dict]:
         """Demo papers for fallback"""
@@ -1,27 +1,91 @@
 from fastapi import APIRouter, HTTPException, Form, UploadFile, File
-from typing import Dict, Any, Optional
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, AsyncIterator, Optional
 from server.database import db_manager
 from psycopg2.extras import RealDictCursor
-from server.app.agent.manus import Manus
-from app.logger import logger
+from server.app.agent.pool import get_manus_pool
+from server.app.exceptions import AgentPoolExhausted
+from server.app.llm import LLM
+from server.app.llm_cache import coalesce_requests
+from server.app.llm_scheduler import Priority, llm_priority
+from server.app.schema import Message
+from server.app.logger import logger
 import json
 
 router = APIRouter()
 
-async def run_agent_with_prompt(prompt: str):
-    """Helper function to create and run a Manus agent with a given prompt."""
+async def run_agent_with_prompt(prompt: str, priority: Priority = Priority.INTERACTIVE):
+    """Helper function to run a pooled Manus agent with a given prompt.
+
+    The prompts are built from the request alone, so identical requests in
+    flight at the same time share their LLM calls.
+    """
+    response_str = None
     try:
-        agent = await Manus.create()
-        response_str = await agent.run(prompt)
-        # The agent's response is expected to be a JSON string.
-        return json.loads(response_str)
+        async with get_manus_pool().agent() as agent:
+            with llm_priority(priority), coalesce_requests():
+                response_str = await agent.run(prompt)
+            # run() returns a step summary; the answer is in memory, reset once the agent is returned
+            answer = agent.json_answer()
+        return answer if answer is not None else json.loads(response_str)
     except json.JSONDecodeError as e:
         logger.error(f"Agent response was not valid JSON: {response_str}")
         raise HTTPException(status_code=500, detail="Agent returned an invalid response format.")
+    except AgentPoolExhausted as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         logger.error(f"Error running agent: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+STREAM_SYSTEM_PROMPT = (
+    "You are an expert grant writer. Follow the requested output format exactly "
+    "and do not wrap JSON in code fences."
+)
+
+def _sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def _parse_json_output(text: str) -> Optional[Any]:
+    cleaned = text.strip()
+    if cleaned.startswith("```"):
+        cleaned = cleaned.split("\n", 1)[-1].rsplit("```", 1)[0]
+    try:
+        return json.loads(cleaned)
+    except json.JSONDecodeError:
+        return None
+
+async def stream_prompt_events(prompt: str, priority: Priority = Priority.INTERACTIVE) -> AsyncIterator[str]:
+    """Answer a prompt with a single LLM call, forwarding tokens as Server-Sent Events.
+
+    Emits ``token`` events as text arrives, then ``done`` with the full text and
+    its parsed JSON (null when the output is not valid JSON), or ``error``.
+    """
+    try:
+        with llm_priority(priority):
+            async for event in LLM().ask_stream(
+                [Message.user_message(prompt)],
+                system_msgs=[Message.system_message(STREAM_SYSTEM_PROMPT)],
+            ):
+                if event.type == "text":
+                    yield _sse("token", {"text": event.text})
+                elif event.type == "done":
+                    yield _sse("done", {
+                        "content": event.content,
+                        "result": _parse_json_output(event.content or "")
+                    })
+    except Exception as e:
+        logger.error(f"Error streaming completion: {e}")
+        yield _sse("error", {"detail": str(e)})
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/proposal/analyze")
 async def analyze_proposal(request: Dict[str, Any]):
     """Analyze proposal content using the Manus agent."""
@@ -100,8 +164,12 @@ async def get_smart_insights(request: Dict[str, Any]):
     return await run_agent_with_prompt(prompt)
 
 @router.post("/proposal/enhance")
-async def enhance_content(request: Dict[str, Any]):
-    """AI-powered content enhancement for specific sections using the Manus agent."""
+async def enhance_content(request: Dict[str, Any], stream: bool = False):
+    """AI-powered content enhancement for specific sections using the Manus agent.
+
+    With ``stream=true`` the text is generated by a single LLM call and sent as
+    Server-Sent Events while it is written.
+    """
     section = request.get("section", "")
     current_content = request.get("currentContent", "")
     context = request.get("context", {})
@@ -121,6 +189,8 @@ async def enhance_content(request: Dict[str, Any]):
     Rewrite and improve the content, making it more compelling, professional, and aligned with funder expectations.
     The output MUST be a JSON object with a single key, "enhancedContent", containing the improved text as a string.
     """
+    if stream:
+        return sse_response(stream_prompt_events(prompt))
     return await run_agent_with_prompt(prompt)
 
 @router.post("/proposal/competitive-analysis")
@@ -147,21 +217,28 @@ async def get_competitive_analysis(request: Dict[str, Any]):
     """
     return await run_agent_with_prompt(prompt)
 
+def _fetch_opportunity(conn, opportunity_id: str):
+    with conn.cursor(cursor_factory=RealDictCursor) as cursor:
+        cursor.execute("SELECT * FROM donor_opportunities WHERE id = %s", (opportunity_id,))
+        return cursor.fetchone()
+
 @router.post("/proposals/generate")
 async def generate_proposal(
     opportunity_id: str = Form(...),
     user_input: str = Form(""),
-    audio_file: Optional[UploadFile] = File(None)
+    audio_file: Optional[UploadFile] = File(None),
+    stream: bool = False
 ):
-    """Generate AI proposal content using the Manus agent."""
+    """Generate AI proposal content using the Manus agent.
+
+    With ``stream=true`` the proposal is generated by a single LLM call and sent
+    as Server-Sent Events while it is written.
+    """
     try:
         # Get opportunity details from the database
-        with db_manager.get_connection() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                cursor.execute("SELECT * FROM donor_opportunities WHERE id = %s", (opportunity_id,))
-                opportunity = cursor.fetchone()
-                if not opportunity:
-                    raise HTTPException(status_code=404, detail="Opportunity not found")
+        opportunity = await db_manager.run(_fetch_opportunity, opportunity_id)
+        if not opportunity:
+            raise HTTPException(status_code=404, detail="Opportunity not found")
 
         # Placeholder for audio transcription
         transcribed_text = ""
@@ -192,6 +269,8 @@ async def generate_proposal(
         - "organizational_background"
         Each key should contain the generated text for that section as a string.
         """
+        if stream:
+            return sse_response(stream_prompt_events(prompt))
         return await run_agent_with_prompt(prompt)
 
     except HTTPException as e:
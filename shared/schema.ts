@@ -1,4 +1,4 @@
-import { pgTable, text, integer, boolean, timestamp, uuid, jsonb, decimal, varchar, numeric, index } from "drizzle-orm/pg-core";
+import { pgTable, text, integer, boolean, timestamp, uuid, jsonb, decimal, varchar, numeric, index, primaryKey } from "drizzle-orm/pg-core";
 import { createInsertSchema } from "drizzle-zod";
 import { z } from "zod";
 
@@ -498,15 +498,21 @@ export type Notification = typeof notifications.$inferSelect;
 export type InsertNotification = typeof notifications.$inferInsert;
 
 // Mood tracking tables
+// Range-partitioned by month on created_at. Created and managed by server/database/migrations.py
+// (version 6), not drizzle-kit: drizzle.config.ts filters it and its partitions out of db:push.
+// Declared here for typed queries only; keep it in step with that migration.
 export const userMoodHistory = pgTable("user_mood_history", {
-  id: varchar("id").primaryKey().$defaultFn(() => `mood_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`),
+  id: varchar("id").notNull().$defaultFn(() => `mood_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`),
   userId: varchar("user_id").notNull(),
   detectedMood: varchar("detected_mood").notNull(),
   confidence: numeric("confidence").notNull(),
   interactionData: jsonb("interaction_data"),
   themeApplied: jsonb("theme_applied"),
-  createdAt: timestamp("created_at").defaultNow(),
-});
+  createdAt: timestamp("created_at").defaultNow().notNull(),
+}, (table) => [
+  primaryKey({ name: "user_mood_history_pkey", columns: [table.id, table.createdAt] }),
+  index("idx_user_mood_history_user_created").on(table.userId, table.createdAt.desc()),
+]);
 
 export const userThemePreferences = pgTable("user_theme_preferences", {
   id: varchar("id").primaryKey().$defaultFn(() => `pref_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`),
@@ -0,0 +1,104 @@
+"""Shared fixtures: the mock LLM server and a config pointing every LLM at it.
+
+OPENMANUS_CONFIG is set before anything from server.app is imported, so the
+config singleton loads the file written here.
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(ROOT / "scripts"))
+
+from benchmark_llm import MockServer, free_port  # noqa: E402
+from mock_llm_server import Latency, MockLLM  # noqa: E402
+
+PORT = free_port()
+BASE_URL = f"http://127.0.0.1:{PORT}/v1"
+
+
+def write_test_config() -> Path:
+    """Named configs exercising one mechanism each; each model has its own scheduler and breaker"""
+    path = Path(tempfile.mkdtemp(prefix="llm-tests-")) / "config.toml"
+    path.write_text(
+        "[llm]\n"
+        'model = "mock"\n'
+        f'base_url = "{BASE_URL}"\n'
+        'api_key = "mock"\n'
+        "max_tokens = 256\n"
+        "temperature = 0.0\n"
+        "max_concurrency = 2\n"
+        "max_retries = 2\n"
+        "retry_max_wait = 0.05\n"
+        # Same model and server under another URL: a different backend for cache keys
+        "\n[llm.alt]\n"
+        f'base_url = "http://localhost:{PORT}/v1"\n'
+        "\n[llm.flaky]\n"
+        'model = "mock-flaky"\n'
+        "breaker_failure_threshold = 0\n"
+        "\n[llm.breaker]\n"
+        'model = "mock-breaker"\n'
+        "max_retries = 0\n"
+        "breaker_failure_threshold = 2\n"
+        "breaker_reset_timeout = 60\n"
+        "\n[llm.hedged]\n"
+        'model = "mock-hedged"\n'
+        "hedge_percentile = 50\n"
+        "hedge_min_samples = 1\n"
+        "\n[llm.hedged_single]\n"
+        'model = "mock-hedged-single"\n'
+        "max_concurrency = 1\n"
+        "hedge_percentile = 50\n"
+        "hedge_min_samples = 1\n"
+        "\n[llm_cache]\n"
+        "enabled = false\n"
+        'disk_path = ""\n'
+        "\n[agent_pool]\n"
+        "min_size = 0\n"
+    )
+    return path
+
+
+os.environ["OPENMANUS_CONFIG"] = str(write_test_config())
+
+
+@pytest.fixture(scope="session")
+def mock_server():
+    mock = MockLLM()
+    with MockServer(mock, PORT):
+        yield mock
+
+
+@pytest.fixture
+def mock(mock_server):
+    """The mock LLM with default behaviour and fresh counters"""
+    mock_server.responses = []
+    mock_server.latency = Latency("fixed:0")
+    mock_server.tool_steps = 2
+    mock_server.tool = None
+    mock_server.error_rate = 0.0
+    mock_server.error_status = 429
+    mock_server.retry_after = None
+    mock_server.reset_stats()
+    return mock_server
+
+
+@pytest.fixture(scope="session")
+def event_loop_session():
+    # LLM instances, schedulers and breakers are process-wide and bind to one loop
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def run(event_loop_session):
+    """Run a coroutine to completion on the shared loop"""
+    asyncio.set_event_loop(event_loop_session)
+    return event_loop_session.run_until_complete
@@ -0,0 +1,146 @@
+import asyncio
+
+import pytest
+
+from server.app.agent.manus import Manus
+from server.app.agent.pool import AgentPool
+from server.app.config import AgentPoolSettings
+from server.app.exceptions import AgentPoolExhausted
+from server.app.schema import Message
+from server.app.tool import StrReplaceEditor
+from server.app.tool.mcp import MCPClientTool
+
+
+class FakeAgent:
+    def __init__(self, fail_reset=False):
+        self.fail_reset = fail_reset
+        self.resets = 0
+        self.closed = False
+
+    def reset(self):
+        if self.fail_reset:
+            raise RuntimeError("reset failed")
+        self.resets += 1
+
+    async def close(self):
+        self.closed = True
+
+    async def check_health(self):
+        return True
+
+
+def make_pool(max_size=2, max_uses=50, acquire_timeout=1.0, **agent_kwargs):
+    created = []
+
+    async def factory():
+        agent = FakeAgent(**agent_kwargs)
+        created.append(agent)
+        return agent
+
+    settings = AgentPoolSettings(
+        min_size=0, max_size=max_size, max_uses=max_uses, acquire_timeout=acquire_timeout
+    )
+    return AgentPool("test", factory, settings), created
+
+
+async def borrow(pool):
+    async with pool.agent() as agent:
+        return agent
+
+
+async def settle():
+    # Owner tasks close retired agents on their own
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_released_agent_is_reset_and_reused(run):
+    async def scenario():
+        pool, created = make_pool()
+        first = await borrow(pool)
+        second = await borrow(pool)
+        assert first is second
+        assert first.resets == 2
+        assert pool.stats()["reused"] == 1
+        await pool.close()
+        assert first.closed
+
+    run(scenario())
+
+
+def test_agent_is_replaced_after_max_uses(run):
+    async def scenario():
+        pool, created = make_pool(max_uses=2)
+        for _ in range(3):
+            await borrow(pool)
+        await settle()
+        assert len(created) == 2
+        assert created[0].closed
+        await pool.close()
+
+    run(scenario())
+
+
+def test_agent_whose_reset_fails_is_replaced(run):
+    async def scenario():
+        pool, created = make_pool(fail_reset=True)
+        first = await borrow(pool)
+        second = await borrow(pool)
+        await settle()
+        assert first is not second
+        assert first.closed
+        await pool.close()
+
+    run(scenario())
+
+
+def test_cancelled_run_retires_the_agent(run):
+    async def scenario():
+        pool, created = make_pool()
+        started = asyncio.Event()
+
+        async def interrupted():
+            async with pool.agent():
+                started.set()
+                await asyncio.sleep(10)
+
+        task = asyncio.ensure_future(interrupted())
+        await started.wait()
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        await settle()
+        assert created[0].closed
+        assert created[0].resets == 0
+        assert (await borrow(pool)) is not created[0]
+        await pool.close()
+
+    run(scenario())
+
+
+def test_exhausted_pool_raises(run):
+    async def scenario():
+        pool, created = make_pool(max_size=1, acquire_timeout=0.05)
+        async with pool.agent():
+            with pytest.raises(AgentPoolExhausted):
+                await borrow(pool)
+        await pool.close()
+
+    run(scenario())
+
+
+def test_manus_reset_replaces_local_tools_and_keeps_mcp_tools(run):
+    async def scenario():
+        agent = Manus()
+        remote = MCPClientTool(name="mcp_docs_search", description="remote", server_id="docs")
+        agent.mcp_clients.tools = (remote,)
+        agent.available_tools.add_tools(remote)
+        editor = agent.available_tools.get_tool(StrReplaceEditor().name)
+        agent.memory.add_message(Message.user_message("previous request"))
+
+        agent.reset()
+
+        assert agent.available_tools.get_tool(StrReplaceEditor().name) is not editor
+        assert agent.available_tools.get_tool("mcp_docs_search") is remote
+        assert agent.memory.messages == []
+
+    run(scenario())
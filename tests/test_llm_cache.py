@@ -0,0 +1,82 @@
+import asyncio
+import time
+
+from server.app.config import LLMCacheSettings
+from server.app.llm import LLM
+from server.app.llm_cache import CompletionCache, coalesce_requests
+
+
+def user(text):
+    return [{"role": "user", "content": text}]
+
+
+def test_repeated_request_is_served_from_cache(mock, run):
+    llm = LLM()
+    first = run(llm.ask(user("cache: repeated"), stream=False, cache=True))
+    second = run(llm.ask(user("cache: repeated"), stream=False, cache=True))
+    assert first == second
+    assert mock.stats["requests"] == 1
+
+
+def test_cache_entries_are_not_shared_across_backends(mock, run):
+    run(LLM().ask(user("cache: per backend"), stream=False, cache=True))
+    run(LLM("alt").ask(user("cache: per backend"), stream=False, cache=True))
+    assert mock.stats["requests"] == 2
+
+
+def test_cache_can_be_bypassed_per_call(mock, run):
+    llm = LLM()
+    run(llm.ask(user("cache: bypassed"), stream=False, cache=True))
+    run(llm.ask(user("cache: bypassed"), stream=False, cache=False))
+    assert mock.stats["requests"] == 2
+
+
+def test_expired_entries_are_misses(run):
+    cache = CompletionCache(LLMCacheSettings(enabled=True, ttl=60, disk_path=""))
+    key = cache.make_key(model="m", messages=user("ttl"))
+    run(cache.put(key, "answer"))
+    assert run(cache.get(key)).value == "answer"
+
+    cache._memory[key].expires_at = time.time() - 1
+    assert run(cache.get(key)) is None
+
+
+def test_identical_calls_in_flight_share_one_request(mock, run):
+    mock.latency.params = [0.1]
+    llm = LLM()
+
+    async def twice(coalesce):
+        return await asyncio.gather(
+            *(llm.ask(user(f"cache: in flight {coalesce}"), stream=False, coalesce=coalesce) for _ in range(2))
+        )
+
+    first, second = run(twice(True))
+    assert first == second
+    assert mock.stats["requests"] == 1
+
+    run(twice(False))
+    assert mock.stats["requests"] == 3
+
+
+def test_identical_calls_are_not_coalesced_by_default(mock, run):
+    mock.latency.params = [0.1]
+    llm = LLM()
+
+    async def twice():
+        return await asyncio.gather(*(llm.ask(user("cache: default"), stream=False) for _ in range(2)))
+
+    run(twice())
+    assert mock.stats["requests"] == 2
+
+
+def test_coalesce_requests_shares_one_call(mock, run):
+    mock.latency.params = [0.1]
+    llm = LLM()
+
+    async def twice():
+        with coalesce_requests():
+            return await asyncio.gather(*(llm.ask(user("cache: coalesced"), stream=False) for _ in range(2)))
+
+    first, second = run(twice())
+    assert first == second
+    assert mock.stats["requests"] == 1
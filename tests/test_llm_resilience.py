@@ -0,0 +1,131 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from openai import APIStatusError
+
+from server.app.config import config
+from server.app.exceptions import ProviderUnavailable
+from server.app.llm import LLM
+from server.app.llm_resilience import (
+    CircuitBreaker,
+    Hedger,
+    get_endpoint_guard,
+    is_retryable,
+    retry_after_seconds,
+)
+from server.app.llm_router import create_client
+
+
+def user(text):
+    return [{"role": "user", "content": text}]
+
+
+def status_error(status, headers=None):
+    request = httpx.Request("POST", "http://mock/v1/chat/completions")
+    response = httpx.Response(status, headers=headers, request=request)
+    return APIStatusError("mock", response=response, body=None)
+
+
+@pytest.mark.parametrize(
+    "status, attempts",
+    [(429, 3), (503, 3), (400, 1), (401, 1)],
+)
+def test_only_transient_errors_are_retried(mock, run, status, attempts):
+    mock.error_rate = 1.0
+    mock.error_status = status
+    mock.retry_after = 0
+    with pytest.raises(Exception):
+        run(LLM("flaky").ask(user(f"resilience: status {status}"), stream=False))
+    # max_retries = 2
+    assert mock.stats["requests"] == attempts
+
+
+def test_sdk_retries_are_off():
+    # llm_retry alone repeats calls; the breaker and failover see every attempt
+    assert create_client(config.llm["default"]).max_retries == 0
+
+
+def test_retry_classifier_and_retry_after():
+    assert is_retryable(status_error(529))
+    assert not is_retryable(status_error(422))
+    assert not is_retryable(ValueError("bad input"))
+    assert retry_after_seconds(status_error(429, {"retry-after": "2"})) == 2.0
+    assert retry_after_seconds(status_error(429, {"retry-after-ms": "250"})) == 0.25
+    assert retry_after_seconds(status_error(429)) is None
+
+
+def test_breaker_opens_and_fails_fast(mock, run):
+    mock.error_rate = 1.0
+    mock.error_status = 503
+    llm = LLM("breaker")
+    for i in range(2):
+        with pytest.raises(APIStatusError):
+            run(llm.ask(user(f"resilience: breaker {i}"), stream=False))
+    with pytest.raises(ProviderUnavailable):
+        run(llm.ask(user("resilience: breaker open"), stream=False))
+    assert mock.stats["requests"] == 2
+
+
+def test_breaker_half_open_probe():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.01)
+    breaker.record_failure(status_error(503))
+    with pytest.raises(ProviderUnavailable):
+        breaker.before_call()
+
+    time.sleep(0.02)
+    breaker.before_call()  # The probe
+    with pytest.raises(ProviderUnavailable):
+        breaker.before_call()  # Only one probe at a time
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    # A 400 means the endpoint answered
+    breaker.record_failure(status_error(400))
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_slow_call_is_hedged(mock, run):
+    llm = LLM("hedged")
+    hedger = get_endpoint_guard(config.llm["hedged"]).hedger
+    run(llm.ask(user("resilience: hedge warmup"), stream=False))
+
+    mock.latency.params = [0.3]
+    mock.reset_stats()
+    run(llm.ask(user("resilience: hedge slow"), stream=False))
+    assert hedger.stats()["hedged"] == 1
+    assert mock.stats["requests"] == 2
+
+
+def test_no_hedge_while_the_scheduler_is_full(mock, run):
+    llm = LLM("hedged_single")
+    backend = llm.router.backends[0]
+    run(llm.ask(user("resilience: single warmup"), stream=False))
+
+    mock.latency.params = [0.2]
+    mock.reset_stats()
+
+    async def two():
+        await asyncio.gather(*(llm.ask(user(f"resilience: single {i}"), stream=False) for i in range(2)))
+
+    run(two())
+    stats = backend.guard.hedger.stats()
+    assert stats["hedged"] == 0
+    assert stats["hedges_skipped"] == 2
+    assert mock.stats["requests"] == 2
+    assert backend.scheduler.stats()["active"] == 0
+    # The second call queued ~0.2s behind the first; that wait is not provider latency
+    assert max(backend.guard.hedger._latencies) < 0.35
+
+
+def test_hedger_without_hedge_only_records(run):
+    hedger = Hedger(percentile=50, min_samples=1)
+    hedger.record(0.001)
+
+    async def slow():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    assert run(hedger.run(slow)) == "done"
+    assert hedger.stats()["hedged"] == 0
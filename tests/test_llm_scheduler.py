@@ -0,0 +1,77 @@
+import asyncio
+
+from server.app.llm import LLM
+from server.app.llm_scheduler import LLMScheduler, Priority
+
+
+def user(text):
+    return [{"role": "user", "content": text}]
+
+
+def test_concurrency_is_capped_at_max_concurrency(mock, run):
+    mock.latency.params = [0.05]
+    llm = LLM()
+
+    async def burst():
+        await asyncio.gather(*(llm.ask(user(f"scheduler: burst {i}"), stream=False) for i in range(6)))
+
+    run(burst())
+    assert mock.stats["requests"] == 6
+    assert mock.stats["peak_in_flight"] == 2
+
+
+def test_higher_priority_waiters_are_admitted_first(run):
+    scheduler = LLMScheduler("test", max_concurrency=1)
+    order = []
+
+    async def call(name, priority):
+        async with scheduler.slot(10, priority):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    async def contend():
+        async with scheduler.slot(10, Priority.DEFAULT):
+            waiters = [
+                asyncio.ensure_future(call("background", Priority.BACKGROUND)),
+                asyncio.ensure_future(call("default", Priority.DEFAULT)),
+                asyncio.ensure_future(call("interactive", Priority.INTERACTIVE)),
+            ]
+            await asyncio.sleep(0.01)
+        await asyncio.gather(*waiters)
+
+    run(contend())
+    assert order == ["interactive", "default", "background"]
+
+
+def test_rate_budget_delays_admission(run):
+    async def scenario():
+        scheduler = LLMScheduler("test-rpm", max_concurrency=4, rpm_limit=1)
+        async with scheduler.slot(10):
+            pass
+        second = asyncio.ensure_future(scheduler.acquire(10))
+        await asyncio.sleep(0.05)
+        assert not second.done()
+        assert scheduler.stats()["throttled"] == 1
+        second.cancel()
+        await asyncio.gather(second, return_exceptions=True)
+
+    run(scenario())
+
+
+def test_try_acquire_never_queues(run):
+    async def scenario():
+        scheduler = LLMScheduler("test", max_concurrency=1)
+        ticket = scheduler.try_acquire(10)
+        assert ticket is not None
+        assert scheduler.try_acquire(10) is None
+        assert scheduler.stats()["queue_depth"] == 0
+
+        ticket.release()
+        ticket.release()  # Idempotent: the slot is handed back once
+        assert scheduler.stats()["active"] == 0
+
+        limited = LLMScheduler("test-rpm", max_concurrency=4, rpm_limit=1)
+        assert limited.try_acquire(10) is not None
+        assert limited.try_acquire(10) is None  # No request budget left this minute
+
+    run(scenario())
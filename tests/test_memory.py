@@ -0,0 +1,46 @@
+from server.app.schema import Memory, Message, ToolCall
+
+
+def tool_turn(i, observation):
+    call = ToolCall(id=f"call_{i}", function={"name": "python_execute", "arguments": "{}"})
+    return [
+        Message.from_tool_calls([call], content=f"Step {i}"),
+        Message.tool_message(observation, name="python_execute", tool_call_id=f"call_{i}"),
+    ]
+
+
+def test_compaction_keeps_goal_and_recent_tail_within_budget():
+    memory = Memory(token_budget=600, keep_recent=4, observation_max_chars=100)
+    memory.add_message(Message.system_message("You are an agent."))
+    memory.add_message(Message.user_message("The goal."))
+    for i in range(20):
+        memory.add_messages(tool_turn(i, "x" * 400))
+
+    assert memory.count_tokens() <= 600
+    assert memory.messages[0].role == "system"
+    assert memory.messages[1].content == "The goal."
+    assert memory.messages[-1].tool_call_id == "call_19"
+    # Tool results are never left without the call that produced them
+    assert memory.messages[2].role != "tool"
+
+
+def test_only_the_newest_screenshot_is_kept():
+    memory = Memory(max_images=1)
+    for i in range(3):
+        memory.add_message(Message.user_message(f"screen {i}", base64_image="aW1n"))
+    assert [bool(m.base64_image) for m in memory.messages] == [False, False, True]
+
+
+def test_running_total_matches_a_full_recount():
+    memory = Memory(token_budget=2000, keep_recent=4, observation_max_chars=100)
+    memory.add_message(Message.system_message("You are an agent."))
+    memory.add_message(Message.user_message("The goal."))
+    for i in range(30):
+        memory.add_messages(tool_turn(i, "y" * (50 * (i % 7))))
+        assert memory.count_tokens() == sum(memory._message_tokens(m) for m in memory.messages)
+
+    memory.messages.append(Message.user_message("appended directly"))
+    assert memory.count_tokens() == sum(memory._message_tokens(m) for m in memory.messages)
+
+    memory.clear()
+    assert memory.count_tokens() == 0
@@ -0,0 +1,44 @@
+import json
+
+import httpx
+from fastapi import FastAPI
+
+from server.app.agent.pool import close_agent_pools
+from server.proposals import routes as proposals_routes
+
+ANALYSIS = {
+    "score": 72,
+    "strengths": ["Clear budget"],
+    "weaknesses": ["No baseline data"],
+    "recommendations": ["Add monitoring indicators"],
+    "competitiveAdvantage": ["Local partners"],
+    "riskFactors": ["Currency volatility"],
+    "fundingProbability": 0.4,
+}
+
+
+def test_analyze_returns_the_agents_json_answer(mock, run):
+    mock.responses = [
+        {
+            "content": json.dumps(ANALYSIS),
+            "tool_calls": [{"name": "terminate", "arguments": {"status": "success"}}],
+        }
+    ]
+    app = FastAPI()
+    app.include_router(proposals_routes.router, prefix="/api")
+
+    async def analyze():
+        async with httpx.AsyncClient(
+            transport=httpx.ASGITransport(app=app), base_url="http://test"
+        ) as client:
+            try:
+                return await client.post(
+                    "/api/proposal/analyze",
+                    json={"proposalContent": {"summary": "Solar micro-grids"}, "opportunityDetails": {}},
+                )
+            finally:
+                await close_agent_pools()
+
+    response = run(analyze())
+    assert response.status_code == 200
+    assert response.json() == ANALYSIS
@@ -0,0 +1,40 @@
+import base64
+import io
+
+from PIL import Image
+
+from server.app.tool.browser_use_tool import BrowserUseTool
+from server.app.tool.screenshot import TILE_SIZE, ScreenshotPipeline, fit_to_tiles
+
+
+def png(width, height, color):
+    out = io.BytesIO()
+    Image.new("RGB", (width, height), color).save(out, format="PNG")
+    return out.getvalue()
+
+
+def test_frames_are_downscaled_to_the_tile_budget():
+    pipeline = ScreenshotPipeline(max_tiles=4)
+    encoded = pipeline.process(png(2560, 1600, "white"))
+    image = Image.open(io.BytesIO(base64.b64decode(encoded)))
+    assert image.format == "JPEG"
+    assert -(-image.width // TILE_SIZE) * -(-image.height // TILE_SIZE) <= 4
+    assert fit_to_tiles(400, 300, 4) == (400, 300)
+
+
+def test_near_duplicate_frames_are_skipped():
+    pipeline = ScreenshotPipeline()
+    assert pipeline.process(png(800, 600, "white")) is not None
+    assert pipeline.process(png(800, 600, "white")) is None
+    assert pipeline.process(png(800, 600, "black")) is not None
+
+    pipeline.reset()
+    assert pipeline.process(png(800, 600, "black")) is not None
+    assert pipeline.stats()["duplicates_skipped"] == 1
+
+
+def test_browser_cleanup_forgets_the_last_frame(run):
+    tool = BrowserUseTool()
+    assert tool.screenshots.process(png(800, 600, "white")) is not None
+    run(tool.cleanup())
+    assert tool.screenshots.process(png(800, 600, "white")) is not None
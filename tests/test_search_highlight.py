@@ -0,0 +1,9 @@
+from server.donors.search import MARK_START, MARK_STOP, render_highlight
+
+
+def test_scraped_markup_is_escaped_around_highlights():
+    fragment = f'<script>alert("x")</script> {MARK_START}solar{MARK_STOP} grants & loans'
+    assert render_highlight(fragment) == (
+        "&lt;script&gt;alert(&quot;x&quot;)&lt;/script&gt; <mark>solar</mark> grants &amp; loans"
+    )
+    assert render_highlight(None) is None